@@ -1,33 +1,114 @@
 import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
 
 
-def remove_empty_folders(path):
+def _prune_tree(top, manifest=None, dry_run=False, remove_top=False, log=METRICS.event):
     """
-    递归删除空文件夹
-    :param path: 要清理的目录路径
-    :return: 删除的文件夹数量
+    自底向上遍历一棵子树并删除其中的空文件夹，是否为空直接由遍历结果推算：
+    每个目录剩余的子项数 = 遍历得到的文件数 + 子目录数 - 已删除的子目录数，为 0 即为空，
+    不再对每个文件夹重新读取一次目录内容。
+    :param remove_top: top 本身为空时是否也删除
+    :param log: 记录事件的函数，参数与 METRICS.event 相同
+    :return: (删除的文件夹数量, top 是否已删除)
     """
     deleted_count = 0
+    # 目录 -> 已删除（或演练中将删除）的子目录数
+    removed_children = {}
+    top = os.path.normpath(top)
+
+    if manifest is not None:
+        walker = manifest.walk(top, topdown=False)
+    else:
+        walker = os.walk(top, topdown=False)
+    for root, dirs, files in walker:
+        remaining = len(dirs) + len(files) - removed_children.pop(root, 0)
+        if remaining or (root == top and not remove_top):
+            continue
+        try:
+            if dry_run:
+                log("rmdir", f"将删除空文件夹: {root}", path=root, dry_run=True)
+            else:
+                os.rmdir(root)
+                if manifest is not None:
+                    manifest.remove(root)
+                log("rmdir", f"已删除空文件夹: {root}", path=root)
+        except Exception as e:
+            # 遍历之后又有新内容或无权限，保留该文件夹，上级目录也就不为空
+            log("rmdir_error", f"无法删除 {root}: {e}", level=INFO, path=root)
+            continue
+        deleted_count += 1
+        if root == top:
+            return deleted_count, True
+        parent = os.path.dirname(root)
+        removed_children[parent] = removed_children.get(parent, 0) + 1
+
+    return deleted_count, False
 
-    # 遍历目录树（自底向上）
-    for root, dirs, files in os.walk(path, topdown=False):
-        for folder in dirs:
-            folder_path = os.path.join(root, folder)
 
-            try:
-                # 检查文件夹是否为空
-                if not os.listdir(folder_path):
-                    os.rmdir(folder_path)
-                    print(f"已删除空文件夹: {folder_path}")
-                    deleted_count += 1
-            except Exception as e:
-                print(f"无法删除 {folder_path}: {e}")
+def _prune_subtree_buffered(top, manifest, dry_run):
+    """
+    在线程中处理一棵子树，事件先缓存起来，处理完后由主线程按顺序交给 METRICS.event
+    """
+    events = []
+    count, removed = _prune_tree(top, manifest, dry_run, remove_top=True,
+                                 log=lambda *args, **fields: events.append((args, fields)))
+    return count, removed, events
 
+
+def remove_empty_folders(path, manifest=None, dry_run=False, workers=1):
+    """
+    递归删除空文件夹（不删除 path 本身）
+    :param path: 要清理的目录路径
+    :param manifest: 目录清单 TreeManifest，提供时从清单遍历，并同步更新清单
+    :param dry_run: 只输出将要删除的文件夹，不实际删除
+    :param workers: 大于 1 时把 path 下的各个子目录作为独立子树并行处理，适合很宽的目录树
+    :return: 删除（演练时为将删除）的文件夹数量
+    """
+    if workers <= 1:
+        count, _ = _prune_tree(path, manifest, dry_run)
+        return count
+
+    if manifest is not None:
+        subdirs, _ = manifest.listdir(path)
+    else:
+        with os.scandir(path) as it:
+            subdirs = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+
+    deleted_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_prune_subtree_buffered, os.path.join(path, name), manifest, dry_run)
+                   for name in subdirs]
+        for future in futures:
+            count, _, events = future.result()
+            for args, fields in events:
+                METRICS.event(*args, **fields)
+            deleted_count += count
     return deleted_count
 
 
 if __name__ == "__main__":
-    target_directory = r"D:\\"  # 目标目录
+    parser = argparse.ArgumentParser(description="递归删除空文件夹")
+    parser.add_argument("directory", nargs="?", default=r"D:\\", help="目标目录")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="只列出将要删除的空文件夹，不实际删除")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行处理顶层各子目录的线程数，默认 1")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    target_directory = args.directory
+
+    if args.dry_run:
+        print(f"演练模式，扫描空文件夹: {target_directory}")
+        try:
+            count = remove_empty_folders(target_directory, dry_run=True, workers=args.workers)
+        finally:
+            METRICS.close()
+        print(f"演练完成，共有 {count} 个空文件夹将被删除")
+        print(METRICS.summary())
+        exit(0)
 
     # 安全确认
     print(f"即将扫描并删除空文件夹: {target_directory}")
@@ -36,7 +117,11 @@ if __name__ == "__main__":
 
     if confirm == 'y':
         print("开始扫描...")
-        count = remove_empty_folders(target_directory)
+        try:
+            count = remove_empty_folders(target_directory, workers=args.workers)
+        finally:
+            METRICS.close()
         print(f"操作完成，共删除 {count} 个空文件夹")
+        print(METRICS.summary())
     else:
-        print("操作已取消")
\ No newline at end of file
+        print("操作已取消")
@@ -1,68 +1,178 @@
 import os
+import argparse
+from collections import Counter, deque
+from Xuexitong_Metrics import METRICS, add_arguments, configure_from_args
+from Xuexitong_RenameExecutor import RenameExecutor, add_arguments as add_journal_arguments, journal_from_args
 
 
-def rename_files_in_directory(directory, old_str, new_str):
+class AdStringMatcher:
     """
-    递归遍历目录，重命名包含特定字符串的文件
+    多个广告字符串的 Aho-Corasick 自动机，对每个名称只扫描一遍即可找出所有模式。
+    重叠规则：从左到右，起点最靠左的匹配优先；起点相同时较长的模式优先；
+    选中的匹配互不重叠，被选中匹配覆盖的其他匹配不再计算。
+    counts 记录每个模式实际被替换的次数。
+    """
+
+    def __init__(self, patterns, replacement=""):
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self.replacement = replacement
+        self.counts = Counter()
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node].append(index)
+        # 按层次计算失败指针，并把失败指针所指节点的输出合并进来
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """
+        返回按上述规则选中的匹配列表：[(起点, 模式序号), ...]
+        """
+        matches = []
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for index in self.output[node]:
+                matches.append((pos + 1 - len(self.patterns[index]), index))
+        matches.sort(key=lambda m: (m[0], -len(self.patterns[m[1]])))
+        selected = []
+        end = 0
+        for start, index in matches:
+            if start >= end:
+                selected.append((start, index))
+                end = start + len(self.patterns[index])
+        return selected
+
+    def replace(self, text):
+        """
+        替换名称中的所有广告字符串并累计每个模式的次数，返回新名称
+        """
+        selected = self.find(text)
+        if not selected:
+            return text
+        parts = []
+        last = 0
+        for start, index in selected:
+            parts.append(text[last:start])
+            parts.append(self.replacement)
+            last = start + len(self.patterns[index])
+            self.counts[self.patterns[index]] += 1
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def report(self):
+        """
+        按模式列出替换次数
+        """
+        lines = [f"  {pattern!r}: {self.counts[pattern]} 次" for pattern in self.patterns]
+        return "各广告字符串的替换次数:\n" + "\n".join(lines)
+
+
+def load_patterns(pattern_file):
+    """
+    从文件读取广告字符串列表：每行一个，忽略空行和以 # 开头的注释行
+    """
+    patterns = []
+    with open(pattern_file, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            pattern = line.rstrip('\r\n')
+            if pattern and not pattern.startswith('#'):
+                patterns.append(pattern)
+    return patterns
+
+
+def rename_files_in_directory(directory, old_str, new_str, manifest=None, journal=None):
+    """
+    递归遍历目录，重命名包含特定字符串的文件和目录。
+    先遍历整个目录树得到重命名计划，再由 RenameExecutor 按目录从深到浅统一执行
     :param directory: 要遍历的目录路径
-    :param old_str: 要替换的旧字符串
+    :param old_str: 要替换的旧字符串，也可以是多个字符串的列表，或已建立的 AdStringMatcher
     :param new_str: 要替换成的新字符串
+    :param manifest: 目录清单 TreeManifest，提供时从清单遍历并同步更新清单，不再重新遍历目录
+    :param journal: 重命名日志 RenameJournal，提供时可继续执行或撤销中断的运行
+    :return: 使用的 AdStringMatcher，其中记录了各模式的替换次数
     """
-    for root, dirs, files in os.walk(directory):
+    if isinstance(old_str, AdStringMatcher):
+        matcher = old_str
+    else:
+        matcher = AdStringMatcher([old_str] if isinstance(old_str, str) else old_str, new_str)
+    executor = RenameExecutor(step="去广告", journal=journal)
+    walker = manifest.walk(directory) if manifest is not None else os.walk(directory)
+    for root, dirs, files in walker:
         for filename in files:
-            if old_str in filename:
-                # 构造旧文件路径和新文件路径
-                old_path = os.path.join(root, filename)
-                new_filename = filename.replace(old_str, new_str)
-                new_path = os.path.join(root, new_filename)
-
-                try:
-                    # 重命名文件
-                    os.rename(old_path, new_path)
-                    print(f"重命名成功: {old_path} -> {new_path}")
-                except Exception as e:
-                    print(f"重命名失败 {old_path}: {e}")
-
-        # 同样处理目录名（如果需要）
-        for dirname in dirs[:]:  # 使用副本遍历，因为我们可能修改dirs
-            if old_str in dirname:
-                old_dirpath = os.path.join(root, dirname)
-                new_dirname = dirname.replace(old_str, new_str)
-                new_dirpath = os.path.join(root, new_dirname)
-
-                try:
-                    os.rename(old_dirpath, new_dirpath)
-                    print(f"重命名目录成功: {old_dirpath} -> {new_dirpath}")
-                    # 更新遍历列表，因为目录名已更改
-                    dirs[dirs.index(dirname)] = new_dirname
-                except Exception as e:
-                    print(f"重命名目录失败 {old_dirpath}: {e}")
+            executor.add(root, filename, matcher.replace(filename), kind="文件")
+        # 目录在计划执行时才改名，遍历仍使用原来的名称
+        for dirname in dirs:
+            executor.add(root, dirname, matcher.replace(dirname), kind="目录")
+    executor.apply(on_renamed=manifest.rename if manifest is not None else None)
+
+    return matcher
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="删除文件名和目录名中的广告字符串")
     # 设置要处理的目录路径
-    target_directory = r"C:\Users\xijia\Desktop\DoingPlatform\教创赛省赛提交\E05_附件作证材料\A01原始整理版"
+    parser.add_argument("directory", nargs="?",
+                        default=r"C:\Users\xijia\Desktop\DoingPlatform\教创赛省赛提交\E05_附件作证材料\A01原始整理版",
+                        help="要处理的目录")
+    parser.add_argument("--patterns", default=None,
+                        help="广告字符串列表文件，每行一个；指定后一次遍历替换全部字符串")
+    add_arguments(parser)
+    add_journal_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    target_directory = args.directory
 
     # 检查路径是否存在
     if not os.path.isdir(target_directory):
         print("错误: 指定的路径不是一个有效的目录!")
         exit(1)
+    journal = journal_from_args(args, target_directory)
 
 
     """
     需替换的字符串候选：
-    
+    写入文本文件（每行一个），通过 --patterns 指定
     """
 
 
     # 定义要替换的字符串
-    old_string = "D1127_"
+    old_strings = load_patterns(args.patterns) if args.patterns else ["D1127_"]
     new_string = ""
 
     print(f"开始处理目录: {target_directory}")
-    print(f"将把文件名中的 '{old_string}' 替换为 '{new_string}'")
+    print(f"将把文件名中的 {old_strings} 替换为 '{new_string}'")
 
     # 执行重命名
-    rename_files_in_directory(target_directory, old_string, new_string)
+    try:
+        matcher = rename_files_in_directory(target_directory, old_strings, new_string, journal=journal)
+    finally:
+        if journal is not None:
+            journal.close()
+        METRICS.close()
+    print(matcher.report())
+    print(METRICS.summary())
 
     print("处理完成!")
\ No newline at end of file
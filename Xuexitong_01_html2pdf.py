@@ -1,110 +1,403 @@
 import os
 import re
+import time
+import locale
+import argparse
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import pdfkit
 from pathlib import Path
+from Xuexitong_Metrics import METRICS, INFO, DEBUG, add_arguments, configure_from_args
+from Xuexitong_Dedup import deduplicate, ACTIONS as DEDUP_ACTIONS
 
 # 配置 wkhtmltopdf 路径（根据实际安装路径修改）
 config = pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
 
+# 只在HTML文件开头这么多字节内查找 <head> 和 <base> 标签
+HEAD_SCAN_SIZE = 16 * 1024
+HEAD_TAG = re.compile(rb'<head(?:\s[^>]*)?>', re.IGNORECASE)
+BASE_TAG = re.compile(rb'<base\s', re.IGNORECASE)
 
-def read_file_with_fallback(file_path):
+# wkhtmltopdf 转换参数，单文件和批量转换共用
+PDF_OPTIONS = {
+    'enable-local-file-access': None,  # 允许访问本地资源
+    'load-error-handling': 'ignore',  # 忽略加载错误
+    'load-media-error-handling': 'ignore'  # 忽略媒体加载错误
+}
+
+
+def insert_base_tag(html_path, log=METRICS.event):
     """
-    尝试使用 UTF-8 编码读取文件，失败后使用 GBK 编码。
-    返回内容和实际使用的编码。
+    检查HTML文件开头部分，如<head>中没有<base>标签，则生成插入了<base>标签的临时副本，
+    <base>指向HTML所在目录的绝对路径。只扫描开头 HEAD_SCAN_SIZE 字节，原文件不会被改写。
+    返回 (用于转换的文件路径, 转换后需要删除的临时文件路径或 None)。
     """
+    temp_path = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content, 'utf-8'
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='gbk') as f:
-                content = f.read()
-            return content, 'gbk'
-        except Exception as e:
-            print(f"读取 {file_path} 时出错: {e}")
-            return None, None
+        with open(html_path, 'rb') as f:
+            head = f.read(HEAD_SCAN_SIZE)
+            # 查找<head>标签，已存在 <base> 标签时直接转换原文件
+            head_match = HEAD_TAG.search(head)
+            if not head_match or BASE_TAG.search(head):
+                return html_path, None
+            # 使用百分号编码的 file URI，插入的内容与文件编码无关
+            abs_dir = Path(html_path).parent.resolve()
+            base_tag = f'<base href="{abs_dir.as_uri()}/">'.encode('ascii')
+            pos = head_match.end()
+            fd, temp_path = tempfile.mkstemp(suffix='.html')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(head[:pos])
+                out.write(base_tag)
+                out.write(head[pos:])
+                shutil.copyfileobj(f, out)
+        log("html2pdf_base", f"已为 {html_path} 生成带 <base> 标签的临时文件", level=DEBUG, html=html_path)
+        return temp_path, temp_path
+    except Exception as e:
+        log("html2pdf_error", f"预处理 {html_path} 时出错: {e}", level=INFO, html=html_path)
+        remove_temp_file(temp_path)
+        return html_path, None
+
+
+def remove_temp_file(temp_path):
+    """删除预处理生成的临时文件"""
+    if temp_path is None:
+        return
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
 
 
-def write_file_with_encoding(file_path, content, encoding):
+def html_to_pdf(html_path, pdf_path, log=METRICS.event):
+    """将HTML文件转换为PDF"""
+    temp_path = None
+    try:
+        # 预处理HTML文件，需要时生成插入了<base>标签的临时副本
+        render_path, temp_path = insert_base_tag(html_path, log=log)
+
+        with METRICS.timer("wkhtmltopdf", mode="single"):
+            pdfkit.from_file(render_path, pdf_path, configuration=config, options=PDF_OPTIONS)
+        return True
+    except Exception as e:
+        log("html2pdf_error", f"转换失败 {html_path}: {e}", level=INFO, html=html_path)
+        return False
+    finally:
+        remove_temp_file(temp_path)
+
+
+def remove_converted_source(html_path, pdf_path, log=METRICS.event):
     """
-    按指定编码写入文件内容。
+    确认PDF已生成后删除原始HTML文件，返回该文件是否转换成功。
     """
+    if not os.path.exists(pdf_path):
+        log("html2pdf_error", f"PDF文件未生成: {pdf_path}", level=INFO, html=html_path, pdf=pdf_path)
+        METRICS.count("html2pdf", result="fail")
+        return False
     try:
-        with open(file_path, 'w', encoding=encoding) as f:
-            f.write(content)
+        os.remove(html_path)
+        METRICS.count("html2pdf", result="ok")
+        log("html2pdf", f"转换成功并已删除原始文件: {html_path}", html=html_path, pdf=pdf_path)
     except Exception as e:
-        print(f"写入 {file_path} 时出错: {e}")
+        log("html2pdf_error", f"删除原始文件失败 {html_path}: {e}", level=INFO, html=html_path)
+    return True
 
 
-def insert_base_tag(html_path):
+def convert_single_html(html_path, log=METRICS.event):
     """
-    检查并在HTML文件的<head>标签中插入<base>标签，指向HTML所在目录的绝对路径。
-    采用合适的编码方式读取文件。
+    转换单个HTML文件为PDF，确认PDF已生成后删除原始文件。
+    返回该文件是否转换成功。
     """
-    content, encoding_used = read_file_with_fallback(html_path)
-    if content is None:
-        print(f"无法读取 {html_path}，跳过预处理。")
-        return
+    pdf_path = os.path.splitext(html_path)[0] + '.pdf'
+    log("html2pdf_start", f"正在处理: {html_path}", html=html_path)
+    if not html_to_pdf(html_path, pdf_path, log=log):
+        METRICS.count("html2pdf", result="fail")
+        return False
+    return remove_converted_source(html_path, pdf_path, log=log)
+
+
+def _quote_stdin_arg(arg):
+    """
+    按 wkhtmltopdf --read-args-from-stdin 的解析规则给参数加引号并转义反斜杠和双引号。
+    """
+    return '"' + arg.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _option_args():
+    """
+    把 PDF_OPTIONS 展开为命令行参数列表。
+    """
+    args = []
+    for key, value in PDF_OPTIONS.items():
+        args.append('--' + key)
+        if value is not None:
+            args.append(value)
+    return args
+
+
+def convert_html_batch(html_paths, log=METRICS.event):
+    """
+    在同一个 wkhtmltopdf 进程中依次转换多个HTML文件，每个文件仍生成独立的PDF。
+    通过 --read-args-from-stdin 每行传入一组参数，进程启动、WebKit 初始化和字体加载只发生一次。
+    批量中没有生成完整PDF的文件会单独重新转换，一个坏页面不会影响同批的其他文件。
+    返回与 html_paths 对应的成功标志列表。
+    """
+    option_args = _option_args()
+    pdf_paths = []
+    temp_paths = []
+    lines = []
+    # 旧的PDF无法删除的文件不参与批量转换，改为单独转换
+    singles = set()
+    for index, html_path in enumerate(html_paths):
+        pdf_path = os.path.splitext(html_path)[0] + '.pdf'
+        pdf_paths.append(pdf_path)
+        # 先删除旧的PDF，转换后才能通过是否存在判断本次是否成功
+        try:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+        except OSError as e:
+            log("html2pdf_error", f"无法删除旧的PDF {pdf_path}（{e}），单独转换", level=INFO, pdf=pdf_path)
+            singles.add(index)
+            continue
+        log("html2pdf_start", f"正在处理: {html_path}", html=html_path)
+        render_path, temp_path = insert_base_tag(html_path, log=log)
+        temp_paths.append(temp_path)
+        lines.append(' '.join(_quote_stdin_arg(arg) for arg in option_args + [render_path, pdf_path]))
 
     try:
-        # 查找<head>标签
-        head_match = re.search(r'<head.*?>', content, flags=re.IGNORECASE)
-        if head_match:
-            # 如果不存在 <base> 标签，则插入
-            if not re.search(r'<base\s', content, flags=re.IGNORECASE):
-                abs_dir = Path(html_path).parent.resolve()
-                base_tag = f'<base href="file:///{abs_dir.as_posix()}/">'
-                pos = head_match.end()
-                content = content[:pos] + base_tag + content[pos:]
-                write_file_with_encoding(html_path, content, encoding_used)
-                print(f"已为 {html_path} 插入 <base> 标签")
+        if lines:
+            start = time.perf_counter()
+            subprocess.run([os.fsdecode(config.wkhtmltopdf), '--read-args-from-stdin'],
+                           input='\n'.join(lines) + '\n',
+                           encoding=locale.getpreferredencoding(False),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            # 批量进程的耗时平均分到每个页面，便于与单文件转换比较
+            elapsed = time.perf_counter() - start
+            for _ in lines:
+                METRICS.observe("wkhtmltopdf", elapsed / len(lines), mode="batch")
     except Exception as e:
-        print(f"预处理 {html_path} 时出错: {e}")
+        log("html2pdf_error", f"批量转换出错，将逐个重试: {e}", level=INFO)
+    finally:
+        for temp_path in temp_paths:
+            remove_temp_file(temp_path)
 
+    results = []
+    for index, (html_path, pdf_path) in enumerate(zip(html_paths, pdf_paths)):
+        if index in singles:
+            results.append(convert_single_html(html_path, log=log))
+        elif is_valid_pdf(pdf_path):
+            results.append(remove_converted_source(html_path, pdf_path, log=log))
+        else:
+            # 批量进程中途崩溃时PDF可能只写了一部分，不能据此删除原始文件
+            log("html2pdf_error", f"批量转换未生成完整的 {pdf_path}，单独重试", level=INFO, pdf=pdf_path)
+            results.append(convert_single_html(html_path, log=log))
+    return results
 
-def html_to_pdf(html_path, pdf_path):
-    """将HTML文件转换为PDF"""
+
+def _convert_task(html_paths, log=METRICS.event):
+    """
+    转换一组文件：只有一个文件时走 pdfkit 单文件流程，否则走批量流程。
+    """
+    if len(html_paths) == 1:
+        return [convert_single_html(html_paths[0], log=log)]
+    return convert_html_batch(html_paths, log=log)
+
+
+def _convert_and_collect(html_paths):
+    """
+    在工作线程中转换一组文件，事件先缓存起来，由主线程按顺序交给 METRICS.event。
+    """
+    events = []
+    results = _convert_task(html_paths, log=lambda *args, **fields: events.append((args, fields)))
+    return results, events
+
+
+def iter_html_files(directory, manifest=None):
+    """
+    递归遍历目录，按目录名和文件名排序后依次返回所有HTML文件路径，
+    保证每次运行的处理顺序一致。传入目录清单 TreeManifest 时从清单遍历。
+    """
+    walker = manifest.walk(directory) if manifest is not None else os.walk(directory)
+    for root, dirs, files in walker:
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(('.htm', '.html')):
+                yield os.path.join(root, filename)
+
+
+def is_valid_pdf(pdf_path):
+    """
+    粗略检查PDF是否完整：文件头为 %PDF-，文件末尾有 startxref 和 %%EOF 结尾标记
+    """
     try:
-        # 预处理HTML文件，插入<base>标签
-        insert_base_tag(html_path)
-
-        options = {
-            'enable-local-file-access': None,  # 允许访问本地资源
-            'load-error-handling': 'ignore',  # 忽略加载错误
-            'load-media-error-handling': 'ignore'  # 忽略媒体加载错误
-        }
-        pdfkit.from_file(html_path, pdf_path, configuration=config, options=options)
-        return True
-    except Exception as e:
-        print(f"转换失败 {html_path}: {e}")
+        with open(pdf_path, 'rb') as f:
+            if not f.read(5) == b'%PDF-':
+                return False
+            size = f.seek(0, 2)
+            f.seek(max(0, size - 1024))
+            tail = f.read()
+    except OSError:
         return False
+    return b'startxref' in tail and b'%%EOF' in tail
 
 
-def convert_html_files_in_directory(directory):
+def is_up_to_date(html_path, pdf_path):
     """
-    递归遍历目录，转换所有HTML文件为PDF
+    PDF已存在、比HTML新且结构完整时，认为该HTML无需重新转换
     """
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            if filename.lower().endswith(('.htm', '.html')):
-                html_path = os.path.join(root, filename)
-                pdf_path = os.path.splitext(html_path)[0] + '.pdf'
-                print(f"正在处理: {html_path}")
-                if html_to_pdf(html_path, pdf_path):
-                    if os.path.exists(pdf_path):
-                        try:
-                            os.remove(html_path)
-                            print(f"转换成功并已删除原始文件: {html_path}")
-                        except Exception as e:
-                            print(f"删除原始文件失败 {html_path}: {e}")
+    try:
+        if os.path.getmtime(pdf_path) < os.path.getmtime(html_path):
+            return False
+    except OSError:
+        return False
+    return is_valid_pdf(pdf_path)
+
+
+class ConversionCheckpoint:
+    """
+    记录已处理文件的检查点清单，每处理完一个文件追加一行并立即写入磁盘。
+    运行中断后再次运行时跳过清单中转换成功的文件，转换失败的文件会重新尝试，全部处理完成后删除清单。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    status, _, html_path = line.rstrip('\n').partition('\t')
+                    if not html_path:
+                        continue
+                    # 同一文件以最后一次记录为准
+                    if status == 'ok':
+                        self.done.add(html_path)
                     else:
-                        print(f"PDF文件未生成: {pdf_path}")
+                        self.done.discard(html_path)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def default_path(directory):
+        """
+        清单默认放在目标目录旁边，不会被当作待处理文件
+        """
+        return os.path.normpath(os.path.abspath(directory)) + ".html2pdf_checkpoint.txt"
+
+    def __contains__(self, html_path):
+        return os.path.abspath(html_path) in self.done
+
+    def record(self, html_path, success):
+        self.file.write(f"{'ok' if success else 'fail'}\t{os.path.abspath(html_path)}\n")
+        self.file.flush()
+
+    def close(self, completed):
+        self.file.close()
+        if completed:
+            os.remove(self.path)
+
+
+def convert_html_files_in_directory(directory, jobs=None, batch_size=1, incremental=False,
+                                    checkpoint_path=None, manifest=None):
+    """
+    递归遍历目录，转换所有HTML文件为PDF
+    :param directory: 要遍历的目录路径
+    :param jobs: 同时进行转换的任务数，默认为CPU核数；为 1 时逐个转换
+    :param batch_size: 每个 wkhtmltopdf 进程转换的文件数，为 1 时每个文件单独启动一次
+    :param incremental: 增量模式，跳过PDF已是最新的文件，并通过检查点清单从中断处继续
+    :param checkpoint_path: 检查点清单路径，默认放在目标目录旁边
+    :param manifest: 目录清单 TreeManifest，提供时从清单遍历，并在主线程中登记生成的PDF和删除的HTML
+    :return: (成功数量, 失败数量)
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    batch_size = max(1, batch_size)
+    html_files = list(iter_html_files(directory, manifest))
+
+    def update_manifest(html_path):
+        # 按磁盘上的实际结果更新清单：PDF可能已生成，原始文件可能已删除
+        if manifest is None:
+            return
+        pdf_path = os.path.splitext(html_path)[0] + '.pdf'
+        if os.path.exists(pdf_path):
+            manifest.add_file(pdf_path)
+        if not os.path.exists(html_path):
+            manifest.remove(html_path)
+
+    checkpoint = None
+    skipped_fresh = skipped_checkpoint = 0
+    if incremental:
+        checkpoint = ConversionCheckpoint(checkpoint_path or ConversionCheckpoint.default_path(directory))
+        pending = []
+        for html_path in html_files:
+            pdf_path = os.path.splitext(html_path)[0] + '.pdf'
+            if html_path in checkpoint:
+                skipped_checkpoint += 1
+            elif is_up_to_date(html_path, pdf_path):
+                # 上次已转换但原始文件没来得及删除，只补做删除
+                remove_converted_source(html_path, pdf_path)
+                update_manifest(html_path)
+                skipped_fresh += 1
+            else:
+                pending.append(html_path)
+        html_files = pending
+
+    tasks = [html_files[i:i + batch_size] for i in range(0, len(html_files), batch_size)]
+    results = []
+    start = time.perf_counter()
+
+    def record(task, task_results):
+        results.extend(task_results)
+        for html_path in task:
+            update_manifest(html_path)
+        if checkpoint is not None:
+            for html_path, success in zip(task, task_results):
+                checkpoint.record(html_path, success)
+
+    try:
+        if jobs <= 1:
+            for task in tasks:
+                record(task, _convert_task(task))
+        else:
+            # 每次转换都是独立的 wkhtmltopdf 子进程，线程池只负责等待，因此用线程即可限制并发数；
+            # map 按提交顺序返回结果，日志顺序与逐个转换时一致
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                for task, (task_results, events) in zip(tasks, executor.map(_convert_and_collect, tasks)):
+                    for args, fields in events:
+                        METRICS.event(*args, **fields)
+                    record(task, task_results)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close(completed=len(results) == len(html_files))
+
+    elapsed = time.perf_counter() - start
+    if results:
+        print(f"共处理 {len(results)} 个页面，用时 {elapsed:.1f} 秒，"
+              f"{len(results) / max(elapsed, 1e-9):.2f} 页/秒（并发 {jobs}，批量 {batch_size}）")
+    if incremental:
+        print(f"增量模式: 转换 {len(results)} 个，跳过 {skipped_fresh + skipped_checkpoint} 个"
+              f"（PDF已是最新 {skipped_fresh} 个，检查点中已处理 {skipped_checkpoint} 个）")
+    succeeded = sum(results)
+    return succeeded, len(results) - succeeded
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将目录中的HTML文件转换为PDF并删除原始文件")
     # 指定要处理的目录
-    target_directory = r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛"
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要处理的目录")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="同时进行转换的任务数，默认为CPU核数")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="每个 wkhtmltopdf 进程批量转换的文件数，默认为 1（每个文件单独启动）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量模式：跳过PDF已是最新的文件，中断后再次运行从中断处继续")
+    parser.add_argument("--dedup", choices=DEDUP_ACTIONS, default=None,
+                        help="转换前查找内容相同的HTML文件：report 只报告，link 替换为硬链接，drop 删除副本")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    target_directory = args.directory
 
     if not os.path.isdir(target_directory):
         print("错误: 指定的路径不是一个有效的目录!")
@@ -112,6 +405,12 @@ if __name__ == "__main__":
 
     print(f"开始处理目录: {target_directory}")
     print("将把所有HTML文件(.htm, .html)转换为PDF并删除原始文件")
+    if args.dedup:
+        deduplicate(target_directory, action=args.dedup, workers=args.jobs, extensions={".htm", ".html"})
 
-    convert_html_files_in_directory(target_directory)
-    print("处理完成!")
+    succeeded, failed = convert_html_files_in_directory(target_directory, jobs=args.jobs,
+                                                        batch_size=args.batch_size,
+                                                        incremental=args.incremental)
+    METRICS.close()
+    print(METRICS.summary())
+    print(f"处理完成! 成功 {succeeded} 个，失败 {failed} 个")
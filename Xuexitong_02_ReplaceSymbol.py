@@ -1,27 +1,211 @@
 import os
 import re
+import time
+import random
+import argparse
+from Xuexitong_NameIndex import DirectoryNameIndex
+from Xuexitong_Metrics import METRICS, add_arguments, configure_from_args
+from Xuexitong_RenameExecutor import RenameExecutor, add_arguments as add_journal_arguments, journal_from_args
 
 # 要替换的特殊符号列表
 SPECIAL_CHARS = r'~!@#$%^&*+<>?:"{},\\;\[\]/ '
 
+# 要替换的全角中文标点（全角空格也算在内）
+FULLWIDTH_CHARS = "，。、；：？！“”‘’【】《》「」『』～＃＄％＆＊＋＜＞＼／｛｝\u3000"
+
+# Windows 保留的设备名，不区分大小写，带扩展名也不能使用
+WINDOWS_RESERVED_NAMES = frozenset(["CON", "PRN", "AUX", "NUL"] +
+                                   [f"COM{i}" for i in range(1, 10)] +
+                                   [f"LPT{i}" for i in range(1, 10)])
+
+# 单个文件名的最大长度：Linux 等按 UTF-8 编码后的字节数计算（ext4 为 255 字节，中文每个字符占 3 字节），
+# Windows（NTFS）按 UTF-16 编码单元计算
+MAX_NAME_LENGTH = 255
+NAME_ENCODING = ("utf-16-le", 2, "surrogatepass") if os.name == "nt" else ("utf-8", 1, "surrogateescape")
+
+# 截断名称时为重名后缀 _数字 预留的长度
+SUFFIX_RESERVE = 6
+
 # 构造正则表达式：匹配上述任意一个字符
 pattern = re.compile(f"[{re.escape(SPECIAL_CHARS)}]")
 
-def clean_name(name):
+
+def encoded_length(name):
+    """
+    返回名称按文件系统计算的长度（见 NAME_ENCODING）
+    """
+    encoding, width, errors = NAME_ENCODING
+    return len(name.encode(encoding, errors)) // width
+
+
+def truncate_encoded(text, limit):
+    """
+    返回编码后长度不超过 limit 的最长前缀，不会截断在多字节字符中间
+    """
+    encoding, width, errors = NAME_ENCODING
+    data = text.encode(encoding, errors)
+    if len(data) <= limit * width:
+        return text
+    return data[:max(limit, 0) * width].decode(encoding, "ignore")
+
+
+def clean_name_regex(name):
     """
-    将名称中的特殊字符替换为下划线，并合并多个下划线为一个
+    原来的实现：先用正则替换特殊字符，再用第二个正则合并下划线。保留用于基准对比
     """
-    # 替换所有特殊字符为下划线
     new_name = pattern.sub("_", name)
-    # 合并连续的下划线
     new_name = re.sub(r'_+', '_', new_name)
     return new_name
 
-def get_unique_name(directory, new_name):
+
+class NameNormalizer:
+    """
+    名称规范化规则：要替换为同一字符串的字符编译成一个字符类正则，连同替换符本身一起匹配，
+    一次 sub 同时完成替换与合并连续替换符；其他替换规则放在一张 str.translate 转换表中。
+    之后再按需处理 Windows 保留名、结尾的点和空格以及长度限制。
+    :param chars: 要替换为 replacement 的字符
+    :param replacement: 替换成的字符串
+    :param mapping: 额外的 {字符: 替换结果} 规则，在 chars 之前应用
+    :param collapse: 是否把连续的 replacement 合并为一个
+    :param reserved: 是否在 Windows 保留设备名后加 replacement
+    :param strip_trailing: 是否去掉结尾的点和空格（Windows 不允许）
+    :param max_length: 名称编码后的最大长度（见 NAME_ENCODING），超出时截断主文件名并保留扩展名，
+                       同时为重名后缀预留 SUFFIX_RESERVE；None 表示不限制
+    :param max_path: 完整路径的最大长度（如 Windows 的 260）；None 表示不限制
+    """
+
+    def __init__(self, chars=SPECIAL_CHARS + FULLWIDTH_CHARS, replacement="_", mapping=None,
+                 collapse=True, reserved=True, strip_trailing=True,
+                 max_length=MAX_NAME_LENGTH, max_path=None):
+        self.table = {ord(ch): value for ch, value in (mapping or {}).items()}
+        self.replacement = replacement
+        char_class = f"[{re.escape(''.join(sorted(set(chars))))}]" if chars else None
+        if collapse and replacement:
+            if len(replacement) == 1:
+                char_class = f"[{re.escape(''.join(sorted(set(chars + replacement))))}]"
+            elif char_class:
+                char_class = f"(?:{char_class}|{re.escape(replacement)})"
+            else:
+                char_class = f"(?:{re.escape(replacement)})"
+            self.pattern = re.compile(f"{char_class}+")
+        elif char_class:
+            self.pattern = re.compile(f"{char_class}+" if not replacement else char_class)
+        else:
+            self.pattern = None
+        self.reserved = reserved
+        self.strip_trailing = strip_trailing
+        self.max_length = max_length
+        self.max_path = max_path
+        # 批量处理时用换行拼接名称，换行本身不能被规则替换
+        self.batch_safe = "\n" not in chars and ord("\n") not in self.table
+
+    def _translate(self, text):
+        if self.table:
+            text = text.translate(self.table)
+        if self.pattern is not None:
+            text = self.pattern.sub(self.replacement, text)
+        return text
+
+    def _limit(self, directory):
+        """
+        完整路径长度限制留给名称的字符数，None 表示不限制
+        """
+        if self.max_path and directory is not None:
+            return self.max_path - len(os.path.join(directory, ""))
+        return None
+
+    def _fits(self, name, limit, reserve=0):
+        if limit is not None and len(name) + reserve > limit:
+            return False
+        # 每个字符编码后最多 4 个单位，较短的名称不需要编码
+        if self.max_length is not None and len(name) * 4 + reserve > self.max_length:
+            return encoded_length(name) + reserve <= self.max_length
+        return True
+
+    def _truncate(self, name, limit, reserve):
+        base, ext = os.path.splitext(name)
+        if not self._fits(ext, limit, reserve):
+            base, ext = name, ""
+        if limit is not None:
+            base = base[:max(limit - reserve - len(ext), 0)]
+        if self.max_length is not None:
+            base = truncate_encoded(base, self.max_length - reserve - encoded_length(ext))
+        return base + ext
+
+    def fits(self, name, directory=None):
+        """
+        名称（和完整路径）是否在长度限制之内
+        """
+        return self._fits(name, self._limit(directory))
+
+    def shorten(self, name, directory=None):
+        """
+        截断名称，为重名后缀预留 SUFFIX_RESERVE 的长度
+        """
+        return self._truncate(name, self._limit(directory), SUFFIX_RESERVE)
+
+    def _finish(self, name, limit):
+        """
+        转换表之后逐个名称处理的规则，多数名称只经过几次字符串判断
+        """
+        if self.strip_trailing and name[-1:] in (".", " "):
+            name = name.rstrip(". ") or self.replacement or "_"
+        if self.reserved:
+            base = name.partition(".")[0]
+            if len(base) <= 4 and base.upper() in WINDOWS_RESERVED_NAMES:
+                name = base + (self.replacement or "_") + name[len(base):]
+        if not self._fits(name, limit) and (limit is None or limit > 0):
+            # 路径剩余长度很小时不再预留后缀
+            reserve = SUFFIX_RESERVE if limit is None or limit > 2 * SUFFIX_RESERVE else 0
+            name = self._truncate(name, limit, reserve)
+        return name
+
+    def normalize(self, name, directory=None):
+        """
+        规范化单个名称；提供 directory 时同时检查完整路径长度
+        """
+        return self._finish(self._translate(name), self._limit(directory))
+
+    def normalize_many(self, names, directory=None):
+        """
+        批量规范化一个目录中的全部名称，返回与 names 顺序对应的新名称列表。
+        名称用换行拼接后整体转换、合并一次，避免逐个名称调用
+        """
+        names = list(names)
+        if not names:
+            return []
+        limit = self._limit(directory)
+        joined = "\n".join(names)
+        if not self.batch_safe or joined.count("\n") != len(names) - 1:
+            return [self._finish(self._translate(name), limit) for name in names]
+        return [self._finish(name, limit) for name in self._translate(joined).split("\n")]
+
+    def plan(self, names, directory=None):
+        """
+        返回名称会改变的 (原名称, 新名称) 列表；新名称尚未处理重名
+        """
+        names = list(names)
+        return [(old, new) for old, new in zip(names, self.normalize_many(names, directory))
+                if old != new]
+
+
+DEFAULT_NORMALIZER = NameNormalizer()
+
+
+def clean_name(name):
+    """
+    将名称中的特殊字符和全角标点替换为下划线，并合并多个下划线为一个
+    """
+    return DEFAULT_NORMALIZER.normalize(name)
+
+def get_unique_name(directory, new_name, index=None):
     """
     检查目标目录中是否已存在相同名称的文件/文件夹，如果存在，则在结尾加 _数字 直到不冲突
+    传入该目录的 DirectoryNameIndex 时直接在内存中判断，不再逐个访问文件系统
     """
     base, ext = os.path.splitext(new_name)
+    if index is not None:
+        return index.unique_name(base, ext)
     candidate = new_name
     counter = 1
     while os.path.exists(os.path.join(directory, candidate)):
@@ -29,47 +213,126 @@ def get_unique_name(directory, new_name):
         counter += 1
     return candidate
 
-def rename_recursively(root_dir):
+def rename_recursively(root_dir, manifest=None, normalizer=None, journal=None):
     """
     递归遍历目录（从最深层开始），对所有文件和文件夹进行重命名
+    先遍历整个目录树得到重命名计划，再由 RenameExecutor 统一执行
+    传入目录清单 TreeManifest 时从清单遍历并同步更新清单，不再重新遍历目录
+    normalizer 为 NameNormalizer，默认使用 DEFAULT_NORMALIZER
+    传入重命名日志 RenameJournal 时可继续执行或撤销中断的运行
     """
+    if normalizer is None:
+        normalizer = DEFAULT_NORMALIZER
+    executor = RenameExecutor(step="清理名称", journal=journal)
     # 使用topdown=False确保先处理子文件夹，再处理父文件夹
-    for current_root, dirs, files in os.walk(root_dir, topdown=False):
-        # 先处理文件
-        for filename in files:
-            old_path = os.path.join(current_root, filename)
-            new_filename = clean_name(filename)
-            # 如果名称未改变则跳过
-            if new_filename == filename:
-                continue
-            # 检查是否存在重名
-            new_filename = get_unique_name(current_root, new_filename)
-            new_path = os.path.join(current_root, new_filename)
-            try:
-                os.rename(old_path, new_path)
-                print(f"重命名文件: {old_path} -> {new_path}")
-            except Exception as e:
-                print(f"重命名文件 {old_path} 时出错: {e}")
-
-        # 再处理目录
-        for dirname in dirs:
-            old_dir_path = os.path.join(current_root, dirname)
-            new_dirname = clean_name(dirname)
-            if new_dirname == dirname:
-                continue
-            new_dirname = get_unique_name(current_root, new_dirname)
-            new_dir_path = os.path.join(current_root, new_dirname)
-            try:
-                os.rename(old_dir_path, new_dir_path)
-                print(f"重命名文件夹: {old_dir_path} -> {new_dir_path}")
-            except Exception as e:
-                print(f"重命名文件夹 {old_dir_path} 时出错: {e}")
+    if manifest is not None:
+        walker = manifest.walk(root_dir, topdown=False)
+    else:
+        walker = os.walk(root_dir, topdown=False)
+    for current_root, dirs, files in walker:
+        # 用遍历得到的目录列表建立名称索引，判断重名时不再访问文件系统
+        index = DirectoryNameIndex.from_listing(current_root, dirs + files)
+        # 先处理文件，再处理目录；整个目录的名称一次批量规范化，只返回需要改名的
+        for names, kind in ((files, "文件"), (dirs, "文件夹")):
+            for old_name, new_name in normalizer.plan(names, current_root):
+                # 检查是否存在重名；重名后缀使名称超出长度限制时，先截断再加后缀
+                unique_name = get_unique_name(current_root, new_name, index=index)
+                if unique_name != new_name and not normalizer.fits(unique_name, current_root):
+                    unique_name = get_unique_name(current_root, normalizer.shorten(new_name, current_root),
+                                                  index=index)
+                new_name = unique_name
+                index.rename(old_name, new_name)
+                executor.add(current_root, old_name, new_name, kind=kind)
+    executor.apply(on_renamed=manifest.rename if manifest is not None else None)
+
+
+def make_name_corpus(count, seed=0):
+    """
+    生成用于基准测试的名称：中文、英文、数字与特殊符号、全角标点混合，约三分之一不含需替换的字符
+    """
+    rng = random.Random(seed)
+    words = ["学生竞赛", "教学与人才培养", "附件", "证明材料", "report", "final", "2025",
+             "v2", "汇总表", "申报书", "第一版", "copy"]
+    seps = [" ", "_", "-", "【", "】", "，", "：", "(", ")", "#", "&", "__", "+", "？", "  "]
+    exts = [".pdf", ".docx", ".xlsx", ".html", ".pptx", ""]
+    names = []
+    for _ in range(count):
+        parts = rng.sample(words, rng.randint(2, 4))
+        if rng.random() < 0.35:
+            name = "_".join(parts)
+        else:
+            name = "".join(part + rng.choice(seps) for part in parts)
+        names.append(name + rng.choice(exts))
+    return names
+
+
+def benchmark(count=1_000_000, seed=0):
+    """
+    比较原来两次正则的 clean_name 与 NameNormalizer（逐个与批量）的速度，输出每秒处理的名称数量。
+    同时检查只使用原规则的 NameNormalizer 与原实现结果完全一致
+    """
+    names = make_name_corpus(count, seed)
+    compat = NameNormalizer(chars=SPECIAL_CHARS, reserved=False, strip_trailing=False, max_length=None)
+    cases = [
+        ("两次正则（原实现）", lambda: [clean_name_regex(name) for name in names]),
+        ("编译规则，逐个名称", lambda: [compat.normalize(name) for name in names]),
+        ("编译规则，批量", lambda: compat.normalize_many(names)),
+        ("完整规则，批量", lambda: DEFAULT_NORMALIZER.normalize_many(names)),
+    ]
+    results = {}
+    baseline = None
+    print(f"名称数量: {count}")
+    for label, run in cases:
+        start = time.perf_counter()
+        output = run()
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else float("inf")
+        results[label] = rate
+        if baseline is None:
+            baseline = rate
+            reference = output
+        elif label.startswith("编译规则") and output != reference:
+            print(f"警告: {label} 的结果与原实现不一致")
+        print(f"{label:<12} {elapsed:8.3f} 秒  {rate:12,.0f} 个/秒  {rate / baseline:5.2f}x")
+    return results
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将文件名和目录名中的特殊符号替换为下划线")
     # 指定要处理的目录，修改为你需要操作的目录路径
-    target_directory = r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛"
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要处理的目录")
+    parser.add_argument("--max-path", type=int, default=None,
+                        help="完整路径的最大长度（如 Windows 的 260），超出时截断名称")
+    parser.add_argument("--keep-reserved", action="store_true",
+                        help="不处理 Windows 保留设备名和结尾的点、空格")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=1_000_000, default=None, metavar="N",
+                        help="不处理目录，用 N 个生成的名称（默认一百万）比较新旧实现的速度")
+    add_arguments(parser)
+    add_journal_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    if args.benchmark is not None:
+        if args.benchmark <= 0:
+            parser.error("--benchmark 的名称数量必须为正整数")
+        benchmark(args.benchmark)
+        exit(0)
+
+    target_directory = args.directory
     if not os.path.isdir(target_directory):
         print("错误: 指定的路径不是一个有效的目录!")
         exit(1)
-    rename_recursively(target_directory)
+    normalizer = NameNormalizer(reserved=not args.keep_reserved,
+                                strip_trailing=not args.keep_reserved,
+                                max_path=args.max_path)
+    journal = journal_from_args(args, target_directory)
+    try:
+        rename_recursively(target_directory, normalizer=normalizer, journal=journal)
+    finally:
+        if journal is not None:
+            journal.close()
+        METRICS.close()
+    print(METRICS.summary())
     print("处理完成!")
@@ -1,5 +1,18 @@
 import os
 import re
+import time
+import sqlite3
+import hashlib
+import argparse
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from Xuexitong_OOXMLStream import iter_docx_text, iter_pptx_text, iter_xlsx_text
+from Xuexitong_OLE2Reader import iter_doc_text, iter_ppt_text, iter_xls_text
+from Xuexitong_NameIndex import DirectoryNameIndex
+from Xuexitong_Decode import decode_file, iter_decoded_chunks
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
+from Xuexitong_RenameExecutor import RenameExecutor, add_arguments as add_journal_arguments, journal_from_args
+from Xuexitong_Supervisor import SupervisedExtractor, Quarantine, DEFAULT_TIMEOUT, DEFAULT_MEMORY_MB
 
 # 允许处理的文件扩展名（全部转为小写判断）
 ALLOWED_EXTENSIONS = {".txt", ".html", ".htm",
@@ -7,41 +20,30 @@ ALLOWED_EXTENSIONS = {".txt", ".html", ".htm",
                       ".pptx", ".ppt",
                       ".xlsx", ".xls"}
 
+# 受监督解析失败（超时、内存超限、崩溃）时的提取结果，这类文件不重命名
+EXTRACTION_FAILED = object()
+
 def read_text_file(file_path):
     """
-    尝试以 UTF-8 编码读取文本文件，失败后使用 GBK 读取
+    读取文本文件并自动判断编码（BOM、<meta charset>、UTF-8/GB18030/Big5），文件只读取一次
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='gbk') as f:
-                return f.read()
-        except Exception as e:
-            print(f"读取 {file_path} 时出错: {e}")
+        return decode_file(file_path)[0]
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
     return ""
 
 def get_docx_text(file_path):
     """
-    使用 python-docx 提取 docx 文件内容
+    直接解析 docx 压缩包中的 XML 提取文件内容
     """
     try:
-        import docx
-    except ImportError:
-        print("请安装 python-docx 库以解析 Word 文件: pip install python-docx")
-        return ""
-    try:
-        doc = docx.Document(file_path)
-        paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-        return "\n".join(paragraphs)
+        return "\n".join(iter_docx_text(file_path))
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
         return ""
 
-def get_doc_text(file_path):
+def get_doc_text_com(file_path):
     """
     使用 win32com 提取 doc 文件内容（需要 Windows 环境和 Office 支持）
     """
@@ -59,7 +61,7 @@ def get_doc_text(file_path):
         text = doc.Content.Text
         doc.Close(False)
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
     finally:
         if word:
             word.Quit()
@@ -67,26 +69,15 @@ def get_doc_text(file_path):
 
 def get_pptx_text(file_path):
     """
-    使用 python-pptx 读取 pptx 文件内容
+    直接解析 pptx 压缩包中的 XML 读取文件内容
     """
     try:
-        from pptx import Presentation
-    except ImportError:
-        print("请安装 python-pptx 库以解析 PPT 文件: pip install python-pptx")
-        return ""
-    try:
-        prs = Presentation(file_path)
-        texts = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    texts.append(shape.text)
-        return "\n".join(texts)
+        return "\n".join(iter_pptx_text(file_path))
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
         return ""
 
-def get_ppt_text(file_path):
+def get_ppt_text_com(file_path):
     """
     使用 win32com 提取 ppt 文件内容（需要 Windows 环境和 Office 支持）
     """
@@ -110,7 +101,7 @@ def get_ppt_text(file_path):
         text = "\n".join(texts)
         presentation.Close()
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
     finally:
         if powerpoint:
             powerpoint.Quit()
@@ -118,28 +109,15 @@ def get_ppt_text(file_path):
 
 def get_xlsx_text(file_path):
     """
-    使用 openpyxl 读取 xlsx 文件内容
+    直接解析 xlsx 压缩包中的 XML 读取单元格文本
     """
     try:
-        from openpyxl import load_workbook
-    except ImportError:
-        print("请安装 openpyxl 库以解析 Excel 文件: pip install openpyxl")
-        return ""
-    try:
-        wb = load_workbook(file_path, read_only=True, data_only=True)
-        texts = []
-        for sheet in wb:
-            for row in sheet.iter_rows(values_only=True):
-                for cell in row:
-                    if cell is not None:
-                        texts.append(str(cell))
-        wb.close()
-        return "\n".join(texts)
+        return "\n".join(iter_xlsx_text(file_path))
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
         return ""
 
-def get_xls_text(file_path):
+def get_xls_text_com(file_path):
     """
     使用 win32com 提取 xls 文件内容（需要 Windows 环境和 Office 支持）
     """
@@ -166,12 +144,43 @@ def get_xls_text(file_path):
         text = "\n".join(texts)
         workbook.Close(False)
     except Exception as e:
-        print(f"读取 {file_path} 时出错: {e}")
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
     finally:
         if excel:
             excel.Quit()
     return text
 
+def get_legacy_office_text(file_path, native_reader, com_reader):
+    """
+    直接解析复合文档读取 doc/ppt/xls 文件内容，不需要启动 Office；
+    解析失败时在 Windows 上改用 win32com 读取
+    """
+    try:
+        return "\n".join(native_reader(file_path))
+    except Exception as e:
+        if os.name == "nt":
+            return com_reader(file_path)
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
+        return ""
+
+def get_doc_text(file_path):
+    """
+    从 WordDocument 数据流的片段表中提取 doc 文件内容
+    """
+    return get_legacy_office_text(file_path, iter_doc_text, get_doc_text_com)
+
+def get_ppt_text(file_path):
+    """
+    从 PowerPoint Document 数据流的文本记录中提取 ppt 文件内容
+    """
+    return get_legacy_office_text(file_path, iter_ppt_text, get_ppt_text_com)
+
+def get_xls_text(file_path):
+    """
+    从 Workbook 数据流的共享字符串和文本单元格中提取 xls 文件内容
+    """
+    return get_legacy_office_text(file_path, iter_xls_text, get_xls_text_com)
+
 def get_file_text(file_path):
     """
     根据文件扩展名调用不同的解析方法获取文本内容
@@ -206,10 +215,199 @@ def extract_chinese_name(content, min_length=8):
             return seq[:min_length]
     return None
 
-def get_unique_name(directory, new_name, ext):
+# 可以逐段读取文本的格式，匹配到名称后即停止解析
+STREAMING_EXTRACTORS = {".txt": iter_decoded_chunks,
+                        ".html": iter_decoded_chunks,
+                        ".htm": iter_decoded_chunks,
+                        ".docx": iter_docx_text,
+                        ".pptx": iter_pptx_text,
+                        ".xlsx": iter_xlsx_text}
+
+def iter_file_text(file_path):
+    """
+    逐段返回文件文本：文本文件和 docx/pptx/xlsx 边读取边返回，其他格式一次性返回全部内容。
+    各段之间相当于以换行分隔，中文字符序列不会跨段。
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    extractor = STREAMING_EXTRACTORS.get(ext)
+    if extractor is None:
+        yield get_file_text(file_path)
+        return
+    try:
+        yield from extractor(file_path)
+    except Exception as e:
+        METRICS.event("extract_error", f"读取 {file_path} 时出错: {e}", level=INFO, path=file_path)
+
+def extract_chinese_name_from_chunks(chunks, min_length=8):
+    """
+    依次在每段文本中查找符合条件的中文字符序列，找到后立即停止读取后续内容
+    """
+    for chunk in chunks:
+        name = extract_chinese_name(chunk, min_length=min_length)
+        if name:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            return name
+    return None
+
+def extract_name_from_file(file_path, min_length=8):
+    """
+    解析文件内容并提取用于重命名的中文字符串，未提取到时返回 None
+    """
+    return extract_chinese_name_from_chunks(iter_file_text(file_path), min_length=min_length)
+
+def file_fingerprint(file_path, size, chunk_size=64 * 1024):
+    """
+    计算文件内容指纹：只读取文件开头和结尾各 chunk_size 字节，配合文件大小做哈希，
+    避免为了判断文件是否变化而读取整个文件
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    保存 extract_chinese_name 提取结果的 SQLite 缓存。
+    以 路径 + 文件大小 + 修改时间 + 内容指纹 判断文件是否变化，未变化的文件直接使用上次的结果，
+    不再解析文件内容。条目数超过 max_entries 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, db_path, max_entries=200000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extract_cache ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "fingerprint TEXT, result TEXT, last_used REAL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extract_cache_last_used ON extract_cache(last_used)")
+
+    @staticmethod
+    def default_path(root_dir):
+        """
+        缓存文件默认放在目标目录旁边（而不是目录内部），避免被后续步骤当作普通文件处理
+        """
+        return os.path.normpath(os.path.abspath(root_dir)) + ".extract_cache.sqlite"
+
+    def lookup(self, file_path):
+        """
+        查询缓存，返回 (是否命中, 提取结果, 文件标识)；文件标识用于之后调用 store 写入结果。
+        文件被锁定、已消失或无法读取时按未命中处理，文件标识为 None，由解析步骤自行处理该文件
+        """
+        try:
+            st = os.stat(file_path)
+            key = (st.st_size, st.st_mtime_ns, file_fingerprint(file_path, st.st_size))
+        except OSError as e:
+            METRICS.event("extract_cache_error", f"读取 {file_path} 的缓存标识失败: {e}", level=INFO,
+                          path=file_path)
+            self.misses += 1
+            METRICS.count("extract_cache", result="miss")
+            return False, None, None
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, fingerprint, result FROM extract_cache WHERE path = ?",
+            (file_path,)).fetchone()
+        if row is not None and row[:3] == key:
+            self.hits += 1
+            METRICS.count("extract_cache", result="hit")
+            self.conn.execute("UPDATE extract_cache SET last_used = ? WHERE path = ?",
+                              (time.time(), file_path))
+            self._after_write()
+            return True, row[3], key
+        self.misses += 1
+        METRICS.count("extract_cache", result="miss")
+        return False, None, key
+
+    def store(self, file_path, key, result):
+        """
+        写入文件的提取结果；文件标识为 None（查询时无法读取文件）时不写入
+        """
+        if key is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extract_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (file_path, *key, result, time.time()))
+        self._after_write()
+
+    def get_or_extract(self, file_path, extract=extract_name_from_file):
+        """
+        文件未变化时返回缓存的提取结果，否则调用 extract 解析文件并写入缓存
+        """
+        hit, result, key = self.lookup(file_path)
+        if not hit:
+            result = extract(file_path)
+            self.store(file_path, key, result)
+        return result
+
+    def move(self, old_path, new_path):
+        """
+        文件重命名后同步更新缓存中的路径（重命名不改变大小和修改时间）
+        """
+        self.conn.execute("DELETE FROM extract_cache WHERE path = ?", (new_path,))
+        self.conn.execute("UPDATE extract_cache SET path = ? WHERE path = ?", (new_path, old_path))
+        self._after_write()
+
+    def invalidate(self, file_path=None):
+        """
+        删除指定文件的缓存；不指定文件时清空全部缓存
+        """
+        if file_path is None:
+            self.conn.execute("DELETE FROM extract_cache")
+        else:
+            self.conn.execute("DELETE FROM extract_cache WHERE path = ?", (file_path,))
+        self.conn.commit()
+
+    def evict(self):
+        """
+        条目数超过上限时删除最久未使用的条目，返回删除的数量
+        """
+        count = self.conn.execute("SELECT COUNT(*) FROM extract_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM extract_cache WHERE path IN ("
+            "SELECT path FROM extract_cache ORDER BY last_used LIMIT ?)", (excess,))
+        self.conn.commit()
+        return excess
+
+    def _after_write(self, commit_every=500):
+        self._pending += 1
+        if self._pending >= commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        """
+        淘汰超出上限的条目，提交并关闭数据库
+        """
+        evicted = self.evict()
+        self.conn.commit()
+        self.conn.close()
+        return evicted
+
+    def report(self):
+        """
+        返回本次运行的命中统计
+        """
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"提取缓存: 命中 {self.hits} 次，未命中 {self.misses} 次，命中率 {rate:.1f}%"
+
+def get_unique_name(directory, new_name, ext, index=None):
     """
     在指定目录内判断新文件名是否冲突，如有冲突则在文件名末尾添加 _数字 后缀
+    传入该目录的 DirectoryNameIndex 时直接在内存中判断，不再逐个访问文件系统
     """
+    if index is not None:
+        return index.unique_name(new_name, ext)
     candidate = new_name + ext
     counter = 1
     while os.path.exists(os.path.join(directory, candidate)):
@@ -217,44 +415,255 @@ def get_unique_name(directory, new_name, ext):
         counter += 1
     return candidate
 
-def rename_files_by_content(root_dir):
+def iter_rename_candidates(root_dir, listings=None, manifest=None):
     """
-    递归扫描指定目录中所有文件，
-    对于扩展名属于 ALLOWED_EXTENSIONS 且文件名（不含扩展名）长度小于 5 的文件，
-    解析文件内容提取中文连续字符序列，
-    如果提取到，则在原有文件名后追加"_"和提取的字符串作为新文件名（保留原扩展名）；
-    若未提取到，则保持原有文件名不变。
+    按遍历顺序返回需要根据内容重命名的文件：(所在目录, 文件名不含扩展名, 扩展名)
+    传入字典 listings 时，同时记录每个目录的列表（子文件夹和文件名），供建立名称索引使用
+    传入目录清单 TreeManifest 时从清单遍历，不再重新遍历目录
     """
-    for current_root, dirs, files in os.walk(root_dir):
+    walker = manifest.walk(root_dir) if manifest is not None else os.walk(root_dir)
+    for current_root, dirs, files in walker:
+        if listings is not None:
+            listings[current_root] = dirs + files
         for filename in files:
             name, ext = os.path.splitext(filename)
             if ext.lower() not in ALLOWED_EXTENSIONS:
                 continue
             if len(name) >= 6:
                 continue
-            file_path = os.path.join(current_root, filename)
-            print(f"处理文件: {file_path}")
-            content = get_file_text(file_path)
-            append_str = extract_chinese_name(content, min_length=8)
-            if append_str:
-                # 新文件名为 原有文件名 + "_" + 提取的字符串
-                new_base = f"{name}_{append_str}"
+            yield current_root, name, ext
+
+def content_rename_target(current_root, name, ext, append_str, index=None):
+    """
+    根据提取结果计算新文件名（已处理重名）
+    """
+    if append_str:
+        # 新文件名为 原有文件名 + "_" + 提取的字符串
+        new_base = f"{name}_{append_str}"
+    else:
+        # 如果没有提取到，则保持原有文件名
+        new_base = name
+    return get_unique_name(current_root, new_base, ext, index=index)
+
+def apply_content_rename(current_root, name, ext, append_str, cache=None, index=None, manifest=None):
+    """
+    根据提取结果立即重命名单个文件，返回重命名后的路径（失败时返回原路径）
+    """
+    file_path = os.path.join(current_root, name + ext)
+    unique_new_filename = content_rename_target(current_root, name, ext, append_str, index=index)
+    new_file_path = os.path.join(current_root, unique_new_filename)
+    try:
+        with METRICS.timer("rename", step="按内容重命名"):
+            os.rename(file_path, new_file_path)
+    except OSError as e:
+        METRICS.event("rename_error", f"重命名 {file_path} 时出错: {e}", level=INFO, path=file_path)
+        return file_path
+    METRICS.event("rename", f"已将 {file_path} 重命名为 {new_file_path}", src=file_path, dst=new_file_path)
+    # 磁盘上的重命名已经完成，之后更新索引、清单和缓存时出错不算重命名失败
+    if index is not None:
+        index.rename(name + ext, unique_new_filename)
+    if manifest is not None:
+        manifest.rename(file_path, new_file_path)
+    if cache is not None:
+        cache.move(file_path, new_file_path)
+    return new_file_path
+
+def print_progress(done, total, start_time):
+    """
+    在同一行显示进度和预计剩余时间
+    """
+    elapsed = time.perf_counter() - start_time
+    eta = elapsed / done * (total - done) if done else 0.0
+    print(f"\r解析进度: {done}/{total} ({done / total:.0%})，"
+          f"已用 {elapsed:.0f} 秒，预计剩余 {eta:.0f} 秒", end="", flush=True)
+    if done == total:
+        print()
+
+def extract_names_concurrently(file_paths, workers, cache=None, supervisor=None):
+    """
+    第一阶段：用进程池并行解析所有文件，按输入顺序返回提取结果列表。
+    缓存只在主进程中查询和写入，命中的文件不会提交给进程池。
+    传入 SupervisedExtractor 时由受监督的工作进程解析，失败的文件结果为 EXTRACTION_FAILED。
+    """
+    results = [None] * len(file_paths)
+    pending = []
+    keys = {}
+    for index, file_path in enumerate(file_paths):
+        if cache is not None:
+            hit, result, key = cache.lookup(file_path)
+            if hit:
+                results[index] = result
+                continue
+            keys[index] = key
+        pending.append(index)
+
+    if not pending:
+        return results
+    start_time = time.perf_counter()
+    last_report = 0.0
+    paths = [file_paths[index] for index in pending]
+    with ExitStack() as stack:
+        if supervisor is not None:
+            outcomes = ((result if ok else EXTRACTION_FAILED) for ok, result in supervisor.map(paths))
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            outcomes = executor.map(extract_name_from_file, paths, chunksize=8)
+        for done, (index, result) in enumerate(zip(pending, outcomes), 1):
+            results[index] = result
+            if cache is not None and result is not EXTRACTION_FAILED:
+                cache.store(file_paths[index], keys[index], result)
+            now = time.perf_counter()
+            if now - last_report >= 0.5 or done == len(pending):
+                print_progress(done, len(pending), start_time)
+                last_report = now
+    return results
+
+def extract_with_supervisor(file_path, supervisor, cache=None):
+    """
+    逐个处理时的提取：先查缓存，未命中时交给受监督的工作进程解析，失败时返回 EXTRACTION_FAILED
+    """
+    if cache is not None:
+        hit, result, key = cache.lookup(file_path)
+        if hit:
+            return result
+    ok, result = supervisor.run(file_path)
+    if not ok:
+        return EXTRACTION_FAILED
+    if cache is not None:
+        cache.store(file_path, key, result)
+    return result
+
+def rename_files_by_content(root_dir, cache=None, workers=1, manifest=None, supervisor=None, journal=None):
+    """
+    递归扫描指定目录中所有文件，
+    对于扩展名属于 ALLOWED_EXTENSIONS 且文件名（不含扩展名）长度小于 5 的文件，
+    解析文件内容提取中文连续字符序列，
+    如果提取到，则在原有文件名后追加"_"和提取的字符串作为新文件名（保留原扩展名）；
+    若未提取到，则保持原有文件名不变。
+    传入 ExtractionCache 时，未变化的文件直接使用缓存的提取结果。
+    workers 大于 1 时分两阶段处理：先用多个进程并行解析全部文件，
+    再由主线程按遍历顺序依次重命名，保证重名处理的结果与逐个处理时一致。
+    传入目录清单 TreeManifest 时从清单遍历并同步更新清单。
+    传入 SupervisedExtractor 时每个文件在受监督的工作进程中解析（有时间和内存上限），
+    隔离清单中的文件和本次解析失败的文件都不重命名。
+    新文件名在解析过程中确定，全部解析完成后由 RenameExecutor 按目录统一重命名；
+    传入重命名日志 RenameJournal 时可继续执行或撤销中断的运行。
+    """
+    # 每个目录的名称索引由遍历得到的列表建立，判断重名时不再访问文件系统
+    listings = {}
+    indexes = {}
+    quarantine = supervisor.quarantine if supervisor is not None else None
+
+    def index_for(directory):
+        if directory not in indexes:
+            indexes[directory] = DirectoryNameIndex.from_listing(directory, listings.pop(directory))
+        return indexes[directory]
+
+    executor = RenameExecutor(step="按内容重命名", journal=journal)
+
+    def plan(current_root, name, ext, append_str):
+        index = index_for(current_root)
+        new_name = content_rename_target(current_root, name, ext, append_str, index=index)
+        index.rename(name + ext, new_name)
+        executor.add(current_root, name + ext, new_name, kind="文件")
+
+    def on_renamed(file_path, new_file_path):
+        if manifest is not None:
+            manifest.rename(file_path, new_file_path)
+        if cache is not None:
+            cache.move(file_path, new_file_path)
+
+    def candidates():
+        for current_root, name, ext in iter_rename_candidates(root_dir, listings, manifest):
+            path = os.path.join(current_root, name + ext)
+            if quarantine is not None and path in quarantine:
+                METRICS.event("quarantine_skip", f"跳过隔离清单中的文件: {path}", level=INFO, path=path)
+                continue
+            yield current_root, name, ext
+
+    if workers <= 1:
+        for current_root, name, ext in candidates():
+            file_path = os.path.join(current_root, name + ext)
+            METRICS.event("extract", f"处理文件: {file_path}", path=file_path)
+            if supervisor is not None:
+                append_str = extract_with_supervisor(file_path, supervisor, cache)
+                if append_str is EXTRACTION_FAILED:
+                    continue
             else:
-                # 如果没有提取到，则保持原有文件名
-                new_base = name
-            unique_new_filename = get_unique_name(current_root, new_base, ext)
-            new_file_path = os.path.join(current_root, unique_new_filename)
-            try:
-                os.rename(file_path, new_file_path)
-                print(f"已将 {file_path} 重命名为 {new_file_path}")
-            except Exception as e:
-                print(f"重命名 {file_path} 时出错: {e}")
+                with METRICS.timer("extract", ext=ext.lower()):
+                    if cache is not None:
+                        append_str = cache.get_or_extract(file_path)
+                    else:
+                        append_str = extract_name_from_file(file_path)
+            plan(current_root, name, ext, append_str)
+        executor.apply(on_renamed)
+        return
+
+    candidate_list = list(candidates())
+    print(f"共找到 {len(candidate_list)} 个待处理文件，使用 {workers} 个进程解析")
+    file_paths = [os.path.join(current_root, name + ext) for current_root, name, ext in candidate_list]
+    names = extract_names_concurrently(file_paths, workers, cache=cache, supervisor=supervisor)
+    for (current_root, name, ext), append_str in zip(candidate_list, names):
+        if append_str is EXTRACTION_FAILED:
+            continue
+        plan(current_root, name, ext, append_str)
+    executor.apply(on_renamed)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据文件内容中的中文字符串重命名短文件名的文件")
     # 修改为你需要处理的目标目录路径
-    target_directory = r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛"
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要处理的目录")
+    parser.add_argument("--no-cache", action="store_true", help="不使用提取结果缓存")
+    parser.add_argument("--clear-cache", action="store_true", help="运行前清空提取结果缓存")
+    parser.add_argument("--cache-path", default=None, help="缓存文件路径，默认放在目标目录旁边")
+    parser.add_argument("--cache-size", type=int, default=200000, help="缓存最多保留的条目数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行解析文件的进程数，为 1 时逐个处理")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="每个文件的解析时间上限（秒）")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="每个解析进程的内存上限（MB），为 0 时不限制")
+    parser.add_argument("--quarantine-path", default=None, help="隔离清单路径，默认放在目标目录旁边")
+    parser.add_argument("--clear-quarantine", action="store_true", help="运行前清空隔离清单，重新尝试其中的文件")
+    parser.add_argument("--no-supervise", action="store_true",
+                        help="不使用受监督的工作进程（没有时间和内存上限，也不使用隔离清单）")
+    add_arguments(parser)
+    add_journal_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    target_directory = args.directory
     if not os.path.isdir(target_directory):
         print("错误: 指定的路径不是一个有效的目录!")
         exit(1)
-    rename_files_by_content(target_directory)
+    journal = journal_from_args(args, target_directory)
+
+    cache = None
+    if not args.no_cache:
+        cache = ExtractionCache(args.cache_path or ExtractionCache.default_path(target_directory),
+                                max_entries=args.cache_size)
+        if args.clear_cache:
+            cache.invalidate()
+    supervisor = None
+    if not args.no_supervise:
+        quarantine = Quarantine(args.quarantine_path or Quarantine.default_path(target_directory))
+        if args.clear_quarantine:
+            quarantine.clear()
+        supervisor = SupervisedExtractor(args.workers, extract_name_from_file, timeout=args.timeout,
+                                         memory_mb=args.memory_mb or None, quarantine=quarantine)
+    try:
+        rename_files_by_content(target_directory, cache=cache, workers=args.workers, supervisor=supervisor,
+                                journal=journal)
+    finally:
+        if journal is not None:
+            journal.close()
+        if supervisor is not None:
+            supervisor.close()
+            supervisor.quarantine.close()
+            print(supervisor.report())
+        if cache is not None:
+            evicted = cache.close()
+            print(cache.report() + (f"，淘汰 {evicted} 条" if evicted else ""))
+        METRICS.close()
+    print(METRICS.summary())
     print("全部处理完成!")
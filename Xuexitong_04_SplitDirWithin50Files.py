@@ -1,55 +1,81 @@
 import os
-import shutil
-import math
+import argparse
+from Xuexitong_Split import (StreamingSplitter, scan_file_sizes, pack_balanced, pack_stable, move_into_buckets,
+                             numbered_bucket_path)
 
+# 拆分方式：stream 按遍历顺序每 max_files 个一组；balance 按大小均衡装箱；stable 按文件名顺序装箱
+SPLIT_MODES = ("stream", "balance", "stable")
 
-def split_folder_if_needed(folder, max_files=50):
+
+def split_folder_if_needed(folder, max_files=50, manifest=None, max_bytes=None, mode="stream"):
     """
     检查指定文件夹下的文件数量（不含子文件夹），如果超过 max_files，则拆分为多个子文件夹，
-    拆分后的子文件夹名称为原文件夹名称 + 下划线 + 编号。
+    拆分后的子文件夹名称为原文件夹名称 + 下划线 + 编号，编号接在已有的同名编号子文件夹之后。
+    mode 为 stream 时用 os.scandir 边遍历边移动，只缓存前 max_files + 1 个文件名，适合文件数量极多的目录；
+    mode 为 balance 或 stable 时按文件大小装箱，每个子文件夹同时不超过 max_files 个文件和 max_bytes 字节，
+    总大小超过 max_bytes 时即使文件数不多也会拆分。
+    传入目录清单 TreeManifest 时从清单读取文件列表和大小，并同步更新清单。
+    返回拆分出的子文件夹列表，无需拆分时返回空列表。
     """
-    # 获取当前目录下所有文件（不包括子目录）
-    files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-    num_files = len(files)
-
-    if num_files > max_files:
-        # 获取当前文件夹名称
-        original_folder_name = os.path.basename(folder)
-        # 计算需要拆分的子文件夹数量
-        num_splits = math.ceil(num_files / max_files)
-        print(f"目录 {folder} 中有 {num_files} 个文件，需要拆分为 {num_splits} 个子文件夹。")
-
-        # 创建拆分用的子文件夹
-        split_folders = []
-        for i in range(1, num_splits + 1):
-            # 子文件夹名称为 原文件夹名称 + 下划线 + 序号
-            new_folder = os.path.join(folder, f"{original_folder_name}_{i}")
-            os.makedirs(new_folder, exist_ok=True)
-            split_folders.append(new_folder)
-
-        # 将文件依次分配到各个拆分子文件夹中，每个子文件夹内文件数量不超过 max_files
-        for index, filename in enumerate(files):
-            src = os.path.join(folder, filename)
-            # 根据文件的序号计算目标子文件夹的索引
-            target_index = index // max_files
-            dst = os.path.join(split_folders[target_index], filename)
-            shutil.move(src, dst)
-            print(f"移动文件 {src} -> {dst}")
-
-
-def process_directory(root_dir):
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"未知的拆分方式: {mode}")
+    # 获取当前文件夹名称，子文件夹名称为 原文件夹名称 + 下划线 + 序号
+    original_folder_name = os.path.basename(folder)
+    bucket_path = numbered_bucket_path(folder, original_folder_name)
+
+    if mode == "stream":
+        splitter = StreamingSplitter(folder, bucket_path, max_files=max_files,
+                                     threshold=max_files, manifest=manifest)
+        split_folders = splitter.run()
+        if split_folders:
+            print(f"目录 {folder} 中有 {splitter.moved} 个文件，已拆分为 {len(split_folders)} 个子文件夹。")
+        return split_folders
+
+    sizes = scan_file_sizes(folder, manifest)
+    total = sum(size for _, size in sizes)
+    if len(sizes) <= max_files and (not max_bytes or total <= max_bytes):
+        return []
+    pack = pack_balanced if mode == "balance" else pack_stable
+    buckets = pack(sizes, max_files, max_bytes)
+    print(f"目录 {folder} 中有 {len(sizes)} 个文件，共 {total / 1024 / 1024:.1f} MB，"
+          f"需要拆分为 {len(buckets)} 个子文件夹。")
+    if max_bytes:
+        for name, size in sizes:
+            if size > max_bytes:
+                print(f"警告: 文件 {name} 大小超过单个文件夹上限，单独放入一个子文件夹")
+    return move_into_buckets(folder, buckets, bucket_path, manifest=manifest)
+
+
+def process_directory(root_dir, manifest=None, max_files=50, max_bytes=None, mode="stream"):
     """
     递归遍历目录，对每个目录调用 split_folder_if_needed 函数，
     使用 topdown=False 以确保先处理深层目录，再处理父目录。
+    传入目录清单 TreeManifest 时从清单遍历，不再重新遍历目录。
     """
-    for current_dir, subdirs, files in os.walk(root_dir, topdown=False):
-        split_folder_if_needed(current_dir)
+    if manifest is not None:
+        walker = manifest.walk(root_dir, topdown=False)
+    else:
+        walker = os.walk(root_dir, topdown=False)
+    for current_dir, subdirs, files in walker:
+        split_folder_if_needed(current_dir, max_files=max_files, manifest=manifest,
+                               max_bytes=max_bytes, mode=mode)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把文件过多的文件夹拆分为多个子文件夹")
     # 指定目标目录（路径前加 r 避免转义问题）
-    target_directory = r"C:\迅雷下载\【赠送】10000套大学生创新创业计划书word成品互联网+大赛ppt模板商业策划书撰写"
+    parser.add_argument("directory", nargs="?",
+                        default=r"C:\迅雷下载\【赠送】10000套大学生创新创业计划书word成品互联网+大赛ppt模板商业策划书撰写",
+                        help="要处理的目录")
+    parser.add_argument("--max-files", type=int, default=50, help="每个子文件夹最多的文件数")
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="每个子文件夹的总大小上限（MB），指定后默认按大小均衡装箱")
+    parser.add_argument("--mode", choices=SPLIT_MODES, default=None,
+                        help="拆分方式：stream 按顺序分组（不考虑大小），balance 按大小均衡，stable 按文件名顺序装箱")
+    args = parser.parse_args()
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    mode = args.mode or ("balance" if max_bytes else "stream")
 
-    process_directory(target_directory)
+    process_directory(args.directory, max_files=args.max_files, max_bytes=max_bytes, mode=mode)
 
     print("处理完成。")
@@ -1,55 +1,94 @@
 import os
-import shutil
-import math
+import re
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import argparse
+from collections import Counter
+from Xuexitong_Split import StreamingSplitter, numbered_bucket_path, iter_file_names
+from Xuexitong_HTTPUpload import HTTPUploader
+from Xuexitong_UploadLedger import UploadLedger
+from Xuexitong_Dedup import deduplicate, ACTIONS as DEDUP_ACTIONS
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
+
+# 网页上传列表中已上传完成的文件条目，其文本为文件名（请根据实际页面修改）
+UPLOAD_DONE_SELECTOR = ".upload-list .upload-success .file-name"
+
+# 等待一个文件夹上传完成的最长秒数
+UPLOAD_TIMEOUT = 600
 
 
 def split_files_into_folders(source_folder, max_files=50):
     """
     将 source_folder 中的所有文件（不递归子目录）分批移动到多个新文件夹中，
     每个新文件夹内的文件数不超过 max_files。新文件夹名称保留原文件夹名称，
-    在末尾添加下划线和编号。
+    在末尾添加下划线和编号（接在之前运行已创建的编号之后）。文件边遍历边移动，不先读出完整的文件列表。
 
     返回所有新创建的子文件夹路径列表。
     """
-    # 获取当前目录下所有文件（不包括子文件夹）
-    files = [os.path.join(source_folder, f) for f in os.listdir(source_folder) if
-             os.path.isfile(os.path.join(source_folder, f))]
-    num_files = len(files)
-    if num_files == 0:
-        return []
+    # 分批文件夹名称格式为 原文件夹名称_序号
+    original_name = os.path.basename(source_folder)
+    parent_dir = os.path.dirname(source_folder)
+    splitter = StreamingSplitter(source_folder, numbered_bucket_path(parent_dir, original_name),
+                                 max_files=max_files)
+    batch_folders = splitter.run()
+    if batch_folders:
+        print(f"源文件夹 '{source_folder}' 中共有 {splitter.moved} 个文件，已分成 {len(batch_folders)} 个子文件夹。")
+    return batch_folders
 
-    num_splits = math.ceil(num_files / max_files)
-    print(f"源文件夹 '{source_folder}' 中共有 {num_files} 个文件，需要分成 {num_splits} 个子文件夹。")
 
-    # 创建分批文件夹，名称格式为 原文件夹名称_序号
+def existing_batch_folders(source_folder):
+    """
+    返回之前运行时已经分好批的文件夹（源文件夹旁边的 原文件夹名称_序号），按序号排序，
+    用于上传中断后重新运行时继续上传
+    """
     original_name = os.path.basename(source_folder)
     parent_dir = os.path.dirname(source_folder)
-    batch_folders = []
-    for i in range(1, num_splits + 1):
-        new_folder = os.path.join(parent_dir, f"{original_name}_{i}")
-        os.makedirs(new_folder, exist_ok=True)
-        batch_folders.append(new_folder)
-
-    # 按序号将文件移动到各个子文件夹中
-    for index, file_path in enumerate(files):
-        target_folder = batch_folders[index // max_files]
-        dst = os.path.join(target_folder, os.path.basename(file_path))
-        shutil.move(file_path, dst)
-        print(f"移动文件：{file_path} -> {dst}")
+    pattern = re.compile(rf"{re.escape(original_name)}_(\d+)")
+    folders = []
+    with os.scandir(parent_dir) as it:
+        for entry in it:
+            match = pattern.fullmatch(entry.name)
+            if match and entry.is_dir():
+                folders.append((int(match.group(1)), entry.path))
+    return [path for _, path in sorted(folders)]
 
-    return batch_folders
+
+def _done_markers(driver):
+    """
+    返回页面上传列表中各文件名已完成的次数
+    """
+    from selenium.webdriver.common.by import By
+    return Counter(element.text.strip() for element in driver.find_elements(By.CSS_SELECTOR, UPLOAD_DONE_SELECTOR))
 
 
-def upload_folder(driver, folder_path):
+def wait_for_upload(driver, names, before, timeout=UPLOAD_TIMEOUT, poll=2):
+    """
+    等待上传列表中这些文件出现新的完成标记（与提交前的 before 相比），
+    返回已确认上传完成的文件名集合；超时时只返回已确认的部分
+    """
+    pending = set(names)
+    confirmed = set()
+    deadline = time.monotonic() + timeout
+    while True:
+        done = _done_markers(driver)
+        for name in list(pending):
+            if done[name] > before[name]:
+                pending.discard(name)
+                confirmed.add(name)
+        if not pending or time.monotonic() >= deadline:
+            return confirmed
+        time.sleep(poll)
+
+
+def upload_folder(driver, folder_path, timeout=UPLOAD_TIMEOUT):
     """
     利用 Selenium 模拟操作，将一个文件夹上传到超星学习通网盘。
-    假定页面中存在点击上传的按钮及支持文件夹上传的 <input type="file" webkitdirectory> 控件。
+    假定页面中存在点击上传的按钮及支持文件夹上传的 <input type="file" webkitdirectory> 控件，
+    上传列表中每个完成的文件有一个完成标记（UPLOAD_DONE_SELECTOR）。
+    等待各文件的完成标记出现，返回已确认上传完成的文件名集合；提交失败时返回 None。
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     try:
         # 点击上传按钮，打开上传窗口
         upload_button = driver.find_element(By.ID, "uploadBtn")
@@ -61,35 +100,131 @@ def upload_folder(driver, folder_path):
         )
 
         # 直接发送文件夹路径进行上传
+        names = list(iter_file_names(folder_path))
+        before = _done_markers(driver)
         file_input.send_keys(folder_path)
-        print(f"开始上传文件夹：{folder_path}")
-
-        # 根据实际情况等待上传完成
-        time.sleep(5)
+        METRICS.event("upload_start", f"开始上传文件夹：{folder_path}", level=INFO, folder=folder_path)
     except Exception as e:
-        print(f"上传文件夹 {folder_path} 时出错：{e}")
+        METRICS.event("upload_error", f"上传文件夹 {folder_path} 时出错：{e}", level=INFO, folder=folder_path)
+        return None
+
+    # 以页面上的完成标记为准，不再固定等待几秒就当作上传完成
+    confirmed = wait_for_upload(driver, names, before, timeout=timeout)
+    if len(confirmed) < len(names):
+        METRICS.event("upload_unconfirmed",
+                      f"文件夹 {folder_path} 中有 {len(names) - len(confirmed)} 个文件在 {timeout} 秒内未确认上传完成",
+                      level=INFO, folder=folder_path, unconfirmed=len(names) - len(confirmed))
+    return confirmed
 
 
-def batch_upload_folders(driver, folders):
+def _folder_files(folder, ledger):
+    """
+    返回文件夹中各文件的 [(内容哈希, 大小, 文件名)]
+    """
+    files = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.is_file():
+                st = entry.stat()
+                files.append((ledger.hash_file(entry.path, st.st_size, st.st_mtime_ns), st.st_size, entry.name))
+    return files
+
+
+def batch_upload_folders(driver, folders, ledger=None):
     """
     依次将列表中的每个文件夹上传到网盘。每次上传一个文件夹。
+    提供上传记录 UploadLedger 时，所有文件的内容都已上传过的文件夹直接跳过
+    （浏览器只能整体上传文件夹，因此按文件夹跳过）；提交后文件先登记为未确认，
+    页面显示上传完成的文件才记入上传记录，未确认的文件重新运行时会再次上传。
     """
     for folder in folders:
-        upload_folder(driver, folder)
+        files = None
+        if ledger is not None:
+            files = _folder_files(folder, ledger)
+            if all(ledger.lookup(digest) for digest, _, _ in files):
+                for digest, size, name in files:
+                    ledger.claim(digest, size, os.path.basename(folder), name)
+                METRICS.event("upload_skip", f"文件夹 {folder} 中的文件均已上传，跳过", level=INFO, folder=folder)
+                continue
+        if ledger is not None:
+            ledger.submit([(digest, size, os.path.basename(folder), name) for digest, size, name in files])
+        confirmed = upload_folder(driver, folder)
+        if not confirmed:
+            continue
+        if ledger is not None:
+            ledger.record([(digest, size, os.path.basename(folder), name)
+                           for digest, size, name in files if name in confirmed])
         # 每次上传后等待一段时间（根据实际情况调整）
         time.sleep(5)
 
 
+def http_upload_folders(folders, url, cookie=None, pool_size=4, ledger=None):
+    """
+    不打开浏览器，直接通过 HTTP 上传各个文件夹：多个文件夹并行上传，
+    每个请求携带多个文件，以服务器响应确认上传完成。返回上传失败的文件夹列表
+    提供上传记录 UploadLedger 时逐个文件跳过已上传或内容重复的文件
+    """
+    uploader = HTTPUploader(url, headers={"Cookie": cookie} if cookie else None, pool_size=pool_size,
+                            ledger=ledger)
+    try:
+        return uploader.upload_folders(folders)
+    finally:
+        uploader.close()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把文件分批放入子文件夹后上传到超星学习通网盘")
     # 待上传的源文件夹（其中所有文件将会被分批移动到多个子文件夹中）
-    source_folder = r"C:\Users\xijia\Desktop\待上传文件夹"  # 请根据实际情况修改
+    parser.add_argument("source_folder", nargs="?",
+                        default=r"C:\Users\xijia\Desktop\待上传文件夹",  # 请根据实际情况修改
+                        help="待上传的源文件夹")
+    parser.add_argument("--url", default=None,
+                        help="网盘上传接口地址；指定后直接通过 HTTP 上传，不再打开浏览器")
+    parser.add_argument("--cookie", default=None, help="登录后的 Cookie（与 --url 一起使用）")
+    parser.add_argument("--pool-size", type=int, default=4, help="HTTP 上传时同时上传的文件夹数")
+    parser.add_argument("--ledger", default=None,
+                        help="上传记录文件，默认放在源文件夹旁边；用于跳过已上传和重复的文件")
+    parser.add_argument("--no-ledger", action="store_true", help="不使用上传记录")
+    parser.add_argument("--dedup", choices=DEDUP_ACTIONS, default=None,
+                        help="分批前查找内容相同的文件：report 只报告，link 替换为硬链接，drop 删除副本")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    source_folder = args.source_folder
+    ledger = None
+    if not args.no_ledger:
+        ledger = UploadLedger(args.ledger or UploadLedger.default_path(source_folder))
+
+    if args.dedup:
+        deduplicate(source_folder, action=args.dedup)
 
     # 先对源文件夹中的文件进行分批（每批不超过50个文件），生成多个子文件夹
     batch_folders = split_files_into_folders(source_folder, max_files=50)
+    if not batch_folders and ledger is not None:
+        # 上次运行已经分好批，根据上传记录继续上传
+        batch_folders = existing_batch_folders(source_folder)
     if not batch_folders:
         print("没有需要上传的文件。")
         exit()
 
+    if args.url:
+        failed = http_upload_folders(batch_folders, args.url, args.cookie, args.pool_size, ledger)
+        if failed:
+            print(f"以下文件夹未能全部上传: {failed}")
+        else:
+            print("所有文件夹上传完成。")
+        if ledger is not None:
+            print(ledger.report())
+            ledger.close()
+        METRICS.close()
+        print(METRICS.summary())
+        exit()
+
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     # 初始化 Selenium 浏览器驱动（确保已安装 chromedriver）
     driver = webdriver.Chrome()
 
@@ -103,7 +238,12 @@ if __name__ == "__main__":
     WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "uploadBtn")))
 
     # 分批上传所有文件夹
-    batch_upload_folders(driver, batch_folders)
+    batch_upload_folders(driver, batch_folders, ledger)
 
     print("所有文件夹上传完成。")
+    if ledger is not None:
+        print(ledger.report())
+        ledger.close()
     driver.quit()
+    METRICS.close()
+    print(METRICS.summary())
@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from Xuexitong_Metrics import METRICS, QUIET
+from Xuexitong_SyntheticTree import PROFILES, generate_tree
+
+# 中位数比基准慢这么多（比例）时视为性能回退
+DEFAULT_THRESHOLD = 0.10
+
+# 桩渲染器生成的最小PDF
+STUB_PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog>>endobj\ntrailer<</Root 1 0 R>>\nstartxref\n0\n%%EOF\n"
+
+
+class StubRenderer:
+    """
+    代替 pdfkit 的桩渲染器：读取HTML后写出一个最小的PDF，可设置每页的模拟渲染时间。
+    用于只测量遍历、预处理、删除原始文件等 wkhtmltopdf 之外的开销
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def configuration(self, wkhtmltopdf=""):
+        return types.SimpleNamespace(wkhtmltopdf=wkhtmltopdf)
+
+    def from_file(self, input_path, output_path, configuration=None, options=None):
+        with open(input_path, "rb") as f:
+            f.read()
+        if self.delay:
+            time.sleep(self.delay)
+        with open(output_path, "wb") as f:
+            f.write(STUB_PDF)
+        return True
+
+
+def bench_remove_ad(work_dir, options):
+    from Xuexitong_00_Remove_ad import rename_files_in_directory
+    rename_files_in_directory(work_dir, "D1127_", "")
+
+
+def bench_replace_symbol(work_dir, options):
+    from Xuexitong_02_ReplaceSymbol import rename_recursively
+    rename_recursively(work_dir)
+
+
+def bench_rename_by_content(work_dir, options):
+    from Xuexitong_03_Rename_files_by_Content import rename_files_by_content
+    rename_files_by_content(work_dir, workers=options.workers)
+
+
+def bench_html2pdf(work_dir, options):
+    stub = StubRenderer(options.render_ms / 1000)
+    # 01 在导入时就按 Windows 路径配置 wkhtmltopdf，找不到时会出错；导入前先用桩渲染器代替 pdfkit
+    saved = sys.modules.get("pdfkit")
+    sys.modules["pdfkit"] = stub
+    try:
+        import Xuexitong_01_html2pdf as html2pdf
+    finally:
+        if saved is None:
+            del sys.modules["pdfkit"]
+        else:
+            sys.modules["pdfkit"] = saved
+    renderer = html2pdf.pdfkit
+    html2pdf.pdfkit = stub
+    try:
+        html2pdf.convert_html_files_in_directory(work_dir, jobs=options.jobs)
+    finally:
+        html2pdf.pdfkit = renderer
+
+
+def bench_split(work_dir, options):
+    from Xuexitong_04_SplitDirWithin50Files import process_directory
+    process_directory(work_dir)
+
+
+def bench_remove_empty(work_dir, options):
+    from Remove_empty_dir import remove_empty_folders
+    remove_empty_folders(work_dir, workers=options.workers)
+
+
+# 基准项目：名称 -> 函数（参数为生成的树的副本和命令行参数）
+BENCHMARKS = {
+    "rename_files_in_directory": bench_remove_ad,
+    "rename_recursively": bench_replace_symbol,
+    "rename_files_by_content": bench_rename_by_content,
+    "convert_html_files_in_directory": bench_html2pdf,
+    "process_directory": bench_split,
+    "remove_empty_folders": bench_remove_empty,
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(name, tree, scratch, options):
+    """
+    运行一个基准项目 options.repeat 次，每次都在生成的树的新副本上运行（复制不计时），
+    运行期间不输出每个文件的信息。返回 {"runs": [...], "min":, "median":, "mean":}；
+    缺少依赖无法运行时返回 {"skipped": 原因}
+    """
+    func = BENCHMARKS[name]
+    runs = []
+    for _ in range(options.repeat):
+        work_dir = os.path.join(scratch, name)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        shutil.copytree(tree, work_dir)
+        with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            try:
+                func(work_dir, options)
+            except ImportError as e:
+                return {"skipped": f"{type(e).__name__}: {e}"}
+            runs.append(time.perf_counter() - start)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"runs": [round(run, 6) for run in runs], "min": round(min(runs), 6),
+            "median": round(statistics.median(runs), 6), "mean": round(statistics.fmean(runs), 6)}
+
+
+def run_suite(options):
+    """
+    生成（或复用）合成目录树并依次运行选定的基准项目，返回可写成 JSON 的结果
+    """
+    scratch = tempfile.mkdtemp(prefix="xuexitong_bench_")
+    tree = options.tree or os.path.join(scratch, "tree")
+    tree_options = dict(PROFILES[options.profile])
+    if options.flat_files is not None:
+        tree_options["flat_files"] = options.flat_files
+    try:
+        if not os.path.isdir(tree) or not os.listdir(tree):
+            print(f"正在生成合成目录树（{options.profile}，seed={options.seed}）: {tree}")
+            start = time.perf_counter()
+            stats = generate_tree(tree, seed=options.seed, **tree_options).as_dict()
+            print(f"已生成 {stats['dirs']} 个目录、{stats['files']} 个文件，"
+                  f"用时 {time.perf_counter() - start:.1f} 秒")
+        else:
+            print(f"使用已有的目录树: {tree}")
+            stats = None
+
+        console_level = METRICS.console_level
+        METRICS.configure(console_level=QUIET)
+        results = {}
+        try:
+            for name in options.only or BENCHMARKS:
+                METRICS.reset()
+                result = results[name] = run_benchmark(name, tree, scratch, options)
+                if "skipped" in result:
+                    print(f"{name}: 跳过（{result['skipped']}）")
+                else:
+                    print(f"{name}: 中位数 {result['median']:.3f} 秒，最快 {result['min']:.3f} 秒"
+                          f"（{options.repeat} 次）")
+        finally:
+            METRICS.configure(console_level=console_level)
+    finally:
+        if options.tree is None and options.keep:
+            # 各项目的副本已在运行后删除，临时目录中只剩生成的树
+            print(f"目录树保留在: {tree}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "profile": options.profile,
+        "seed": options.seed,
+        "tree_options": tree_options,
+        "tree": stats,
+        "options": {"repeat": options.repeat, "workers": options.workers, "jobs": options.jobs,
+                    "render_ms": options.render_ms},
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    按中位数比较两次运行结果，输出对比表，返回变慢超过 threshold 的项目名称列表
+    """
+    regressions = []
+    print(f"与基准比较（{baseline.get('revision')} {baseline.get('time')}）:")
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if "median" not in result or not old or "median" not in old:
+            print(f"  {name}: 无法比较")
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  <- 变慢"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "  <- 变快"
+        print(f"  {name}: {old['median']:.3f} -> {result['median']:.3f} 秒（{ratio:.2f}x）{mark}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在合成的学习通目录树上对各处理步骤进行基准测试，结果保存为 JSON")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small", help="目录树的预设规模，默认 small")
+    parser.add_argument("--seed", type=int, default=0, help="生成目录树的随机数种子")
+    parser.add_argument("--flat-files", type=int, default=None, help="平铺目录中的文件数，覆盖预设值")
+    parser.add_argument("--tree", default=None,
+                        help="目录树路径：不存在时在此生成并保留，已存在时直接使用（不会被修改）")
+    parser.add_argument("--keep", action="store_true", help="保留临时生成的目录树")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=None, help="只运行这些项目")
+    parser.add_argument("--repeat", type=int, default=3, help="每个项目运行的次数，取中位数")
+    parser.add_argument("--workers", type=int, default=1, help="按内容重命名和删除空目录使用的进程（线程）数")
+    parser.add_argument("--jobs", type=int, default=1, help="HTML转PDF的并发数")
+    parser.add_argument("--render-ms", type=float, default=0.0, help="桩渲染器每页的模拟渲染时间（毫秒）")
+    parser.add_argument("--output", default=None, help="结果文件路径，默认为 benchmark-<规模>-<时间>.json")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果文件比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="中位数变慢超过该比例时视为回退，默认 0.10")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    output = args.output or f"benchmark-{args.profile}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
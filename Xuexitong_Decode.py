@@ -0,0 +1,170 @@
+import re
+import mmap
+import codecs
+
+# 只根据文件开头这么多字节判断编码
+SNIFF_SIZE = 64 * 1024
+
+# 超过该大小的文件用 mmap 读取，直接在映射的内存上解码
+MMAP_THRESHOLD = 1024 * 1024
+
+BOMS = [(codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"),
+        (codecs.BOM_UTF16_BE, "utf-16")]
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+# 声明的编码统一换成可以解码它们的超集
+CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030",
+                   "gb18030": "gb18030", "big5": "big5", "big5-hkscs": "big5hkscs",
+                   "utf8": "utf-8", "utf-8": "utf-8"}
+
+CJK_CHAR = re.compile(r'[\u4e00-\u9fff]')
+NOT_CJK_CHAR = re.compile(r'[^\u4e00-\u9fff]')
+CJK_PUNCTUATION = re.compile(r'[\u3000-\u303f\uff00-\uffef]')
+NON_ASCII_BYTE = re.compile(rb'[\x80-\xff]')
+
+
+def _decodes(prefix, encoding):
+    """
+    判断前缀能否按指定编码解码；末尾被截断的多字节字符不算错误
+    """
+    try:
+        return codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        return None
+
+
+def _plausibility(text, common_encoding=None):
+    """
+    非 ASCII 字符中像正常中文文本的比例（汉字或中文标点）；
+    给定 common_encoding 时汉字还必须属于该编码的常用字集。用错编码解码时这个比例明显偏低。
+    """
+    chars = [ch for ch in text if ord(ch) > 0x7F]
+    if not chars:
+        return 1.0
+    good = 0
+    for ch in chars:
+        if CJK_PUNCTUATION.match(ch):
+            good += 1
+        elif CJK_CHAR.match(ch):
+            if common_encoding is None:
+                good += 1
+                continue
+            try:
+                ch.encode(common_encoding)
+                good += 1
+            except UnicodeEncodeError:
+                pass
+    return good / len(chars)
+
+
+def detect_encoding(prefix, sample=None):
+    """
+    根据文件开头的字节判断编码：先看 BOM，再看 <meta charset>，最后在 UTF-8、GB18030、Big5 中选择。
+    sample 为用于统计判断的片段，默认就是 prefix。
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    match = META_CHARSET.search(prefix)
+    if match:
+        declared = CHARSET_ALIASES.get(match.group(1).decode("ascii").lower())
+        if declared and _decodes(prefix, declared) is not None:
+            return declared
+    if sample is None:
+        sample = prefix
+    if _decodes(sample, "utf-8") is not None:
+        return "utf-8"
+    gb_text = _decodes(sample, "gb18030")
+    big5_text = _decodes(sample, "big5")
+    if big5_text is not None and (gb_text is None or
+                                  _plausibility(big5_text) > _plausibility(gb_text, "gb2312")):
+        return "big5"
+    return "gb18030"
+
+
+def _sniff_buffer(buffer):
+    """
+    判断整个缓冲区的编码：开头全是 ASCII 时，从第一个非 ASCII 字节处取样
+    """
+    prefix = bytes(buffer[:SNIFF_SIZE])
+    sample = prefix
+    if prefix.isascii() and len(buffer) > SNIFF_SIZE:
+        match = NON_ASCII_BYTE.search(buffer)
+        if match:
+            sample = bytes(buffer[match.start():match.start() + SNIFF_SIZE])
+    return detect_encoding(prefix, sample)
+
+
+class _FileBuffer:
+    """
+    以只读方式打开文件：大文件映射为 mmap，小文件一次读入
+    """
+
+    def __init__(self, file_path):
+        self.file = open(file_path, "rb")
+        self.map = None
+        size = self.file.seek(0, 2)
+        self.file.seek(0)
+        if size >= MMAP_THRESHOLD:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = self.map
+        else:
+            self.buffer = self.file.read()
+
+    def __enter__(self):
+        return self.buffer
+
+    def __exit__(self, *exc):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+def decode_file(file_path):
+    """
+    读取并解码整个文件，返回 (内容, 使用的编码)。
+    文件只读取一次，编码由开头部分判断；判断错误时才在同一缓冲区上改用其他编码。
+    """
+    with _FileBuffer(file_path) as buffer:
+        encoding = _sniff_buffer(buffer)
+        for candidate in [encoding, "utf-8", "gb18030"]:
+            try:
+                return str(buffer, candidate), candidate
+            except UnicodeDecodeError:
+                continue
+        return str(buffer, encoding, "replace"), encoding
+
+
+def iter_decoded_chunks(file_path, chunk_size=SNIFF_SIZE):
+    """
+    分块读取并增量解码文件，逐块返回文本。
+    块末尾未结束的中文字符序列留到下一块，保证中文字符序列不会被拆开，
+    调用方找到需要的内容后即可停止读取。
+    """
+    with open(file_path, "rb") as f:
+        data = f.read(chunk_size)
+        prefix = data
+        decoder = None
+        pending = ""
+        while data:
+            if decoder is None:
+                if data.isascii():
+                    # 纯 ASCII 在各编码下结果相同，等遇到非 ASCII 字节时再判断编码
+                    yield data.decode("ascii")
+                    data = f.read(chunk_size)
+                    continue
+                decoder = codecs.getincrementaldecoder(detect_encoding(prefix, data))("replace")
+            text = pending + decoder.decode(data)
+            cut = 0
+            for match in NOT_CJK_CHAR.finditer(text):
+                cut = match.end()
+            if cut:
+                yield text[:cut]
+            pending = text[cut:]
+            data = f.read(chunk_size)
+        if decoder is not None:
+            pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
@@ -0,0 +1,277 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
+
+# 第二轮只比较文件开头这么多字节的哈希；不超过该大小的文件这一轮就是完整哈希
+PARTIAL_SIZE = 64 * 1024
+
+# 不小于该大小的文件通过 mmap 计算完整哈希，不再逐块复制到 Python 缓冲区
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+# 逐块读取时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 处理重复文件的方式
+ACTIONS = ("report", "link", "drop")
+
+
+def hash_file(path, limit=None):
+    """
+    计算文件内容（或开头 limit 字节）的 BLAKE2b 哈希；大文件的完整哈希通过 mmap 计算
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if limit is None and size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+            return digest.hexdigest()
+        remaining = size if limit is None else min(size, limit)
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+class DuplicateSet:
+    """
+    一组内容完全相同的文件。paths 的第一个为保留的文件（层级最浅、路径排序最前），其余为重复副本
+    """
+    __slots__ = ("size", "digest", "paths")
+
+    def __init__(self, size, digest, paths):
+        self.size = size
+        self.digest = digest
+        self.paths = sorted(paths, key=lambda path: (path.count(os.sep), path))
+
+    @property
+    def keeper(self):
+        return self.paths[0]
+
+    @property
+    def duplicates(self):
+        return self.paths[1:]
+
+    @property
+    def wasted(self):
+        return self.size * (len(self.paths) - 1)
+
+    def as_dict(self):
+        return {"size": self.size, "hash": self.digest, "keep": self.keeper, "duplicates": self.duplicates}
+
+
+def scan_sizes(root_dir, manifest=None, min_size=1, extensions=None):
+    """
+    第一轮：按文件大小分组，返回 {大小: [路径]}，只保留有两个以上文件的大小。
+    同一个 inode 的多个硬链接只计一次，它们已经不占用额外空间
+    """
+    groups = {}
+    if manifest is not None:
+        files = ((path, info.size, None) for path, info in manifest.iter_files(root_dir))
+    else:
+        files = _iter_file_sizes(root_dir)
+    for path, size, inode in files:
+        if size < min_size:
+            continue
+        if extensions and os.path.splitext(path)[1].lower() not in extensions:
+            continue
+        groups.setdefault(size, []).append((path, inode))
+    result = {}
+    for size, items in groups.items():
+        if len(items) < 2:
+            continue
+        seen = set()
+        paths = []
+        for path, inode in items:
+            if inode is None:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                inode = (st.st_dev, st.st_ino)
+            if inode not in seen:
+                seen.add(inode)
+                paths.append(path)
+        if len(paths) > 1:
+            result[size] = paths
+    return result
+
+
+def _iter_file_sizes(root_dir):
+    stack = [root_dir]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"无法读取目录 {directory}: {e}")
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    yield entry.path, st.st_size, (st.st_dev, st.st_ino)
+            except OSError:
+                continue
+
+
+def _refine(groups, executor, limit, phase):
+    """
+    在每组内按哈希再分组：groups 为 [(大小, [路径])]，返回哈希相同且有两个以上文件的 [(大小, 哈希, [路径])]
+    """
+    items = [(size, path) for size, paths in groups for path in paths]
+
+    def key(item):
+        start = time.perf_counter()
+        try:
+            return hash_file(item[1], limit)
+        except OSError as e:
+            METRICS.event("dedup_error", f"读取 {item[1]} 失败: {e}", level=INFO, path=item[1])
+            return None
+        finally:
+            METRICS.observe("hash", time.perf_counter() - start, phase=phase)
+
+    buckets = {}
+    for (size, path), digest in zip(items, executor.map(key, items)):
+        if digest is not None:
+            buckets.setdefault((size, digest), []).append(path)
+            METRICS.count("hash_bytes", size if limit is None else min(size, limit), phase=phase)
+    return [(size, digest, paths) for (size, digest), paths in buckets.items() if len(paths) > 1]
+
+
+def find_duplicates(root_dir, workers=None, manifest=None, min_size=1, extensions=None):
+    """
+    查找内容完全相同的文件：先按大小分组，再比较开头 PARTIAL_SIZE 字节的哈希，
+    最后只对仍然相同的文件计算完整哈希。哈希在 workers 个线程中并行计算（读文件和计算哈希时会释放 GIL）。
+    :param extensions: 只检查这些扩展名（小写，含点），None 表示全部文件
+    :return: DuplicateSet 列表，按浪费的空间从大到小排序
+    """
+    workers = workers or os.cpu_count() or 1
+    by_size = scan_sizes(root_dir, manifest, min_size, extensions)
+    candidates = sum(len(paths) for paths in by_size.values())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        partial = _refine(sorted(by_size.items()), executor, PARTIAL_SIZE, "partial")
+        # 不超过 PARTIAL_SIZE 的文件在上一轮已经比较了完整内容
+        sets = [DuplicateSet(size, digest, paths) for size, digest, paths in partial if size <= PARTIAL_SIZE]
+        large = [(size, paths) for size, digest, paths in partial if size > PARTIAL_SIZE]
+        for size, digest, paths in _refine(large, executor, None, "full"):
+            sets.append(DuplicateSet(size, digest, paths))
+    METRICS.count("dedup_candidates", candidates)
+    sets.sort(key=lambda s: (-s.wasted, s.keeper))
+    return sets
+
+
+def link_duplicates(sets):
+    """
+    把重复副本替换为指向保留文件的硬链接：先在同一目录建立临时链接再原子替换，
+    任何时候副本路径都存在。返回 (替换数, 节省的字节数)
+    """
+    replaced = saved = 0
+    for dup_set in sets:
+        for path in dup_set.duplicates:
+            temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.dedup")
+            try:
+                os.link(dup_set.keeper, temp_path)
+                os.replace(temp_path, path)
+            except OSError as e:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+                METRICS.event("dedup_error", f"替换 {path} 为硬链接失败: {e}", level=INFO, path=path)
+                continue
+            replaced += 1
+            saved += dup_set.size
+            METRICS.event("dedup_link", f"硬链接: {path} -> {dup_set.keeper}", path=path, keep=dup_set.keeper)
+    return replaced, saved
+
+
+def drop_duplicates(sets, manifest=None):
+    """
+    删除重复副本，只保留每组中的一个文件。返回 (删除数, 节省的字节数)
+    """
+    removed = saved = 0
+    for dup_set in sets:
+        for path in dup_set.duplicates:
+            try:
+                os.remove(path)
+            except OSError as e:
+                METRICS.event("dedup_error", f"删除 {path} 失败: {e}", level=INFO, path=path)
+                continue
+            if manifest is not None:
+                manifest.remove(path)
+            removed += 1
+            saved += dup_set.size
+            METRICS.event("dedup_drop", f"删除重复文件: {path}（保留 {dup_set.keeper}）",
+                          path=path, keep=dup_set.keeper)
+    return removed, saved
+
+
+def write_report(sets, report_path):
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump([dup_set.as_dict() for dup_set in sets], f, ensure_ascii=False, indent=2)
+
+
+def deduplicate(root_dir, action="report", workers=None, manifest=None, min_size=1, extensions=None,
+                report_path=None, show=10):
+    """
+    查找重复文件并按 action 处理：report 只报告，link 替换为硬链接，drop 删除副本。
+    输出重复最多的 show 组，提供 report_path 时把全部结果写成 JSON。返回 DuplicateSet 列表
+    """
+    start = time.perf_counter()
+    sets = find_duplicates(root_dir, workers=workers, manifest=manifest, min_size=min_size,
+                           extensions=extensions)
+    copies = sum(len(dup_set.duplicates) for dup_set in sets)
+    wasted = sum(dup_set.wasted for dup_set in sets)
+    print(f"重复文件: {len(sets)} 组，共 {copies} 个副本，占用 {wasted / 1024 / 1024:.1f} MB，"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
+    for dup_set in sets[:show]:
+        print(f"  {len(dup_set.paths)} 份 × {dup_set.size / 1024:.1f} KB: 保留 {dup_set.keeper}")
+        for path in dup_set.duplicates[:3]:
+            print(f"      {path}")
+        if len(dup_set.duplicates) > 3:
+            print(f"      ……等 {len(dup_set.duplicates)} 个")
+    if report_path:
+        write_report(sets, report_path)
+        print(f"重复文件清单已保存到 {report_path}")
+    if action == "link":
+        count, saved = link_duplicates(sets)
+        print(f"已将 {count} 个重复文件替换为硬链接，节省 {saved / 1024 / 1024:.1f} MB")
+    elif action == "drop":
+        count, saved = drop_duplicates(sets, manifest)
+        print(f"已删除 {count} 个重复文件，节省 {saved / 1024 / 1024:.1f} MB")
+    return sets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按文件内容查找重复文件，可替换为硬链接或删除副本")
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要检查的目录")
+    parser.add_argument("--action", choices=ACTIONS, default="report",
+                        help="report 只报告（默认），link 把副本替换为硬链接，drop 删除副本")
+    parser.add_argument("--workers", type=int, default=None, help="计算哈希的线程数，默认为CPU核数")
+    parser.add_argument("--min-size", type=int, default=1, help="只检查不小于该大小（字节）的文件，默认跳过空文件")
+    parser.add_argument("--ext", action="append", default=None, help="只检查该扩展名的文件（如 .html），可重复指定")
+    parser.add_argument("--report", default=None, help="把全部重复文件组写入该 JSON 文件")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    if not os.path.isdir(args.directory):
+        print("错误: 指定的路径不是一个有效的目录!")
+        exit(1)
+    extensions = {ext.lower() if ext.startswith(".") else "." + ext.lower() for ext in args.ext} if args.ext else None
+    deduplicate(args.directory, action=args.action, workers=args.workers, min_size=args.min_size,
+                extensions=extensions, report_path=args.report)
+    METRICS.close()
+    print("处理完成!")
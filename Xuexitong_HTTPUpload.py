@@ -0,0 +1,494 @@
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from Xuexitong_UploadLedger import UploadLedger
+from Xuexitong_Metrics import METRICS
+
+# 读取和发送文件内容的块大小
+CHUNK_SIZE = 256 * 1024
+
+# 单个请求默认最多包含的文件数和字节数
+FILES_PER_REQUEST = 10
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+DISPOSITION_PARAM = re.compile(r'\b(name|filename)="([^"]*)"')
+
+
+class UploadError(Exception):
+    """
+    上传请求失败（连接错误、非 2xx 响应或文件在发送过程中被修改）
+    """
+
+
+class ConnectionPool:
+    """
+    到同一服务器的长连接池：请求结束后连接放回池中复用，省去每次请求的 TCP/TLS 握手。
+    可在多个线程中同时使用，每个线程取走一个连接，用完放回。
+    """
+
+    def __init__(self, url, size=4, timeout=60):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+
+    def _get(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            return cls(self.host, self.port, timeout=self.timeout)
+
+    def _put(self, conn):
+        if self.idle.qsize() < self.size:
+            self.idle.put(conn)
+        else:
+            conn.close()
+
+    def post(self, headers, body, length, path=None):
+        """
+        发送 POST 请求，body 为每次调用都重新生成数据块的函数，返回 (状态码, 响应内容)。
+        复用的空闲连接可能已被服务器关闭，此时换一个新连接重发一次
+        """
+        for attempt in range(2):
+            conn = self._get()
+            reused = conn.sock is not None
+            try:
+                conn.putrequest("POST", path or self.path, skip_accept_encoding=True)
+                for key, value in headers.items():
+                    conn.putheader(key, value)
+                conn.putheader("Content-Length", str(length))
+                conn.endheaders()
+                for chunk in body():
+                    conn.send(chunk)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if attempt == 0 and reused:
+                    continue
+                raise
+            except Exception:
+                # 请求只发送了一部分，连接不能再复用
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._put(conn)
+            return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _quote(value):
+    # 与浏览器相同，引号和换行用百分号转义
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+def _unquote(value):
+    return value.replace("%22", '"').replace("%0D", "\r").replace("%0A", "\n")
+
+
+class MultipartBody:
+    """
+    流式生成 multipart/form-data 请求体：长度事先算出，文件内容发送时才分块读取，不整体读入内存
+    :param fields: 普通表单字段 {名称: 值}
+    :param files: [(文件路径, 上传时的文件名, 大小)]
+    """
+
+    def __init__(self, fields, files, field_name="file"):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.fields = [(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                        .encode("utf-8") + str(value).encode("utf-8") + b"\r\n")
+                       for name, value in fields.items()]
+        self.files = [(path, size,
+                       f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(field_name)}"; '
+                       f'filename="{_quote(name)}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+                       .encode("utf-8"))
+                      for path, name, size in files]
+        self.closing = f"--{self.boundary}--\r\n".encode("ascii")
+        self.length = (sum(len(part) for part in self.fields) + len(self.closing) +
+                       sum(len(header) + size + 2 for _, size, header in self.files))
+
+    def __call__(self):
+        yield from self.fields
+        for path, size, header in self.files:
+            yield header
+            remaining = size
+            with open(path, "rb") as f:
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise UploadError(f"文件 {path} 在上传过程中变小")
+                    remaining -= len(chunk)
+                    yield chunk
+            yield b"\r\n"
+        yield self.closing
+
+
+def confirm_json(status, data, sent):
+    """
+    默认的上传确认：响应为 JSON {"files": [{"name": 文件名, "size": 大小}, ...]}，
+    返回服务器确认收到且大小一致的文件名集合
+    """
+    if not 200 <= status < 300:
+        return set()
+    try:
+        received = json.loads(data.decode("utf-8")).get("files", [])
+    except (ValueError, AttributeError):
+        return set()
+    sizes = dict(sent)
+    return {item.get("name") for item in received
+            if item.get("name") in sizes and item.get("size") == sizes[item.get("name")]}
+
+
+class HTTPUploader:
+    """
+    直接通过 HTTP 上传文件夹：每个请求用 multipart 携带多个文件，
+    以服务器响应确认每个文件是否收到，未确认的文件单独重试，不再固定等待。
+    对象可以直接作为流水线的上传函数调用，多个线程可共用同一个对象。
+    :param url: 上传接口地址
+    :param headers: 附加的请求头（如登录后的 Cookie）
+    :param field_name: 文件字段名
+    :param files_per_request: 每个请求最多包含的文件数
+    :param max_request_bytes: 每个请求最多包含的字节数（单个文件更大时单独发送）
+    :param pool_size: 连接池大小
+    :param retries: 未确认文件的重试次数
+    :param confirm: 确认函数 (状态码, 响应内容, [(文件名, 大小)]) -> 已确认的文件名集合
+    :param ledger: 上传记录 UploadLedger，提供时跳过内容已上传或重复的文件，并记录确认上传的文件
+    """
+
+    def __init__(self, url, headers=None, field_name="file", files_per_request=FILES_PER_REQUEST,
+                 max_request_bytes=MAX_REQUEST_BYTES, pool_size=4, retries=2, confirm=confirm_json,
+                 timeout=60, ledger=None, log=print):
+        self.pool = ConnectionPool(url, size=pool_size, timeout=timeout)
+        self.headers = dict(headers or {})
+        self.field_name = field_name
+        self.files_per_request = files_per_request
+        self.max_request_bytes = max_request_bytes
+        self.retries = retries
+        self.confirm = confirm
+        self.ledger = ledger
+        self.log = log
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.files_confirmed = 0
+        self.requests = 0
+
+    def plan_requests(self, files):
+        """
+        把 [(路径, 文件名, 大小)] 按文件数和字节数上限分成多个请求
+        """
+        batch, total = [], 0
+        for item in files:
+            if batch and (len(batch) >= self.files_per_request or total + item[2] > self.max_request_bytes):
+                yield batch
+                batch, total = [], 0
+            batch.append(item)
+            total += item[2]
+        if batch:
+            yield batch
+
+    def _send(self, folder_name, batch, hashes=None):
+        body = MultipartBody({"folder": folder_name}, batch, self.field_name)
+        headers = dict(self.headers)
+        headers["Content-Type"] = body.content_type
+        with METRICS.timer("upload_request"):
+            status, data = self.pool.post(headers, body, body.length)
+        METRICS.count("upload_bytes", body.length)
+        confirmed = self.confirm(status, data, [(name, size) for _, name, size in batch])
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += body.length
+            self.files_confirmed += len(confirmed)
+        if not 200 <= status < 300:
+            raise UploadError(f"服务器返回 {status}: {data[:200]!r}")
+        if self.ledger is not None and hashes:
+            self.ledger.record([(hashes[path], size, folder_name, name)
+                                for path, name, size in batch if name in confirmed])
+        return confirmed
+
+    def upload_files(self, folder_name, files, hashes=None):
+        """
+        上传 [(路径, 文件名, 大小)]，返回未能确认的文件列表。
+        hashes 为 {路径: 内容哈希}，提供时每个请求确认后写入上传记录
+        """
+        pending = list(files)
+        for attempt in range(self.retries + 1):
+            failed = []
+            # 重试时每个文件单独发送，避免同一请求中的其他文件再次失败
+            batches = self.plan_requests(pending) if attempt == 0 else ([item] for item in pending)
+            for batch in batches:
+                try:
+                    confirmed = self._send(folder_name, batch, hashes)
+                except (UploadError, http.client.HTTPException, OSError) as e:
+                    self.log(f"上传请求失败（{folder_name}，{len(batch)} 个文件）：{e}")
+                    confirmed = set()
+                failed.extend(item for item in batch if item[1] not in confirmed)
+            if not failed:
+                return []
+            pending = failed
+        if self.ledger is not None and hashes:
+            # 因内容与失败文件相同而被跳过的文件，改为上传其中一个
+            for path, size, folder, name, digest in self.ledger.release(hashes[path] for path, _, _ in pending):
+                self.log(f"内容相同的文件未能上传，改为上传 {path}")
+                if self.upload_files(folder, [(path, name, size)], {path: digest}):
+                    self.log(f"上传 {path} 失败")
+        return pending
+
+    def upload_folder(self, folder_path):
+        """
+        上传文件夹中的所有文件（不含子文件夹），返回是否全部确认上传成功
+        """
+        folder_name = os.path.basename(os.path.normpath(folder_path))
+        files = []
+        mtimes = {}
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    files.append((entry.path, entry.name, st.st_size))
+                    mtimes[entry.path] = st.st_mtime_ns
+        files.sort(key=lambda item: item[1])
+        start = time.perf_counter()
+        hashes = None
+        if self.ledger is not None:
+            hashes = {}
+            to_upload = []
+            skipped = 0
+            for path, name, size in files:
+                digest = self.ledger.hash_file(path, size, mtimes[path])
+                if self.ledger.claim(digest, size, folder_name, name, path) is None:
+                    hashes[path] = digest
+                    to_upload.append((path, name, size))
+                else:
+                    skipped += 1
+            if skipped:
+                self.log(f"{folder_path}: 跳过 {skipped} 个已上传或内容重复的文件")
+            files = to_upload
+        failed = self.upload_files(folder_name, files, hashes)
+        elapsed = time.perf_counter() - start
+        total = sum(size for _, _, size in files)
+        if failed:
+            self.log(f"上传文件夹 {folder_path} 时有 {len(failed)} 个文件未确认：" +
+                     "、".join(name for _, name, _ in failed))
+        else:
+            self.log(f"上传完成：{folder_path}（{len(files)} 个文件，{total / 1024 / 1024:.1f} MB，"
+                     f"{elapsed:.2f} 秒）")
+        return not failed
+
+    __call__ = upload_folder
+
+    def upload_folders(self, folders, jobs=None):
+        """
+        并行上传多个文件夹，返回上传失败的文件夹列表
+        """
+        jobs = jobs or self.pool.size
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(self.upload_folder, folders))
+        return [folder for folder, ok in zip(folders, results) if not ok]
+
+    def close(self):
+        self.pool.close()
+
+
+class _MultipartReader:
+    """
+    桩服务器使用的流式 multipart 解析器：逐块读取请求体，文件内容边读边交给回调
+    """
+
+    def __init__(self, rfile, length, boundary):
+        self.rfile = rfile
+        self.remaining = length
+        self.delimiter = b"\r\n--" + boundary
+        # 在开头补上换行，使第一个分隔符与其余分隔符格式相同
+        self.buffer = b"\r\n"
+
+    def _fill(self):
+        if not self.remaining:
+            return False
+        chunk = self.rfile.read(min(CHUNK_SIZE, self.remaining))
+        if not chunk:
+            self.remaining = 0
+            return False
+        self.remaining -= len(chunk)
+        self.buffer += chunk
+        return True
+
+    def _read_until(self, marker):
+        while True:
+            index = self.buffer.find(marker)
+            if index >= 0:
+                data, self.buffer = self.buffer[:index], self.buffer[index + len(marker):]
+                return data
+            if not self._fill():
+                raise ValueError("multipart 数据不完整")
+
+    def parts(self, on_data):
+        """
+        依次返回每个部分的 (字段名, 文件名或 None, 普通字段的值)；文件内容通过 on_data(块) 交出
+        """
+        self._read_until(self.delimiter)
+        while True:
+            while len(self.buffer) < 2 and self._fill():
+                pass
+            if self.buffer.startswith(b"--"):
+                return
+            self._read_until(b"\r\n")
+            headers = self._read_until(b"\r\n\r\n").decode("utf-8", "replace")
+            params = {key: _unquote(value) for key, value in DISPOSITION_PARAM.findall(headers)}
+            name, filename = params.get("name"), params.get("filename")
+            chunks = []
+            while True:
+                index = self.buffer.find(self.delimiter)
+                if index >= 0:
+                    data, self.buffer = self.buffer[:index], self.buffer[index + len(self.delimiter):]
+                    break
+                keep = len(self.delimiter) - 1
+                if len(self.buffer) > keep:
+                    data, self.buffer = self.buffer[:-keep], self.buffer[-keep:]
+                    if filename is None:
+                        chunks.append(data)
+                    else:
+                        on_data(data)
+                if not self._fill():
+                    raise ValueError("multipart 数据不完整")
+            if filename is None:
+                chunks.append(data)
+                yield name, None, b"".join(chunks).decode("utf-8", "replace")
+            else:
+                on_data(data)
+                yield name, filename, None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        content_type = self.headers.get("Content-Type", "")
+        boundary = content_type.partition("boundary=")[2].strip('"').encode("ascii")
+        length = int(self.headers.get("Content-Length", 0))
+        if not content_type.startswith("multipart/form-data") or not boundary:
+            self._reply(400, {"error": "需要 multipart/form-data"})
+            return
+        received = []
+        size = [0]
+
+        def on_data(chunk):
+            size[0] += len(chunk)
+
+        folder = ""
+        try:
+            for name, filename, value in _MultipartReader(self.rfile, length, boundary).parts(on_data):
+                if filename is None:
+                    if name == "folder":
+                        folder = value
+                    continue
+                received.append({"name": filename, "size": size[0]})
+                size[0] = 0
+        except ValueError as e:
+            self.close_connection = True
+            self._reply(400, {"error": str(e)})
+            return
+        with server.lock:
+            server.requests += 1
+            server.received.extend((folder, item["name"], item["size"]) for item in received)
+        self._reply(200, {"files": received})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UploadStubServer(ThreadingHTTPServer):
+    """
+    本地上传桩服务器，用于测试和测量上传吞吐量：解析 multipart 请求，
+    丢弃文件内容只统计大小，并按 confirm_json 的格式返回收到的文件
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StubHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.received = []
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/upload"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="通过 HTTP 直接上传文件夹；不指定 --url 时上传到本地桩服务器以测量吞吐量")
+    parser.add_argument("folders", nargs="+", help="要上传的文件夹")
+    parser.add_argument("--url", default=None, help="上传接口地址")
+    parser.add_argument("--cookie", default=None, help="登录后的 Cookie")
+    parser.add_argument("--files-per-request", type=int, default=FILES_PER_REQUEST, help="每个请求的文件数上限")
+    parser.add_argument("--pool-size", type=int, default=4, help="连接池大小，也是同时上传的文件夹数")
+    parser.add_argument("--ledger", default=None,
+                        help="上传记录文件；指定后跳过已上传或内容重复的文件，中断后重新运行只上传剩下的文件")
+    args = parser.parse_args()
+
+    stub = None
+    url = args.url
+    if url is None:
+        stub = UploadStubServer().start()
+        url = stub.url
+        print(f"未指定 --url，上传到本地桩服务器 {url}")
+    ledger = UploadLedger(args.ledger) if args.ledger else None
+    uploader = HTTPUploader(url, headers={"Cookie": args.cookie} if args.cookie else None,
+                            files_per_request=args.files_per_request, pool_size=args.pool_size,
+                            ledger=ledger)
+    start = time.perf_counter()
+    failed = uploader.upload_folders(args.folders)
+    elapsed = time.perf_counter() - start
+    uploader.close()
+    megabytes = uploader.bytes_sent / 1024 / 1024
+    print(f"共 {uploader.requests} 个请求，确认 {uploader.files_confirmed} 个文件，{megabytes:.1f} MB，"
+          f"{elapsed:.2f} 秒，{megabytes / elapsed if elapsed else 0:.1f} MB/s")
+    if failed:
+        print(f"上传失败的文件夹: {failed}")
+    if ledger is not None:
+        print(ledger.report())
+        ledger.close()
+    if stub is not None:
+        stub.stop()
@@ -0,0 +1,216 @@
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# 输出详细程度：0 只输出汇总，1 加上警告和每个目录的信息，2 加上每个文件的事件，3 调试信息
+QUIET = 0
+INFO = 1
+DETAIL = 2
+DEBUG = 3
+
+# 日志缓冲的行数，达到后一次写入文件
+LOG_BUFFER_LINES = 1000
+
+# 延迟直方图的分桶：从 1 微秒开始，每个桶的上限是上一个的 BUCKET_RATIO 倍
+BUCKET_START = 1e-6
+BUCKET_RATIO = 1.25
+
+
+class Histogram:
+    """
+    延迟直方图：按对数间隔分桶计数，内存占用固定，可近似计算分位数
+    """
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        index = 0 if value <= BUCKET_START else math.ceil(math.log(value / BUCKET_START, BUCKET_RATIO))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def percentile(self, fraction):
+        """
+        返回近似分位数（所在桶的上限，不超过最大值）
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(BUCKET_START * BUCKET_RATIO ** index, self.max)
+        return self.max
+
+
+def _label_text(labels):
+    return ",".join(f"{key}={value}" for key, value in labels)
+
+
+class Metrics:
+    """
+    各步骤共用的统计：计数器、按步骤和文件类型分类的延迟直方图，以及缓冲写入的 JSON Lines 事件日志。
+    每个文件的事件按详细程度决定是否写入日志、是否输出到控制台，运行结束时输出汇总表。
+    可在多个线程中同时使用。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.console_level = DETAIL
+        self.log_level = DETAIL
+        self.log_file = None
+        self.buffer = []
+        self.started = time.perf_counter()
+
+    def configure(self, console_level=None, log_path=None, log_level=None):
+        """
+        设置控制台输出的详细程度，以及 JSON Lines 日志文件的路径和详细程度
+        """
+        with self.lock:
+            if console_level is not None:
+                self.console_level = console_level
+            if log_level is not None:
+                self.log_level = log_level
+            if log_path is not None:
+                self._flush()
+                if self.log_file is not None:
+                    self.log_file.close()
+                self.log_file = open(log_path, "a", encoding="utf-8", buffering=1024 * 1024)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        统计 with 块的耗时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def event(self, kind, message=None, level=DETAIL, **fields):
+        """
+        记录一个事件：写入日志缓冲（详细程度足够时），并在控制台输出 message（详细程度足够时）
+        """
+        if self.log_file is not None and level <= self.log_level:
+            record = {"time": round(time.time(), 3), "kind": kind}
+            if message is not None:
+                record["message"] = message
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            with self.lock:
+                self.buffer.append(line)
+                if len(self.buffer) >= LOG_BUFFER_LINES:
+                    self._flush()
+        if message is not None and level <= self.console_level:
+            print(message)
+
+    def _flush(self):
+        if self.buffer and self.log_file is not None:
+            self.log_file.write("\n".join(self.buffer) + "\n")
+        self.buffer = []
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+            if self.log_file is not None:
+                self.log_file.flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.perf_counter()
+
+    def summary(self):
+        """
+        返回汇总表：各项耗时（次数、总耗时、平均、P50、P95、最大、占运行时间的比例）和各计数器
+        """
+        with self.lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: -item[1].total)
+            counters = sorted(self.counters.items())
+        wall = time.perf_counter() - self.started
+        lines = [f"运行时间 {wall:.2f} 秒"]
+        if histograms:
+            rows = [("耗时项", "次数", "总耗时(秒)", "平均(毫秒)", "P50(毫秒)", "P95(毫秒)", "最大(毫秒)", "占比")]
+            for (name, labels), h in histograms:
+                label = f"{name}[{_label_text(labels)}]" if labels else name
+                rows.append((label, str(h.count), f"{h.total:.3f}", f"{h.total / h.count * 1000:.2f}",
+                             f"{h.percentile(0.5) * 1000:.2f}", f"{h.percentile(0.95) * 1000:.2f}",
+                             f"{h.max * 1000:.2f}", f"{h.total / wall:.0%}" if wall else "-"))
+            lines.extend(_format_table(rows))
+        if counters:
+            rows = [("计数项", "数量")]
+            for (name, labels), value in counters:
+                label = f"{name}[{_label_text(labels)}]" if labels else name
+                rows.append((label, f"{value:,}"))
+            lines.extend(_format_table(rows))
+        return "\n".join(lines)
+
+
+def _display_width(text):
+    return sum(2 if ord(ch) > 0x2E7F else 1 for ch in text)
+
+
+def _format_table(rows):
+    widths = [max(_display_width(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = []
+    for number, row in enumerate(rows):
+        cells = [cell + " " * (width - _display_width(cell)) if i == 0 else
+                 " " * (width - _display_width(cell)) + cell
+                 for i, (cell, width) in enumerate(zip(row, widths))]
+        lines.append("  ".join(cells))
+        if number == 0:
+            lines.append("  ".join("-" * width for width in widths))
+    return lines
+
+
+# 整个进程共用的统计对象
+METRICS = Metrics()
+
+
+def add_arguments(parser):
+    """
+    为命令行脚本添加控制输出详细程度和事件日志的参数
+    """
+    parser.add_argument("--verbosity", type=int, choices=[QUIET, INFO, DETAIL, DEBUG], default=DETAIL,
+                        help="控制台输出的详细程度：0 只输出汇总，1 加上警告，2 加上每个文件（默认），3 调试")
+    parser.add_argument("--log-file", default=None, help="把每个文件的事件以 JSON Lines 格式写入该文件")
+    parser.add_argument("--log-level", type=int, choices=[QUIET, INFO, DETAIL, DEBUG], default=DETAIL,
+                        help="写入日志文件的详细程度，默认 2")
+
+
+def configure_from_args(args):
+    METRICS.configure(console_level=args.verbosity, log_path=args.log_file, log_level=args.log_level)
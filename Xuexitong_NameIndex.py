@@ -0,0 +1,70 @@
+import os
+
+
+def detect_case_insensitive(directory, names):
+    """
+    判断目录所在的文件系统是否不区分大小写：
+    取一个改变大小写后不在列表中的名称，检查它是否"存在"。整个目录只需一次 stat。
+    找不到可用于判断的名称时按操作系统推断。
+    """
+    existing = set(names)
+    for name in names:
+        swapped = name.swapcase()
+        if swapped != name and swapped not in existing:
+            return os.path.exists(os.path.join(directory, swapped))
+    return os.name == "nt"
+
+
+class DirectoryNameIndex:
+    """
+    单个目录中已有名称的内存索引，用于在不访问文件系统的情况下生成不冲突的新名称。
+    文件和子文件夹共用同一个命名空间；对每个基础名称记录下一个可用的编号后缀。
+    """
+
+    def __init__(self, names, case_insensitive=False):
+        self.case_insensitive = case_insensitive
+        self.names = {self._key(name) for name in names}
+        self.next_suffix = {}
+
+    @classmethod
+    def from_listing(cls, directory, names):
+        """
+        使用遍历时已经得到的目录列表建立索引
+        """
+        names = list(names)
+        return cls(names, case_insensitive=detect_case_insensitive(directory, names))
+
+    def _key(self, name):
+        return name.casefold() if self.case_insensitive else name
+
+    def __contains__(self, name):
+        return self._key(name) in self.names
+
+    def unique_name(self, base, ext=""):
+        """
+        返回 base + ext；如已存在，则在 base 末尾添加 _数字 后缀直到不冲突
+        """
+        candidate = base + ext
+        if candidate not in self:
+            return candidate
+        key = self._key(candidate)
+        counter = self.next_suffix.get(key, 1)
+        candidate = f"{base}_{counter}{ext}"
+        while candidate in self:
+            counter += 1
+            candidate = f"{base}_{counter}{ext}"
+        self.next_suffix[key] = counter + 1
+        return candidate
+
+    def add(self, name):
+        self.names.add(self._key(name))
+
+    def discard(self, name):
+        self.names.discard(self._key(name))
+
+    def rename(self, old_name, new_name):
+        """
+        重命名成功后同步更新索引
+        """
+        self.discard(old_name)
+        self.add(new_name)
@@ -0,0 +1,336 @@
+import struct
+
+# 复合文档（OLE2 / Compound File Binary）文件头签名
+OLE2_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# 特殊扇区编号
+FREESECT = 0xFFFFFFFF
+ENDOFCHAIN = 0xFFFFFFFE
+FATSECT = 0xFFFFFFFD
+DIFSECT = 0xFFFFFFFC
+NOSTREAM = 0xFFFFFFFF
+
+# 目录项类型
+STGTY_STREAM = 2
+STGTY_ROOT = 5
+
+
+class OLE2Error(Exception):
+    """文件不是有效的复合文档，或其中的结构无法解析"""
+
+
+class CompoundFile:
+    """
+    纯 Python 实现的复合文档读取器，用于在不启动 Office 的情况下读取 doc/ppt/xls 中的数据流。
+    """
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as f:
+            self.data = f.read()
+        if len(self.data) < 512 or self.data[:8] != OLE2_SIGNATURE:
+            raise OLE2Error("不是复合文档格式")
+
+        (sector_shift, mini_shift) = struct.unpack_from("<HH", self.data, 0x1E)
+        (num_fat_sectors, first_dir_sector, _, self.mini_cutoff,
+         first_minifat_sector, num_minifat_sectors,
+         first_difat_sector, num_difat_sectors) = struct.unpack_from("<8I", self.data, 0x2C)
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_shift
+        self.max_sectors = len(self.data) // self.sector_size + 1
+
+        self.fat = self._load_fat(num_fat_sectors, first_difat_sector, num_difat_sectors)
+        self.entries = self._load_directory(first_dir_sector)
+        if not self.entries or self.entries[0][1] != STGTY_ROOT:
+            raise OLE2Error("缺少根目录项")
+        root = self.entries[0]
+        self.mini_stream = self._read_chain(root[2], root[3]) if root[2] != ENDOFCHAIN else b""
+        self.minifat = []
+        if num_minifat_sectors and first_minifat_sector != ENDOFCHAIN:
+            raw = self._read_chain(first_minifat_sector)
+            self.minifat = list(struct.unpack(f"<{len(raw) // 4}I", raw))
+
+    def _sector(self, sid):
+        offset = (sid + 1) * self.sector_size
+        if sid >= self.max_sectors or offset >= len(self.data):
+            raise OLE2Error(f"扇区编号越界: {sid}")
+        return self.data[offset:offset + self.sector_size]
+
+    def _load_fat(self, num_fat_sectors, first_difat_sector, num_difat_sectors):
+        # 文件头中保存前 109 个 FAT 扇区的位置，其余的在 DIFAT 扇区链中
+        fat_sectors = list(struct.unpack_from("<109I", self.data, 0x4C))
+        sid = first_difat_sector
+        per_sector = self.sector_size // 4 - 1
+        for _ in range(num_difat_sectors):
+            if sid in (ENDOFCHAIN, FREESECT):
+                break
+            values = struct.unpack(f"<{per_sector + 1}I", self._sector(sid))
+            fat_sectors.extend(values[:per_sector])
+            sid = values[per_sector]
+        fat = []
+        for sid in fat_sectors[:num_fat_sectors]:
+            if sid in (FREESECT, ENDOFCHAIN):
+                break
+            fat.extend(struct.unpack(f"<{self.sector_size // 4}I", self._sector(sid)))
+        return fat
+
+    def _chain(self, start, table, limit):
+        """按分配表返回扇区链上的扇区编号，遇到循环或越界时报错"""
+        sid = start
+        for _ in range(limit):
+            if sid == ENDOFCHAIN:
+                return
+            if sid >= len(table):
+                raise OLE2Error(f"扇区链损坏: {sid}")
+            yield sid
+            sid = table[sid]
+        raise OLE2Error("扇区链出现循环")
+
+    def _read_chain(self, start, size=None):
+        data = b"".join(self._sector(sid) for sid in self._chain(start, self.fat, self.max_sectors))
+        return data if size is None else data[:size]
+
+    def _read_mini_chain(self, start, size):
+        mini_count = len(self.mini_stream) // self.mini_sector_size + 1
+        parts = []
+        for sid in self._chain(start, self.minifat, mini_count):
+            offset = sid * self.mini_sector_size
+            parts.append(self.mini_stream[offset:offset + self.mini_sector_size])
+        return b"".join(parts)[:size]
+
+    def _load_directory(self, first_dir_sector):
+        raw = self._read_chain(first_dir_sector)
+        entries = []
+        for offset in range(0, len(raw) - 127, 128):
+            name_len, entry_type = struct.unpack_from("<HB", raw, offset + 64)
+            name = raw[offset:offset + max(0, name_len - 2)].decode("utf-16-le", "replace")
+            start, size = struct.unpack_from("<IQ", raw, offset + 116)
+            if self.sector_size == 512:
+                # 版本 3 的文件只使用大小字段的低 32 位
+                size &= 0xFFFFFFFF
+            entries.append((name, entry_type, start, size))
+        return entries
+
+    def list_streams(self):
+        """返回所有数据流的名称"""
+        return [entry[0] for entry in self.entries if entry[1] == STGTY_STREAM]
+
+    def read_stream(self, name):
+        """按名称（不区分大小写）读取数据流内容，不存在时返回 None"""
+        for entry_name, entry_type, start, size in self.entries:
+            if entry_type == STGTY_STREAM and entry_name.lower() == name.lower():
+                if size < self.mini_cutoff:
+                    return self._read_mini_chain(start, size)
+                return self._read_chain(start, size)
+        return None
+
+
+def _split_paragraphs(pieces, separator):
+    """
+    把可能在任意位置断开的文本片段重新拼接，并按段落分隔符逐段返回
+    """
+    pending = ""
+    for piece in pieces:
+        pending += piece
+        *paragraphs, pending = pending.split(separator)
+        for paragraph in paragraphs:
+            if paragraph.strip():
+                yield paragraph
+    if pending.strip():
+        yield pending
+
+
+def _iter_word_pieces(cf):
+    word = cf.read_stream("WordDocument")
+    if word is None or len(word) < 0x1AA:
+        raise OLE2Error("缺少 WordDocument 数据流")
+    ident, _, _, _, flags = struct.unpack_from("<HHHHH", word, 0)
+    if ident != 0xA5EC:
+        raise OLE2Error("不支持的 Word 文件版本")
+    if flags & 0x0100:
+        raise OLE2Error("文件已加密")
+    table = cf.read_stream("1Table" if flags & 0x0200 else "0Table")
+    if table is None:
+        raise OLE2Error("缺少 Table 数据流")
+
+    # FibRgFcLcb97 中 fcClx / lcbClx 的位置
+    fc_clx, lcb_clx = struct.unpack_from("<II", word, 0x1A2)
+    clx = table[fc_clx:fc_clx + lcb_clx]
+    pos = 0
+    while pos < len(clx) and clx[pos] == 0x01:
+        # 跳过 Prc（格式属性），只需要后面的 Pcdt（片段表）
+        pos += 3 + struct.unpack_from("<H", clx, pos + 1)[0]
+    if pos + 5 > len(clx) or clx[pos] != 0x02:
+        raise OLE2Error("找不到片段表")
+    lcb = struct.unpack_from("<I", clx, pos + 1)[0]
+    plc = clx[pos + 5:pos + 5 + lcb]
+    count = (len(plc) - 4) // 12
+    cps = struct.unpack_from(f"<{count + 1}I", plc, 0)
+    for i in range(count):
+        fc_raw = struct.unpack_from("<I", plc, 4 * (count + 1) + 8 * i + 2)[0]
+        length = cps[i + 1] - cps[i]
+        fc = fc_raw & 0x3FFFFFFF
+        if fc_raw & 0x40000000:
+            # 压缩片段：每个字符一个字节
+            yield word[fc // 2:fc // 2 + length].decode("cp1252", "replace")
+        else:
+            yield word[fc:fc + 2 * length].decode("utf-16-le", "replace")
+
+
+def iter_doc_text(file_path):
+    """
+    通过 WordDocument 的片段表（piece table）逐段返回 doc 文件的文本
+    """
+    yield from _split_paragraphs(_iter_word_pieces(CompoundFile(file_path)), "\r")
+
+
+# PowerPoint 文本原子记录类型
+PPT_TEXT_CHARS_ATOM = 0x0FA0
+PPT_TEXT_BYTES_ATOM = 0x0FA8
+
+
+def iter_ppt_text(file_path):
+    """
+    顺序扫描 PowerPoint Document 数据流中的记录，逐段返回文本原子中的文字
+    """
+    data = CompoundFile(file_path).read_stream("PowerPoint Document")
+    if data is None:
+        raise OLE2Error("缺少 PowerPoint Document 数据流")
+    pos = 0
+    while pos + 8 <= len(data):
+        ver_instance, rec_type, rec_len = struct.unpack_from("<HHI", data, pos)
+        pos += 8
+        if ver_instance & 0x000F == 0x000F:
+            # 容器记录：直接进入其中的子记录
+            continue
+        body = data[pos:pos + rec_len]
+        pos += rec_len
+        if rec_type == PPT_TEXT_CHARS_ATOM:
+            text = body.decode("utf-16-le", "replace")
+        elif rec_type == PPT_TEXT_BYTES_ATOM:
+            text = body.decode("latin-1")
+        else:
+            continue
+        for paragraph in text.split("\r"):
+            if paragraph.strip():
+                yield paragraph
+
+
+# BIFF 记录类型
+BIFF_BOF = 0x0809
+BIFF_CODEPAGE = 0x0042
+BIFF_CONTINUE = 0x003C
+BIFF_SST = 0x00FC
+BIFF_LABEL = 0x0204
+BIFF_LABELSST = 0x00FD
+
+
+class _ContinueReader:
+    """
+    依次读取 SST 记录及其后 CONTINUE 记录中的数据。
+    字符串在 CONTINUE 处断开时，新记录的第一个字节重新指定字符宽度。
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.index = 0
+        self.pos = 0
+
+    def read(self, size):
+        parts = []
+        while size > 0:
+            segment = self.segments[self.index]
+            if self.pos >= len(segment):
+                self._next_segment()
+                continue
+            chunk = segment[self.pos:self.pos + size]
+            parts.append(chunk)
+            self.pos += len(chunk)
+            size -= len(chunk)
+        return b"".join(parts)
+
+    def read_chars(self, count, high_byte):
+        parts = []
+        while count > 0:
+            segment = self.segments[self.index]
+            width = 2 if high_byte else 1
+            if len(segment) - self.pos < width:
+                self._next_segment()
+                high_byte = self.segments[self.index][0] & 0x01
+                self.pos = 1
+                continue
+            take = min(count, (len(segment) - self.pos) // width)
+            chunk = segment[self.pos:self.pos + take * width]
+            parts.append(chunk.decode("utf-16-le" if high_byte else "latin-1", "replace"))
+            self.pos += take * width
+            count -= take
+        return "".join(parts)
+
+    def _next_segment(self):
+        self.index += 1
+        self.pos = 0
+        if self.index >= len(self.segments):
+            raise OLE2Error("SST 记录不完整")
+
+
+def _parse_sst(segments):
+    reader = _ContinueReader(segments)
+    _, unique_count = struct.unpack("<II", reader.read(8))
+    strings = []
+    for _ in range(unique_count):
+        char_count, flags = struct.unpack("<HB", reader.read(3))
+        runs = struct.unpack("<H", reader.read(2))[0] if flags & 0x08 else 0
+        ext_size = struct.unpack("<I", reader.read(4))[0] if flags & 0x04 else 0
+        strings.append(reader.read_chars(char_count, flags & 0x01))
+        reader.read(4 * runs + ext_size)
+    return strings
+
+
+def _iter_biff_records(data):
+    pos = 0
+    while pos + 4 <= len(data):
+        rec_type, rec_len = struct.unpack_from("<HH", data, pos)
+        yield rec_type, data[pos + 4:pos + 4 + rec_len]
+        pos += 4 + rec_len
+
+
+def iter_xls_text(file_path):
+    """
+    按记录顺序逐个返回 xls 工作簿中文本单元格的内容（BIFF8 共享字符串及 LABEL 记录，兼容 BIFF5）
+    """
+    cf = CompoundFile(file_path)
+    data = cf.read_stream("Workbook") or cf.read_stream("Book")
+    if data is None:
+        raise OLE2Error("缺少 Workbook 数据流")
+    records = list(_iter_biff_records(data))
+    biff8 = True
+    codepage = "cp1252"
+    sst = []
+    for i, (rec_type, body) in enumerate(records):
+        if rec_type == BIFF_BOF and len(body) >= 2:
+            biff8 = struct.unpack_from("<H", body, 0)[0] >= 0x0600
+        elif rec_type == BIFF_CODEPAGE and len(body) >= 2:
+            codepage = f"cp{struct.unpack_from('<H', body, 0)[0]}"
+        elif rec_type == BIFF_SST:
+            segments = [body]
+            for next_type, next_body in records[i + 1:]:
+                if next_type != BIFF_CONTINUE:
+                    break
+                segments.append(next_body)
+            sst = _parse_sst(segments)
+        elif rec_type == BIFF_LABELSST and len(body) >= 10:
+            index = struct.unpack_from("<I", body, 6)[0]
+            if index < len(sst) and sst[index]:
+                yield sst[index]
+        elif rec_type == BIFF_LABEL and len(body) >= 8:
+            char_count = struct.unpack_from("<H", body, 6)[0]
+            if biff8:
+                high_byte = body[8] & 0x01
+                raw = body[9:9 + char_count * (2 if high_byte else 1)]
+                text = raw.decode("utf-16-le" if high_byte else "latin-1", "replace")
+            else:
+                try:
+                    text = body[8:8 + char_count].decode(codepage, "replace")
+                except LookupError:
+                    text = body[8:8 + char_count].decode("cp1252", "replace")
+            if text:
+                yield text
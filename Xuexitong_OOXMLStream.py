@@ -0,0 +1,159 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+# OOXML 命名空间
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+S_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _read_rels(zf, part_name):
+    """
+    读取某个部件的关系文件，返回 {关系ID: 目标部件路径}
+    """
+    directory, filename = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, "_rels", filename + ".rels")
+    try:
+        root = ET.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(REL_NS + "Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        rels[rel.get("Id")] = target
+    return rels
+
+
+def _ordered_parts(zf, main_part, item_tag):
+    """
+    按主部件（presentation.xml / workbook.xml）中的顺序返回幻灯片或工作表部件路径
+    """
+    rels = _read_rels(zf, main_part)
+    parts = []
+    for elem in ET.fromstring(zf.read(main_part)).iter(item_tag):
+        target = rels.get(elem.get(R_NS + "id"))
+        if target and target in zf.NameToInfo:
+            parts.append(target)
+    return parts
+
+
+def _iter_paragraphs(stream, para_tag, text_tag, tab_tag=None, break_tag=None, break_char="\n"):
+    """
+    增量解析 XML，每遇到一个段落结束就返回该段落的文本。
+    已处理的元素立即清空，内存占用与文档大小无关。
+    """
+    parts = []
+    for event, elem in ET.iterparse(stream, events=("end",)):
+        tag = elem.tag
+        if tag == text_tag:
+            if elem.text:
+                parts.append(elem.text)
+        elif tag == tab_tag:
+            parts.append("\t")
+        elif tag == break_tag:
+            parts.append(break_char)
+        elif tag == para_tag:
+            text = "".join(parts)
+            parts = []
+            elem.clear()
+            if text.strip():
+                yield text
+
+
+def iter_docx_text(file_path):
+    """
+    逐段返回 docx 文件的文本（包括表格中的段落），不构建完整的文档对象
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        with zf.open("word/document.xml") as stream:
+            yield from _iter_paragraphs(stream, W_NS + "p", W_NS + "t",
+                                        tab_tag=W_NS + "tab", break_tag=W_NS + "br")
+
+
+def iter_pptx_text(file_path):
+    """
+    按幻灯片顺序逐段返回 pptx 文件的文本
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        for slide_part in _ordered_parts(zf, "ppt/presentation.xml", P_NS + "sldId"):
+            with zf.open(slide_part) as stream:
+                # 与 python-pptx 一致，段内换行用 \v 表示
+                yield from _iter_paragraphs(stream, A_NS + "p", A_NS + "t",
+                                            break_tag=A_NS + "br", break_char="\v")
+
+
+class _SharedStrings:
+    """
+    按需增量读取 xlsx 的共享字符串表：只解析到当前需要的序号为止
+    """
+
+    def __init__(self, zf):
+        self.values = []
+        self._events = None
+        if "xl/sharedStrings.xml" in zf.NameToInfo:
+            self._stream = zf.open("xl/sharedStrings.xml")
+            self._events = ET.iterparse(self._stream, events=("end",))
+
+    def get(self, index):
+        while index >= len(self.values) and self._events is not None:
+            for event, elem in self._events:
+                if elem.tag == S_NS + "si":
+                    # 只取 <t> 和富文本 <r><t>，不包括注音（rPh）中的文本
+                    texts = []
+                    for child in elem:
+                        if child.tag == S_NS + "t":
+                            texts.append(child.text or "")
+                        elif child.tag == S_NS + "r":
+                            texts.extend(t.text or "" for t in child.iter(S_NS + "t"))
+                    self.values.append("".join(texts))
+                    elem.clear()
+                    break
+            else:
+                self.close()
+        return self.values[index] if index < len(self.values) else ""
+
+    def close(self):
+        if self._events is not None:
+            self._stream.close()
+            self._events = None
+
+
+def iter_xlsx_text(file_path):
+    """
+    按工作表顺序逐个返回 xlsx 单元格中的文本。
+    数值、布尔等单元格不可能包含中文，直接跳过。
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        shared = _SharedStrings(zf)
+        try:
+            for sheet_part in _ordered_parts(zf, "xl/workbook.xml", S_NS + "sheet"):
+                with zf.open(sheet_part) as stream:
+                    for event, elem in ET.iterparse(stream, events=("end",)):
+                        if elem.tag != S_NS + "c":
+                            if elem.tag == S_NS + "row":
+                                elem.clear()
+                            continue
+                        cell_type = elem.get("t")
+                        text = None
+                        if cell_type == "s":
+                            value = elem.find(S_NS + "v")
+                            if value is not None and value.text:
+                                text = shared.get(int(value.text))
+                        elif cell_type == "inlineStr":
+                            text = "".join(t.text or "" for t in elem.iter(S_NS + "t"))
+                        elif cell_type == "str":
+                            value = elem.find(S_NS + "v")
+                            text = value.text if value is not None else None
+                        elem.clear()
+                        if text:
+                            yield text
+        finally:
+            shared.close()
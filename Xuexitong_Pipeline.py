@@ -0,0 +1,505 @@
+import os
+import time
+import queue
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Xuexitong_NameIndex import DirectoryNameIndex
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
+from Xuexitong_00_Remove_ad import AdStringMatcher, load_patterns
+from Xuexitong_02_ReplaceSymbol import clean_name
+from Xuexitong_03_Rename_files_by_Content import (ALLOWED_EXTENSIONS, extract_name_from_file,
+                                                  apply_content_rename)
+from Xuexitong_01_html2pdf import convert_single_html
+from Xuexitong_04_SplitDirWithin50Files import split_folder_if_needed, SPLIT_MODES
+from Xuexitong_Split import iter_file_names
+from Remove_empty_dir import remove_empty_folders
+from Xuexitong_Dedup import deduplicate, ACTIONS as DEDUP_ACTIONS
+from Xuexitong_Supervisor import SupervisedExtractor, Quarantine, DEFAULT_TIMEOUT, DEFAULT_MEMORY_MB
+
+# 队列结束标记
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线中的一个处理步骤：workers 个线程从 inbox 取出条目，处理后放入 outbox。
+    队列有长度上限，下游处理不过来时上游自动等待（背压）。
+    处理出错的条目原样传给下游，保证每个文件都能到达流水线末端。
+    """
+
+    def __init__(self, name, func, inbox, outbox=None, workers=1):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.remaining = workers
+        self.lock = threading.Lock()
+        self.count = 0
+        self.busy_time = 0.0
+        self.threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                # 放回结束标记，让同一步骤的其他线程也能退出；最后一个线程通知下游
+                self.inbox.put(_DONE)
+                with self.lock:
+                    self.remaining -= 1
+                    last = self.remaining == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(_DONE)
+                return
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                METRICS.event("stage_error", f"[{self.name}] 处理 {item} 时出错: {e}", level=INFO,
+                              stage=self.name, item=item)
+                result = item
+            elapsed = time.perf_counter() - start
+            METRICS.observe("stage", elapsed, stage=self.name)
+            with self.lock:
+                self.count += 1
+                self.busy_time += elapsed
+            if self.outbox is not None:
+                self.outbox.put(result)
+
+
+class Pipeline:
+    """
+    把去广告字符串、特殊符号清理、按内容重命名、HTML转PDF、拆分目录、删除空目录和上传串成一条流水线。
+    遍历目录的同时把文件逐个送入流水线，每个文件处理完一个步骤就进入下一个步骤，
+    CPU 密集的内容解析和 I/O 密集的转换、移动、上传可以同时进行；
+    步骤之间使用有长度上限的队列，内存占用与目录树的大小无关。
+    """
+
+    def __init__(self, root_dir, ad_strings=("D1127_",), workers=None, jobs=None,
+                 max_files=50, queue_size=256, rename_by_content=True, convert_html=True,
+                 remove_empty=True, upload=None, max_bytes=None, split_mode="stream", upload_workers=1,
+                 timeout=DEFAULT_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB, quarantine=None, dedup=None):
+        self.root_dir = os.path.normpath(root_dir)
+        self.ad_matcher = AdStringMatcher(ad_strings)
+        self.workers = workers or os.cpu_count() or 1
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.split_mode = split_mode
+        self.queue_size = queue_size
+        self.rename_by_content = rename_by_content
+        self.convert_html = convert_html
+        self.remove_empty = remove_empty
+        self.upload = upload
+        self.upload_workers = upload_workers
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.quarantine = quarantine
+        self.dedup = dedup
+
+        # 所有重命名都在这把锁下进行，各目录的名称索引在遍历时建立、目录处理完后释放
+        self.rename_lock = threading.Lock()
+        self.indexes = {}
+        # 每个目录还有多少文件没有走完流水线
+        self.pending_files = {}
+        self.pool = None
+
+    def _clean(self, name):
+        with self.rename_lock:
+            name = self.ad_matcher.replace(name)
+        return clean_name(name)
+
+    def _rename_entry(self, directory, name):
+        """
+        去掉名称中的广告字符串并清理特殊符号，返回新名称
+        """
+        new_name = self._clean(name)
+        if new_name == name:
+            return name
+        old_path = os.path.join(directory, name)
+        with self.rename_lock:
+            index = self.indexes[directory]
+            new_name = index.unique_name(*os.path.splitext(new_name))
+            new_path = os.path.join(directory, new_name)
+            with METRICS.timer("rename", step="清理名称"):
+                os.rename(old_path, new_path)
+            index.rename(name, new_name)
+        METRICS.event("rename", f"重命名: {old_path} -> {new_path}", src=old_path, dst=new_path)
+        return new_name
+
+    def produce(self, inbox):
+        """
+        自顶向下遍历目录：先清理子目录名称再进入子目录，把每个文件送入流水线
+        """
+        try:
+            self._walk_and_feed(inbox)
+        finally:
+            inbox.put(_DONE)
+
+    def _walk_and_feed(self, inbox):
+        stack = [self.root_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in it]
+            except OSError as e:
+                print(f"无法读取目录 {directory}: {e}")
+                continue
+            with self.rename_lock:
+                self.indexes[directory] = DirectoryNameIndex.from_listing(
+                    directory, [name for name, is_dir in entries])
+            subdirs = []
+            files = []
+            for name, is_dir in entries:
+                if is_dir:
+                    try:
+                        subdirs.append(self._rename_entry(directory, name))
+                    except OSError as e:
+                        print(f"重命名目录 {os.path.join(directory, name)} 时出错: {e}")
+                        subdirs.append(name)
+                else:
+                    files.append(name)
+            with self.rename_lock:
+                if files:
+                    self.pending_files[directory] = len(files)
+                else:
+                    self._release(directory)
+            for name in files:
+                inbox.put((directory, os.path.join(directory, name)))
+            stack.extend(os.path.join(directory, name) for name in reversed(subdirs))
+
+    def _release(self, directory):
+        self.indexes.pop(directory, None)
+
+    def clean_file_name(self, item):
+        directory, path = item
+        new_name = self._rename_entry(directory, os.path.basename(path))
+        return directory, os.path.join(directory, new_name)
+
+    def rename_file_by_content(self, item):
+        directory, path = item
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() not in ALLOWED_EXTENSIONS or len(name) >= 6:
+            return item
+        if self.quarantine is not None and path in self.quarantine:
+            METRICS.event("quarantine_skip", f"跳过隔离清单中的文件: {path}", level=INFO, path=path)
+            return item
+        # 解析在受监督的工作进程中进行，重命名回到本线程在锁内完成；解析失败的文件不重命名
+        ok, append_str = self.pool.run(path)
+        if not ok:
+            return item
+        with self.rename_lock:
+            new_path = apply_content_rename(directory, name, ext, append_str,
+                                            index=self.indexes[directory])
+        return directory, new_path
+
+    def convert_html_file(self, item):
+        directory, path = item
+        if not path.lower().endswith(('.htm', '.html')):
+            return item
+        if convert_single_html(path):
+            return directory, os.path.splitext(path)[0] + '.pdf'
+        return item
+
+    def finish_directory(self, directory, upload_queue):
+        """
+        目录中的文件全部处理完后拆分该目录，并把需要上传的文件夹送入上传队列：
+        拆分出的各个子文件夹，以及仍直接包含文件的该目录本身（即使它还有子目录）。
+        上传函数只上传文件夹中直属的文件，子目录各自单独上传，不会重复。
+        返回拆分出的子文件夹列表。
+        """
+        with self.rename_lock:
+            self._release(directory)
+        split_folders = split_folder_if_needed(directory, max_files=self.max_files,
+                                               max_bytes=self.max_bytes, mode=self.split_mode)
+        if upload_queue is None:
+            return split_folders
+        for folder in split_folders:
+            upload_queue.put(folder)
+        if next(iter_file_names(directory), None) is not None:
+            upload_queue.put(directory)
+        return split_folders
+
+    def start_extractor(self):
+        """
+        启动解析文件内容用的受监督工作进程
+        """
+        self.pool = SupervisedExtractor(self.workers, extract_name_from_file, timeout=self.timeout,
+                                        memory_mb=self.memory_mb, quarantine=self.quarantine)
+
+    def file_steps(self):
+        """
+        每个文件依次经过的步骤 [(名称, 函数)]
+        """
+        steps = [("清理名称", self.clean_file_name)]
+        if self.rename_by_content:
+            steps.append(("按内容重命名", self.rename_file_by_content))
+        if self.convert_html:
+            steps.append(("HTML转PDF", self.convert_html_file))
+        return steps
+
+    def process_files(self, directory, file_names, dir_names=()):
+        """
+        只处理一个目录中新出现的条目（监视模式使用）：清理新子目录的名称；
+        新文件依次经过各步骤（多个文件在 workers 个线程中并行）。不上传，也不删除空目录。
+        处理完后由调用方调用 finish_directory(directory, None) 按需拆分该目录并释放名称索引。
+        返回 ({原子目录路径: 新路径}, 处理后的文件路径列表)
+        """
+        try:
+            names = os.listdir(directory)
+        except OSError as e:
+            METRICS.event("stage_error", f"无法读取目录 {directory}: {e}", level=INFO, item=directory)
+            return {}, []
+        with self.rename_lock:
+            self.indexes[directory] = DirectoryNameIndex.from_listing(directory, names)
+        moved = {}
+        for name in dir_names:
+            try:
+                new_name = self._rename_entry(directory, name)
+            except OSError as e:
+                METRICS.event("rename_error", f"重命名目录 {os.path.join(directory, name)} 时出错: {e}",
+                              level=INFO, path=os.path.join(directory, name))
+                continue
+            if new_name != name:
+                moved[os.path.join(directory, name)] = os.path.join(directory, new_name)
+
+        steps = self.file_steps()
+
+        def process(name):
+            item = (directory, os.path.join(directory, name))
+            for step_name, func in steps:
+                start = time.perf_counter()
+                try:
+                    item = func(item)
+                except Exception as e:
+                    METRICS.event("stage_error", f"[{step_name}] 处理 {item} 时出错: {e}", level=INFO,
+                                  stage=step_name, item=item)
+                METRICS.observe("stage", time.perf_counter() - start, stage=step_name)
+            return item[1]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            paths = list(executor.map(process, file_names))
+        return moved, paths
+
+    def run(self):
+        start = time.perf_counter()
+        if self.dedup is not None:
+            # 重复文件在进入流水线之前处理；只有 drop 会删除副本，使其不再被转换和上传，
+            # report 只报告，link 把副本换成硬链接，副本仍会照常转换和上传
+            deduplicate(self.root_dir, action=self.dedup, workers=self.workers)
+
+        def make_queue():
+            return queue.Queue(maxsize=self.queue_size)
+
+        inbox = make_queue()
+        stages = []
+        current = inbox
+
+        def add_stage(name, func, workers=1):
+            nonlocal current
+            outbox = make_queue()
+            stages.append(Stage(name, func, current, outbox, workers=workers))
+            current = outbox
+
+        add_stage("清理名称", self.clean_file_name)
+        if self.rename_by_content:
+            self.start_extractor()
+            add_stage("按内容重命名", self.rename_file_by_content, workers=self.workers)
+        if self.convert_html:
+            add_stage("HTML转PDF", self.convert_html_file, workers=self.jobs)
+
+        upload_queue = None
+        upload_stage = None
+        if self.upload is not None:
+            upload_queue = make_queue()
+            upload_stage = Stage("上传", self.upload, upload_queue, workers=self.upload_workers)
+            stages.append(upload_stage)
+
+        for stage in stages:
+            stage.start()
+        producer = threading.Thread(target=self.produce, args=(inbox,), daemon=True)
+        producer.start()
+
+        # 主线程收集走完流水线的文件，目录中的文件全部到达后拆分该目录
+        finished = 0
+        try:
+            while True:
+                item = current.get()
+                if item is _DONE:
+                    break
+                finished += 1
+                directory = item[0]
+                with self.rename_lock:
+                    self.pending_files[directory] -= 1
+                    complete = self.pending_files[directory] == 0
+                    if complete:
+                        del self.pending_files[directory]
+                if complete:
+                    self.finish_directory(directory, upload_queue)
+            producer.join()
+            if self.remove_empty:
+                count = remove_empty_folders(self.root_dir)
+                print(f"共删除 {count} 个空文件夹")
+            if upload_queue is not None:
+                upload_queue.put(_DONE)
+                upload_stage.join()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+
+        elapsed = time.perf_counter() - start
+        print(f"流水线完成: 共处理 {finished} 个文件，用时 {elapsed:.1f} 秒")
+        for stage in stages:
+            print(f"  {stage.name}: {stage.count} 项，累计耗时 {stage.busy_time:.1f} 秒（{stage.workers} 个线程）")
+        print(self.ad_matcher.report())
+        if self.pool is not None:
+            print(self.pool.report())
+        print(METRICS.summary())
+        return finished
+
+
+def make_selenium_uploader():
+    """
+    打开浏览器并等待登录，返回逐个上传文件夹的函数（与 Xuexitong_05_UploadAuto 的流程相同）
+    """
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from Xuexitong_05_UploadAuto import upload_folder
+
+    driver = webdriver.Chrome()
+    driver.get("https://passport2.chaoxing.com/login?fid=1743926720924")
+    print("请在打开的浏览器中完成登录操作，登录成功后在终端按回车继续...")
+    input()
+    driver.get("https://mooc1-2.chaoxing.com/mycourse/studentstudymain?courseId=xxxx")
+    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "uploadBtn")))
+
+    def upload(folder):
+        # 浏览器的文件夹上传控件会连同子文件夹一起上传，而子文件夹由流水线单独上传；
+        # 有子文件夹时只把直属的文件链接到临时的同名文件夹中再上传
+        with os.scandir(folder) as it:
+            entries = list(it)
+        if not any(entry.is_dir() for entry in entries):
+            return upload_folder(driver, folder)
+        staging = tempfile.mkdtemp(prefix="xuexitong_upload_")
+        try:
+            target = os.path.join(staging, os.path.basename(folder))
+            os.mkdir(target)
+            for entry in entries:
+                if entry.is_file():
+                    dst = os.path.join(target, entry.name)
+                    try:
+                        os.link(entry.path, dst)
+                    except OSError:
+                        shutil.copy2(entry.path, dst)
+            return upload_folder(driver, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    return upload
+
+
+def make_http_uploader(url, cookie=None, pool_size=4, ledger=None):
+    """
+    返回直接通过 HTTP 上传文件夹的函数（HTTPUploader），可由多个上传线程共用。
+    提供上传记录 UploadLedger 时跳过已上传或内容重复的文件
+    """
+    from Xuexitong_HTTPUpload import HTTPUploader
+    return HTTPUploader(url, headers={"Cookie": cookie} if cookie else None, pool_size=pool_size,
+                        ledger=ledger)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="依次执行去广告、清理符号、按内容重命名、HTML转PDF、拆分目录、删除空目录和上传")
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要处理的目录")
+    parser.add_argument("--ad-string", action="append", default=None,
+                        help="要从文件名中删除的广告字符串，可重复指定，默认为 D1127_")
+    parser.add_argument("--patterns", default=None, help="广告字符串列表文件，每行一个")
+    parser.add_argument("--workers", type=int, default=None, help="解析文件内容的进程数，默认为CPU核数")
+    parser.add_argument("--jobs", type=int, default=None, help="同时进行的HTML转换数，默认为CPU核数")
+    parser.add_argument("--max-files", type=int, default=50, help="每个文件夹最多保留的文件数")
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="每个文件夹的总大小上限（MB），指定后按大小均衡拆分")
+    parser.add_argument("--split-mode", choices=SPLIT_MODES, default=None,
+                        help="拆分方式：stream 按顺序分组，balance 按大小均衡，stable 按文件名顺序装箱")
+    parser.add_argument("--queue-size", type=int, default=256, help="步骤之间队列的长度上限")
+    parser.add_argument("--skip-content", action="store_true", help="不按内容重命名")
+    parser.add_argument("--skip-html", action="store_true", help="不转换HTML")
+    parser.add_argument("--keep-empty", action="store_true", help="不删除空文件夹")
+    parser.add_argument("--upload", action="store_true", help="处理完成的文件夹通过浏览器上传到学习通网盘")
+    parser.add_argument("--upload-url", default=None,
+                        help="网盘上传接口地址；指定后处理完成的文件夹直接通过 HTTP 上传，不再打开浏览器")
+    parser.add_argument("--cookie", default=None, help="登录后的 Cookie（与 --upload-url 一起使用）")
+    parser.add_argument("--upload-jobs", type=int, default=4, help="HTTP 上传时同时上传的文件夹数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="每个文件的解析时间上限（秒）")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="每个解析进程的内存上限（MB），为 0 时不限制")
+    parser.add_argument("--no-ledger", action="store_true",
+                        help="HTTP 上传时不使用上传记录（默认记录在目录旁边，跳过已上传和重复的文件）")
+    parser.add_argument("--dedup", choices=DEDUP_ACTIONS, default=None,
+                        help="处理前查找内容相同的文件：report 只报告，link 替换为硬链接，drop 删除副本")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    if not os.path.isdir(args.directory):
+        print("错误: 指定的路径不是一个有效的目录!")
+        exit(1)
+
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    # 解析失败的文件记入目录旁边的隔离清单，以后运行时跳过
+    quarantine = Quarantine(Quarantine.default_path(args.directory))
+    uploader = None
+    ledger = None
+    if args.upload_url:
+        if not args.no_ledger:
+            from Xuexitong_UploadLedger import UploadLedger
+            ledger = UploadLedger(UploadLedger.default_path(args.directory))
+        uploader = make_http_uploader(args.upload_url, args.cookie, args.upload_jobs, ledger)
+    elif args.upload:
+        uploader = make_selenium_uploader()
+    pipeline = Pipeline(args.directory,
+                        ad_strings=(load_patterns(args.patterns) if args.patterns else [])
+                        + (args.ad_string or ([] if args.patterns else ["D1127_"])),
+                        workers=args.workers,
+                        jobs=args.jobs,
+                        max_files=args.max_files,
+                        max_bytes=max_bytes,
+                        split_mode=args.split_mode or ("balance" if max_bytes else "stream"),
+                        queue_size=args.queue_size,
+                        rename_by_content=not args.skip_content,
+                        convert_html=not args.skip_html,
+                        remove_empty=not args.keep_empty,
+                        upload=uploader,
+                        upload_workers=args.upload_jobs if args.upload_url else 1,
+                        timeout=args.timeout,
+                        memory_mb=args.memory_mb or None,
+                        quarantine=quarantine,
+                        dedup=args.dedup)
+    try:
+        pipeline.run()
+    finally:
+        quarantine.close()
+        METRICS.close()
+    if ledger is not None:
+        print(ledger.report())
+        ledger.close()
+    print("处理完成!")
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+from Xuexitong_Metrics import METRICS, INFO
+
+# 支持 dir_fd 时在已打开的目录中用相对名称重命名，不再为每个文件重新解析完整路径
+DIR_FD_SUPPORTED = os.rename in os.supports_dir_fd
+O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+
+# 日志中一次运行的状态
+INCOMPLETE = "未完成"
+COMPLETED = "已完成"
+UNDONE = "已撤销"
+
+
+class RenameOp:
+    __slots__ = ("seq", "directory", "old", "new", "kind")
+
+    def __init__(self, seq, directory, old, new, kind=""):
+        self.seq = seq
+        self.directory = directory
+        self.old = old
+        self.new = new
+        self.kind = kind
+
+    @property
+    def old_path(self):
+        return os.path.join(self.directory, self.old)
+
+    @property
+    def new_path(self):
+        return os.path.join(self.directory, self.new)
+
+
+class RenameJournal:
+    """
+    只追加的重命名日志（JSON Lines）。每次运行先写入完整计划，再逐条记录完成、失败和撤销，
+    中断后可以据此继续完成剩余的重命名，或精确地撤销已完成的部分。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.run = None
+
+    @staticmethod
+    def default_path(root_dir):
+        """
+        日志默认放在目标目录旁边，不会被当作待处理文件
+        """
+        return os.path.normpath(os.path.abspath(root_dir)) + ".rename_journal.jsonl"
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def begin(self, step, ops):
+        """
+        开始一次运行：写入全部计划并同步到磁盘，之后才开始重命名
+        """
+        self.run = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._write({"op": "begin", "run": self.run, "step": step, "count": len(ops)})
+        for op in ops:
+            self._write({"op": "plan", "run": self.run, "seq": op.seq, "dir": op.directory,
+                         "old": op.old, "new": op.new, "kind": op.kind})
+        self.sync()
+
+    def resume(self, run):
+        self.run = run
+
+    def record(self, status, seq, error=None):
+        record = {"op": status, "run": self.run, "seq": seq}
+        if error is not None:
+            record["error"] = error
+        self._write(record)
+
+    def end(self, status):
+        self._write({"op": "end", "run": self.run, "status": status})
+        self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def load(path):
+        """
+        读取日志，按运行顺序返回 [{run, step, ops, done, failed, undone, status}]。
+        最后一行可能因中断而不完整，直接忽略
+        """
+        runs = {}
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                op = record.get("op")
+                if op == "begin":
+                    runs[record["run"]] = {"run": record["run"], "step": record["step"], "ops": [],
+                                           "done": set(), "failed": set(), "undone": set(), "status": INCOMPLETE}
+                    continue
+                run = runs.get(record.get("run"))
+                if run is None:
+                    continue
+                if op == "plan":
+                    run["ops"].append(RenameOp(record["seq"], record["dir"], record["old"], record["new"],
+                                               record.get("kind", "")))
+                elif op in ("done", "failed", "undone"):
+                    run[op].add(record["seq"])
+                elif op == "end":
+                    run["status"] = record["status"]
+        return list(runs.values())
+
+
+def _state(op):
+    """
+    根据磁盘上的实际情况判断日志中没有完成记录的操作是否已经执行（中断发生在重命名之后、写日志之前）
+    """
+    return os.path.lexists(op.new_path) and not os.path.lexists(op.old_path)
+
+
+def _execute(ops, step, forward=True, journal=None, on_renamed=None):
+    """
+    依次执行重命名（forward 为 False 时把新名称改回原名称），相同目录的连续操作只打开一次目录。
+    返回 (成功数, 失败数)
+    """
+    renamed = failed = 0
+    current = None
+    dir_fd = None
+    try:
+        for op in ops:
+            src, dst = (op.old, op.new) if forward else (op.new, op.old)
+            if DIR_FD_SUPPORTED and op.directory != current:
+                if dir_fd is not None:
+                    os.close(dir_fd)
+                    dir_fd = None
+                current = op.directory
+                try:
+                    dir_fd = os.open(current, os.O_RDONLY | O_DIRECTORY)
+                except OSError as e:
+                    METRICS.event("rename_error", f"打开目录 {current} 失败: {e}", level=INFO, path=current)
+            src_path = os.path.join(op.directory, src)
+            dst_path = os.path.join(op.directory, dst)
+            try:
+                with METRICS.timer("rename", step=step):
+                    if dir_fd is not None:
+                        os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                    else:
+                        os.rename(src_path, dst_path)
+            except OSError as e:
+                failed += 1
+                if journal is not None:
+                    journal.record("failed" if forward else "undo_failed", op.seq, str(e))
+                METRICS.event("rename_error", f"重命名{op.kind} {src_path} 时出错: {e}", level=INFO, path=src_path)
+                continue
+            renamed += 1
+            if journal is not None:
+                journal.record("done" if forward else "undone", op.seq)
+            METRICS.event("rename", f"重命名{op.kind}: {src_path} -> {dst_path}", src=src_path, dst=dst_path)
+            if on_renamed is not None:
+                # 重命名已经完成，同步清单或缓存出错不算重命名失败，也不中断其余的重命名
+                try:
+                    on_renamed(src_path, dst_path)
+                except Exception as e:
+                    METRICS.event("rename_sync_error", f"已重命名 {src_path}，但更新记录时出错: {e}",
+                                  level=INFO, src=src_path, dst=dst_path)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return renamed, failed
+
+
+class RenameExecutor:
+    """
+    批量重命名：先用 add 登记整个目录树的重命名计划，再由 apply 一次执行。
+    执行时按目录深度从深到浅、同一目录内按登记顺序进行，上级目录改名时其中的操作都已完成，
+    计划中的路径始终有效；每个目录只打开一次，用 dir_fd 相对名称重命名。
+    传入 RenameJournal 时先写入完整计划，再逐条记录结果。
+    :param step: 统计和日志中的步骤名称
+    :param journal: 重命名日志 RenameJournal
+    """
+
+    def __init__(self, step="重命名", journal=None):
+        self.step = step
+        self.journal = journal
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def add(self, directory, old_name, new_name, kind=""):
+        if old_name != new_name:
+            self.ops.append(RenameOp(len(self.ops), os.path.normpath(directory), old_name, new_name, kind))
+
+    def ordered(self):
+        return sorted(self.ops, key=lambda op: -op.directory.count(os.sep))
+
+    def apply(self, on_renamed=None):
+        """
+        执行计划，每成功一个调用 on_renamed(原路径, 新路径)，返回 (成功数, 失败数)
+        """
+        ops = self.ordered()
+        if not ops:
+            return 0, 0
+        if self.journal is not None:
+            self.journal.begin(self.step, ops)
+        renamed, failed = _execute(ops, self.step, journal=self.journal, on_renamed=on_renamed)
+        if self.journal is not None:
+            self.journal.end(COMPLETED)
+        self.ops = []
+        return renamed, failed
+
+
+def resume_last(journal):
+    """
+    继续执行日志中最后一次未完成的运行，返回 (成功数, 失败数)；没有未完成的运行时返回 None
+    """
+    runs = [run for run in RenameJournal.load(journal.path) if run["status"] == INCOMPLETE]
+    if not runs:
+        return None
+    run = runs[-1]
+    pending = [op for op in run["ops"]
+               if op.seq not in run["done"] and op.seq not in run["failed"] and not _state(op)]
+    print(f"继续执行 {run['run']}（{run['step']}）: 共 {len(run['ops'])} 项，剩余 {len(pending)} 项")
+    journal.resume(run["run"])
+    result = _execute(pending, run["step"], journal=journal)
+    journal.end(COMPLETED)
+    return result
+
+
+def undo_last(journal):
+    """
+    按相反顺序撤销日志中最后一次尚未撤销的运行中已完成的重命名（包括未完成的运行），
+    返回 (成功数, 失败数)；没有可撤销的运行时返回 None
+    """
+    runs = [run for run in RenameJournal.load(journal.path) if run["status"] != UNDONE]
+    if not runs:
+        return None
+    run = runs[-1]
+    done = [op for op in run["ops"]
+            if op.seq not in run["undone"] and (op.seq in run["done"] or _state(op))]
+    print(f"撤销 {run['run']}（{run['step']}）: 共 {len(done)} 项")
+    journal.resume(run["run"])
+    result = _execute(list(reversed(done)), run["step"], forward=False, journal=journal)
+    journal.end(UNDONE if not result[1] else INCOMPLETE)
+    return result
+
+
+def add_arguments(parser):
+    """
+    为命令行脚本添加重命名日志相关的参数
+    """
+    parser.add_argument("--journal", default=None, help="重命名日志路径，默认放在目标目录旁边")
+    parser.add_argument("--no-journal", action="store_true", help="不记录重命名日志")
+    parser.add_argument("--resume", action="store_true", help="继续执行日志中上次中断的重命名，然后退出")
+    parser.add_argument("--undo", action="store_true", help="撤销日志中最近一次运行的重命名，然后退出")
+
+
+def journal_from_args(args, root_dir):
+    """
+    按命令行参数打开重命名日志；指定 --resume 或 --undo 时执行后退出程序
+    """
+    if args.no_journal and not (args.resume or args.undo):
+        return None
+    journal = RenameJournal(args.journal or RenameJournal.default_path(root_dir))
+    if args.resume or args.undo:
+        result = resume_last(journal) if args.resume else undo_last(journal)
+        journal.close()
+        if result is None:
+            print("日志中没有需要处理的运行")
+        else:
+            print(f"完成: 成功 {result[0]} 项，失败 {result[1]} 项")
+        exit(0)
+    return journal
@@ -0,0 +1,182 @@
+import os
+from collections import namedtuple
+
+# 文件的大小和修改时间（纳秒）
+FileInfo = namedtuple("FileInfo", ["size", "mtime_ns"])
+
+
+class DirNode:
+    """
+    清单中的一个目录：子目录名 -> DirNode，文件名 -> FileInfo
+    """
+    __slots__ = ("dirs", "files")
+
+    def __init__(self):
+        self.dirs = {}
+        self.files = {}
+
+
+class TreeManifest:
+    """
+    目录树的内存清单，用 os.scandir 遍历一次得到所有目录、文件及其大小和修改时间。
+    各处理步骤通过 walk / listdir 读取清单，代替各自重新遍历目录；
+    重命名、移动、删除文件后调用相应方法更新清单，使后续步骤看到的内容与磁盘一致。
+    """
+
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        self.tree = DirNode()
+
+    @classmethod
+    def scan(cls, root):
+        """
+        遍历目录树建立清单。使用 DirEntry 缓存的类型信息，只对文件取一次 stat
+        """
+        manifest = cls(root)
+        stack = [(manifest.root, manifest.tree)]
+        while stack:
+            path, node = stack.pop()
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            child = DirNode()
+                            node.dirs[entry.name] = child
+                            stack.append((entry.path, child))
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            node.files[entry.name] = FileInfo(st.st_size, st.st_mtime_ns)
+            except OSError as e:
+                print(f"无法读取目录 {path}: {e}")
+        return manifest
+
+    def _parts(self, path):
+        rel = os.path.relpath(os.path.normpath(path), self.root)
+        if rel == os.curdir:
+            return []
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            raise ValueError(f"{path} 不在 {self.root} 之内")
+        return rel.split(os.sep)
+
+    def _node(self, path):
+        node = self.tree
+        for part in self._parts(path):
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _parent(self, path):
+        parts = self._parts(path)
+        if not parts:
+            raise ValueError("不能修改清单的根目录")
+        parent = self.tree
+        for part in parts[:-1]:
+            parent = parent.dirs.get(part)
+            if parent is None:
+                raise KeyError(path)
+        return parent, parts[-1]
+
+    def is_dir(self, path):
+        return self._node(path) is not None
+
+    def file_info(self, path):
+        """
+        返回文件的 FileInfo，文件不在清单中时返回 None
+        """
+        try:
+            parent, name = self._parent(path)
+        except (KeyError, ValueError):
+            return None
+        return parent.files.get(name)
+
+    def listdir(self, path):
+        """
+        返回 (子目录名列表, 文件名列表)
+        """
+        node = self._node(path)
+        if node is None:
+            raise FileNotFoundError(path)
+        return list(node.dirs), list(node.files)
+
+    def walk(self, top=None, topdown=True):
+        """
+        与 os.walk 用法相同，但从清单中读取，不访问文件系统。
+        topdown 为 True 时，可以像 os.walk 一样修改返回的 dirnames 来控制进入哪些子目录。
+        """
+        top = self.root if top is None else os.path.normpath(top)
+        node = self._node(top)
+        if node is not None:
+            yield from self._walk(top, node, topdown)
+
+    def _walk(self, path, node, topdown):
+        dirnames = list(node.dirs)
+        filenames = list(node.files)
+        if topdown:
+            yield path, dirnames, filenames
+        for name in dirnames:
+            child = node.dirs.get(name)
+            if child is not None:
+                yield from self._walk(os.path.join(path, name), child, topdown)
+        if not topdown:
+            yield path, dirnames, filenames
+
+    def iter_files(self, top=None):
+        """
+        依次返回 (文件路径, FileInfo)
+        """
+        for path, dirnames, filenames in self.walk(top):
+            node = self._node(path)
+            for name in filenames:
+                yield os.path.join(path, name), node.files[name]
+
+    def add_file(self, path, info=None):
+        """
+        登记新文件；不提供 info 时从磁盘读取
+        """
+        if info is None:
+            st = os.stat(path)
+            info = FileInfo(st.st_size, st.st_mtime_ns)
+        parent, name = self._parent(path)
+        parent.files[name] = info
+
+    def add_dir(self, path):
+        parent, name = self._parent(path)
+        return parent.dirs.setdefault(name, DirNode())
+
+    def remove(self, path):
+        """
+        从清单中删除文件或目录（目录连同其内容），不存在时忽略
+        """
+        try:
+            parent, name = self._parent(path)
+        except KeyError:
+            return
+        parent.files.pop(name, None)
+        parent.dirs.pop(name, None)
+
+    def rename(self, old_path, new_path):
+        """
+        重命名或移动文件、目录后更新清单
+        """
+        old_parent, old_name = self._parent(old_path)
+        new_parent, new_name = self._parent(new_path)
+        if old_name in old_parent.files:
+            new_parent.files[new_name] = old_parent.files.pop(old_name)
+        elif old_name in old_parent.dirs:
+            new_parent.dirs[new_name] = old_parent.dirs.pop(old_name)
+        else:
+            raise KeyError(old_path)
+
+    def counts(self):
+        """
+        返回 (目录数量, 文件数量)
+        """
+        dirs = files = 0
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            dirs += len(node.dirs)
+            files += len(node.files)
+            stack.extend(node.dirs.values())
+        return dirs, files
@@ -0,0 +1,243 @@
+import os
+import re
+import errno
+import math
+import heapq
+import time
+import shutil
+from Xuexitong_Metrics import METRICS, INFO
+
+
+def iter_file_names(folder):
+    """
+    用 os.scandir 逐个返回文件夹中的文件名（不含子文件夹），
+    判断类型使用 DirEntry 缓存的信息，不再对每一项单独 stat
+    """
+    with os.scandir(folder) as it:
+        for entry in it:
+            try:
+                if entry.is_file():
+                    yield entry.name
+            except OSError:
+                continue
+
+
+def move_file(src, dst):
+    """
+    移动文件：同一设备上直接 os.rename，只有跨设备时才交给 shutil.move 复制后删除。
+    目标已存在时抛出 FileExistsError，不覆盖已有的文件
+    """
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "目标文件已存在", dst)
+    start = time.perf_counter()
+    try:
+        os.rename(src, dst)
+        METRICS.observe("move", time.perf_counter() - start, method="rename")
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+        METRICS.observe("move", time.perf_counter() - start, method="copy")
+
+
+def last_bucket_number(parent, name):
+    """
+    返回 parent 中已有的 name_编号 文件夹的最大编号，没有时返回 0
+    """
+    pattern = re.compile(rf"{re.escape(name)}_(\d+)")
+    last = 0
+    try:
+        with os.scandir(parent) as it:
+            for entry in it:
+                match = pattern.fullmatch(entry.name)
+                if match and entry.is_dir(follow_symlinks=False):
+                    last = max(last, int(match.group(1)))
+    except OSError:
+        pass
+    return last
+
+
+def numbered_bucket_path(parent, name):
+    """
+    返回编号文件夹路径函数：编号 i（从 1 开始）对应 parent/name_(N+i)，N 为 parent 中已有编号的最大值。
+    之前拆分出的文件夹不会再被装入文件，新文件夹的编号接在后面（监视模式下同一目录会多次拆分）。
+    已有编号在第一次调用时才读取，不需要拆分的目录不会多遍历一次
+    """
+    offset = None
+
+    def bucket_path(i):
+        nonlocal offset
+        if offset is None:
+            offset = last_bucket_number(parent, name)
+        return os.path.join(parent, f"{name}_{offset + i}")
+
+    return bucket_path
+
+
+class StreamingSplitter:
+    """
+    边遍历边把文件分装到编号文件夹中，每个文件夹不超过 max_files 个文件。
+    只缓存判断是否需要拆分所需的前 threshold + 1 个文件名，其余文件读到即移动，
+    内存占用与目录中的文件总数无关；目标文件夹在装满上一个时才创建。
+    :param folder: 要拆分的文件夹
+    :param bucket_path: 函数，参数为编号（从 1 开始），返回对应目标文件夹路径
+    :param max_files: 每个目标文件夹的文件数上限
+    :param threshold: 文件数超过该值才拆分，0 表示只要有文件就拆分
+    :param manifest: 目录清单 TreeManifest，提供时从清单读取文件列表并同步更新清单
+    """
+
+    def __init__(self, folder, bucket_path, max_files=50, threshold=0, manifest=None):
+        self.folder = folder
+        self.bucket_path = bucket_path
+        self.max_files = max_files
+        self.threshold = threshold
+        self.manifest = manifest
+        self.buckets = []
+        self.in_bucket = max_files
+        self.moved = 0
+        self.failed = set()
+
+    def _listing(self):
+        if self.manifest is not None:
+            return iter(self.manifest.listdir(self.folder)[1])
+        return iter_file_names(self.folder)
+
+    def _place(self, name):
+        if self.in_bucket >= self.max_files:
+            bucket = self.bucket_path(len(self.buckets) + 1)
+            os.makedirs(bucket, exist_ok=True)
+            if self.manifest is not None:
+                self.manifest.add_dir(bucket)
+            self.buckets.append(bucket)
+            self.in_bucket = 0
+        src = os.path.join(self.folder, name)
+        dst = os.path.join(self.buckets[-1], name)
+        try:
+            move_file(src, dst)
+        except OSError as e:
+            self.failed.add(name)
+            METRICS.event("move_error", f"移动文件 {src} 失败: {e}", level=INFO, path=src)
+            return
+        if self.manifest is not None:
+            self.manifest.rename(src, dst)
+        self.in_bucket += 1
+        self.moved += 1
+        METRICS.event("move", f"移动文件 {src} -> {dst}", src=src, dst=dst)
+
+    def run(self):
+        """
+        执行拆分，返回创建（或使用）的目标文件夹列表；文件数未超过 threshold 时返回空列表
+        """
+        names = self._listing()
+        head = []
+        for name in names:
+            head.append(name)
+            if len(head) > self.threshold:
+                break
+        if len(head) <= self.threshold:
+            return []
+
+        for name in head:
+            self._place(name)
+        del head
+        for name in names:
+            self._place(name)
+
+        # 遍历过程中目录被修改时，操作系统不保证列出所有项目；再扫描直到没有剩余文件
+        while self.manifest is None:
+            progress = self.moved + len(self.failed)
+            for name in iter_file_names(self.folder):
+                if name not in self.failed:
+                    self._place(name)
+            if self.moved + len(self.failed) == progress:
+                break
+        return self.buckets
+
+
+def scan_file_sizes(folder, manifest=None):
+    """
+    返回文件夹中各文件的 [(文件名, 大小)]（不含子文件夹）。
+    有目录清单时直接使用清单中的大小，否则用 DirEntry.stat 读取
+    """
+    if manifest is not None:
+        return [(name, manifest.file_info(os.path.join(folder, name)).size)
+                for name in manifest.listdir(folder)[1]]
+    sizes = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            try:
+                if entry.is_file():
+                    sizes.append((entry.name, entry.stat().st_size))
+            except OSError:
+                continue
+    return sizes
+
+
+def pack_balanced(sizes, max_files, max_bytes=None):
+    """
+    按大小装箱：先按文件数和总大小算出至少需要的箱数，
+    再从大到小把每个文件放入当前总大小最小且仍有空位的箱子（LPT 启发式），放不下时新开一个箱子。
+    各箱的总大小尽量接近，且不超过 max_files 个文件、max_bytes 字节（单个文件超过 max_bytes 时独占一箱）。
+    返回每个箱子中的文件名列表（按文件名排序）。
+    """
+    count = math.ceil(len(sizes) / max_files)
+    if max_bytes:
+        count = max(count, math.ceil(sum(size for _, size in sizes) / max_bytes))
+    bins = [[] for _ in range(max(count, 1))]
+    # 未装满文件数的箱子：(总大小, 箱号)
+    heap = [(0, i) for i in range(len(bins))]
+    totals = [0] * len(bins)
+    for name, size in sorted(sizes, key=lambda item: (-item[1], item[0])):
+        if heap and (not max_bytes or not bins[heap[0][1]] or heap[0][0] + size <= max_bytes):
+            _, i = heapq.heappop(heap)
+        else:
+            # 总大小最小的箱子都放不下，其他箱子也放不下
+            i = len(bins)
+            bins.append([])
+            totals.append(0)
+        bins[i].append(name)
+        totals[i] += size
+        if len(bins[i]) < max_files:
+            heapq.heappush(heap, (totals[i], i))
+    return [sorted(names) for names in bins if names]
+
+
+def pack_stable(sizes, max_files, max_bytes=None):
+    """
+    保持文件名顺序依次装箱，文件数或总大小将超出限制时换下一个箱子。
+    结果只取决于文件名和大小，与目录遍历顺序无关，便于重复得到相同的布局。
+    """
+    bins = []
+    total = 0
+    for name, size in sorted(sizes):
+        if not bins or len(bins[-1]) >= max_files or (max_bytes and bins[-1] and total + size > max_bytes):
+            bins.append([])
+            total = 0
+        bins[-1].append(name)
+        total += size
+    return bins
+
+
+def move_into_buckets(folder, buckets, bucket_path, manifest=None):
+    """
+    按装箱结果把文件移动到编号文件夹中，返回目标文件夹列表
+    """
+    folders = []
+    for number, names in enumerate(buckets, start=1):
+        bucket = bucket_path(number)
+        os.makedirs(bucket, exist_ok=True)
+        if manifest is not None:
+            manifest.add_dir(bucket)
+        folders.append(bucket)
+        for name in names:
+            src = os.path.join(folder, name)
+            dst = os.path.join(bucket, name)
+            try:
+                move_file(src, dst)
+            except OSError as e:
+                METRICS.event("move_error", f"移动文件 {src} 失败: {e}", level=INFO, path=src)
+                continue
+            if manifest is not None:
+                manifest.rename(src, dst)
+            METRICS.event("move", f"移动文件 {src} -> {dst}", src=src, dst=dst)
+    return folders
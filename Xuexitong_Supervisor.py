@@ -0,0 +1,273 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from Xuexitong_Metrics import METRICS
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，只能靠父进程检查内存占用
+    resource = None
+
+# 每个文件默认的解析时间上限（秒）和内存上限（MB）
+DEFAULT_TIMEOUT = 60
+DEFAULT_MEMORY_MB = 1024
+
+# 等待结果时检查内存占用的间隔（秒）
+POLL_INTERVAL = 0.2
+
+# 失败原因
+TIMEOUT = "超时"
+MEMORY = "内存超限"
+CRASHED = "进程异常退出"
+ERROR = "解析出错"
+
+
+def _rss_bytes(pid):
+    """
+    读取进程的常驻内存大小；无法读取（非 Linux）时返回 0
+    """
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def _worker_main(conn, func, memory_bytes):
+    """
+    工作进程：逐个接收文件路径，调用 func 并把结果发回。
+    地址空间限制为内存上限的两倍，作为父进程检查之外的兜底，防止内存在两次检查之间暴涨
+    """
+    if memory_bytes and resource is not None:
+        try:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            limit = memory_bytes * 2
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except (ValueError, OSError):
+            pass
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        try:
+            conn.send(("ok", func(task)))
+        except MemoryError:
+            conn.send(("memory", None))
+            return
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+
+class Quarantine:
+    """
+    解析失败（超时、内存超限、进程崩溃或出错）的文件清单，每条记录立即写入磁盘。
+    以后运行时跳过清单中的文件；文件的大小或修改时间变化后重新尝试。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t', 3)
+                    if len(parts) == 4:
+                        size, mtime_ns, reason, file_path = parts
+                        self.entries[file_path] = (int(size), int(mtime_ns), reason)
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def default_path(root_dir):
+        """
+        清单默认放在目标目录旁边，不会被当作待处理文件
+        """
+        return os.path.normpath(os.path.abspath(root_dir)) + ".quarantine.txt"
+
+    def __contains__(self, file_path):
+        entry = self.entries.get(os.path.abspath(file_path))
+        if entry is None:
+            return False
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        return entry[:2] == (st.st_size, st.st_mtime_ns)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, file_path, reason):
+        file_path = os.path.abspath(file_path)
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return
+        with self.lock:
+            self.entries[file_path] = (st.st_size, st.st_mtime_ns, reason)
+            self.file.write(f"{st.st_size}\t{st.st_mtime_ns}\t{reason}\t{file_path}\n")
+            self.file.flush()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.file.truncate(0)
+
+    def close(self):
+        self.file.close()
+
+
+class SupervisedExtractor:
+    """
+    在受监督的工作进程中解析文件：每个文件有时间上限和内存上限，
+    超时、超出内存或崩溃的工作进程被结束并换成新进程，失败的文件记入隔离清单。
+    run 可在多个线程中同时调用，每次调用占用一个工作进程。
+    :param workers: 工作进程数
+    :param func: 在工作进程中调用的函数，参数为文件路径（必须可被 pickle）
+    :param timeout: 每个文件的时间上限（秒）
+    :param memory_mb: 每个工作进程的内存上限（MB），None 表示不限制
+    :param quarantine: 隔离清单 Quarantine
+    """
+
+    def __init__(self, workers, func, timeout=DEFAULT_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB,
+                 quarantine=None, log=print):
+        self.workers = max(1, workers)
+        self.func = func
+        self.timeout = timeout
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self.quarantine = quarantine
+        self.log = log
+        self.failures = Counter()
+        self.restarts = 0
+        self.lock = threading.Lock()
+        self.idle = queue.Queue()
+        for _ in range(self.workers):
+            self.idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker_main,
+                                          args=(child_conn, self.func, self.memory_bytes), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker):
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        with self.lock:
+            self.restarts += 1
+        return self._spawn()
+
+    def _wait(self, worker):
+        """
+        等待工作进程返回结果，返回 (状态, 值)；工作进程已不可用时状态为失败原因
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while True:
+            interval = POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return TIMEOUT, None
+                interval = min(interval, remaining)
+            if worker.conn.poll(interval):
+                try:
+                    return worker.conn.recv()
+                except (EOFError, OSError):
+                    return CRASHED, None
+            if not worker.process.is_alive():
+                return CRASHED, None
+            if self.memory_bytes and _rss_bytes(worker.process.pid) > self.memory_bytes:
+                return MEMORY, None
+
+    def run(self, file_path):
+        """
+        解析一个文件，返回 (是否成功, 结果或失败原因)
+        """
+        worker = self.idle.get()
+        ext = os.path.splitext(file_path)[1].lower()
+        start = time.perf_counter()
+        try:
+            try:
+                worker.conn.send(file_path)
+            except OSError:
+                worker = self._replace(worker)
+                worker.conn.send(file_path)
+            status, value = self._wait(worker)
+            METRICS.observe("extract", time.perf_counter() - start, ext=ext)
+            if status == "ok":
+                METRICS.count("extract", ext=ext, result="ok")
+                return True, value
+            if status == "error":
+                reason = f"{ERROR}（{value}）"
+            else:
+                reason = MEMORY if status == "memory" else status
+                # 超时、超出内存或崩溃的工作进程不再可信，换成新进程
+                worker = self._replace(worker)
+            with self.lock:
+                self.failures[reason.partition("（")[0]] += 1
+            METRICS.count("extract", ext=ext, result=reason.partition("（")[0])
+            self.log(f"解析 {file_path} 失败: {reason}，已加入隔离清单")
+            if self.quarantine is not None:
+                self.quarantine.add(file_path, reason)
+            return False, reason
+        finally:
+            self.idle.put(worker)
+
+    def map(self, file_paths):
+        """
+        并行解析多个文件，按输入顺序依次返回 (是否成功, 结果或失败原因)
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(self.run, file_paths)
+
+    def close(self):
+        """
+        通知所有工作进程退出，未及时退出的直接结束
+        """
+        workers = []
+        while True:
+            try:
+                workers.append(self.idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+
+    def report(self):
+        """
+        返回失败统计
+        """
+        if not self.failures:
+            return "受监督解析: 没有失败的文件"
+        details = "，".join(f"{reason} {count} 个" for reason, count in self.failures.items())
+        return f"受监督解析: {details}，重启工作进程 {self.restarts} 次"
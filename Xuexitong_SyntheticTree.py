@@ -0,0 +1,298 @@
+import os
+import random
+import zipfile
+import argparse
+from xml.sax.saxutils import escape
+
+# 生成名称用的词语、全角标点和广告前缀
+WORDS = ["学生竞赛", "教学与人才培养", "实验报告", "课程设计", "教学大纲", "期末考试", "课件", "附件",
+         "证明材料", "申报书", "汇总表", "第一章", "第二章", "作业", "讲义", "复习题", "答案", "目录"]
+FULLWIDTH_PUNCTUATION = ["（", "）", "【", "】", "，", "：", "；", "《", "》", "、", "！", "　"]
+AD_PREFIXES = ["D1127_", "D1127_D1127_"]
+BINARY_EXTENSIONS = [".pdf", ".jpg", ".png", ".zip", ".mp4"]
+OFFICE_EXTENSIONS = [".docx", ".pptx", ".xlsx"]
+
+# 预设规模：deep 为目录树层数，width 为每层子目录数，flat_files 为平铺目录中的文件数，
+# html_kb、office_kb 为每个HTML和Office文件的大致大小（KB）
+PROFILES = {
+    "small": dict(depth=3, width=3, files_per_dir=10, flat_files=500, html_files=50, html_kb=8,
+                  office_files=30, office_kb=16, empty_dirs=50),
+    "medium": dict(depth=4, width=4, files_per_dir=20, flat_files=5000, html_files=300, html_kb=16,
+                   office_files=200, office_kb=64, empty_dirs=300),
+    "large": dict(depth=5, width=5, files_per_dir=20, flat_files=100_000, html_files=2000, html_kb=32,
+                  office_files=1000, office_kb=256, empty_dirs=2000),
+}
+
+# 固定的压缩包时间戳，使相同参数生成的 Office 文件逐字节相同
+ZIP_DATE_TIME = (2020, 1, 1, 0, 0, 0)
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>{}</Types>')
+RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{}</Relationships>')
+REL = '<Relationship Id="{}" Type="http://schemas.openxmlformats.org/{}" Target="{}"/>'
+OFFICE_DOCUMENT = "officeDocument/2006/relationships/officeDocument"
+
+
+def random_name(rng, ad_ratio=0.5, punctuation_ratio=0.5):
+    """
+    生成一个中文名称：由 1 到 3 个词语组成，按比例带广告前缀和全角标点
+    """
+    parts = rng.sample(WORDS, rng.randint(1, 3))
+    if rng.random() < punctuation_ratio:
+        name = "".join(part + rng.choice(FULLWIDTH_PUNCTUATION) for part in parts)
+    else:
+        name = "_".join(parts)
+    if rng.random() < ad_ratio:
+        name = rng.choice(AD_PREFIXES) + name
+    return name
+
+
+def _paragraphs(rng, target_bytes):
+    """
+    生成总长度约为 target_bytes 字节（UTF-8）的中文段落，每个分句由几个词语直接连成较长的连续中文
+    """
+    paragraphs = []
+    total = 0
+    while total < target_bytes or not paragraphs:
+        text = "，".join("".join(rng.sample(WORDS, rng.randint(2, 4)))
+                        for _ in range(rng.randint(1, 4))) + "。"
+        paragraphs.append(text)
+        total += len(text.encode("utf-8"))
+    return paragraphs
+
+
+def write_html(path, rng, size_kb=8, encoding="utf-8"):
+    """
+    写入一个HTML文件，在 <meta charset> 中声明编码（utf-8 或 gbk）
+    """
+    title = "".join(rng.sample(WORDS, 3))
+    body = "".join(f"<p>{escape(text)}</p>\n" for text in _paragraphs(rng, size_kb * 1024))
+    html = (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="{encoding}">\n<title>{title}</title>\n'
+            f'</head>\n<body>\n<h1>{title}</h1>\n{body}</body>\n</html>\n')
+    with open(path, "wb") as f:
+        f.write(html.encode(encoding))
+
+
+def _write_zip(path, parts):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts:
+            zf.writestr(zipfile.ZipInfo(name, ZIP_DATE_TIME), data, zipfile.ZIP_DEFLATED)
+
+
+def write_docx(path, paragraphs):
+    """
+    写入只包含正文段落的最小 docx 文件
+    """
+    body = "".join(f'<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>' for text in paragraphs)
+    _write_zip(path, [
+        ("[Content_Types].xml", CONTENT_TYPES.format(
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>')),
+        ("_rels/.rels", RELS.format(REL.format("rId1", OFFICE_DOCUMENT, "word/document.xml"))),
+        ("word/document.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+         f'<w:body>{body}</w:body></w:document>'),
+    ])
+
+
+def write_pptx(path, paragraphs, per_slide=10):
+    """
+    写入最小 pptx 文件，每张幻灯片放 per_slide 个段落
+    """
+    slides = [paragraphs[i:i + per_slide] for i in range(0, len(paragraphs), per_slide)]
+    parts = [
+        ("[Content_Types].xml", CONTENT_TYPES.format("".join(
+            f'<Override PartName="/ppt/slides/slide{i}.xml" ContentType="application/'
+            f'vnd.openxmlformats-officedocument.presentationml.slide+xml"/>' for i in range(1, len(slides) + 1)))),
+        ("_rels/.rels", RELS.format(REL.format("rId1", OFFICE_DOCUMENT, "ppt/presentation.xml"))),
+        ("ppt/presentation.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<p:presentation xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+         'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><p:sldIdLst>'
+         + "".join(f'<p:sldId id="{255 + i}" r:id="rId{i}"/>' for i in range(1, len(slides) + 1))
+         + '</p:sldIdLst></p:presentation>'),
+        ("ppt/_rels/presentation.xml.rels", RELS.format("".join(
+            REL.format(f"rId{i}", "officeDocument/2006/relationships/slide", f"slides/slide{i}.xml")
+            for i in range(1, len(slides) + 1)))),
+    ]
+    for i, texts in enumerate(slides, start=1):
+        body = "".join(f'<a:p><a:r><a:t>{escape(text)}</a:t></a:r></a:p>' for text in texts)
+        parts.append((f"ppt/slides/slide{i}.xml",
+                      '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      '<p:sld xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+                      'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"><p:cSld><p:spTree>'
+                      f'<p:sp><p:txBody>{body}</p:txBody></p:sp></p:spTree></p:cSld></p:sld>'))
+    _write_zip(path, parts)
+
+
+def write_xlsx(path, paragraphs):
+    """
+    写入只有一个工作表的最小 xlsx 文件：每个段落一行，第一列为共享字符串，第二列为数值
+    """
+    strings = "".join(f'<si><t>{escape(text)}</t></si>' for text in paragraphs)
+    rows = "".join(f'<row r="{i}"><c r="A{i}" t="s"><v>{i - 1}</v></c><c r="B{i}"><v>{i}</v></c></row>'
+                   for i in range(1, len(paragraphs) + 1))
+    _write_zip(path, [
+        ("[Content_Types].xml", CONTENT_TYPES.format(
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>')),
+        ("_rels/.rels", RELS.format(REL.format("rId1", OFFICE_DOCUMENT, "xl/workbook.xml"))),
+        ("xl/workbook.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+         'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+         '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        ("xl/_rels/workbook.xml.rels", RELS.format(
+            REL.format("rId1", "officeDocument/2006/relationships/worksheet", "worksheets/sheet1.xml") +
+            REL.format("rId2", "officeDocument/2006/relationships/sharedStrings", "sharedStrings.xml"))),
+        ("xl/sharedStrings.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+         f'count="{len(paragraphs)}" uniqueCount="{len(paragraphs)}">{strings}</sst>'),
+        ("xl/worksheets/sheet1.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+         f'<sheetData>{rows}</sheetData></worksheet>'),
+    ])
+
+
+OFFICE_WRITERS = {".docx": write_docx, ".pptx": write_pptx, ".xlsx": write_xlsx}
+
+
+def _unique_name(rng, used, ext=""):
+    """
+    生成同一目录中不重复的名称
+    """
+    while True:
+        name = random_name(rng) + ext
+        if name not in used:
+            used.add(name)
+            return name
+
+
+class TreeStats:
+    """
+    记录生成的目录数、文件数和总字节数
+    """
+
+    def __init__(self):
+        self.dirs = 0
+        self.files = 0
+        self.bytes = 0
+        self.by_type = {}
+
+    def add_file(self, path, kind):
+        self.files += 1
+        self.bytes += os.path.getsize(path)
+        self.by_type[kind] = self.by_type.get(kind, 0) + 1
+
+    def as_dict(self):
+        return {"dirs": self.dirs, "files": self.files, "bytes": self.bytes, "by_type": dict(self.by_type)}
+
+
+def _make_dir(path, stats):
+    os.makedirs(path)
+    stats.dirs += 1
+
+
+def _write_binary(path, rng, stats, max_size=4096):
+    with open(path, "wb") as f:
+        f.write(b"\0" * rng.randint(0, max_size))
+    stats.add_file(path, "binary")
+
+
+def _build_deep(directory, rng, stats, depth, width, files_per_dir):
+    """
+    深而宽的目录树：每层 width 个子目录，每个目录 files_per_dir 个带广告前缀和全角标点的文件
+    """
+    used = set()
+    for _ in range(files_per_dir):
+        _write_binary(os.path.join(directory, _unique_name(rng, used, rng.choice(BINARY_EXTENSIONS))),
+                      rng, stats)
+    if depth <= 1:
+        return
+    for _ in range(width):
+        child = os.path.join(directory, _unique_name(rng, used))
+        _make_dir(child, stats)
+        _build_deep(child, rng, stats, depth - 1, width, files_per_dir)
+
+
+def generate_tree(root, seed=0, depth=3, width=3, files_per_dir=10, flat_files=500, html_files=50,
+                  html_kb=8, office_files=30, office_kb=16, empty_dirs=50):
+    """
+    在 root 下生成合成的学习通目录树（root 必须不存在或为空），相同参数和 seed 生成相同的树：
+      课程资料/  深而宽的目录树，文件名和目录名为中文，含广告前缀 D1127_ 和全角标点
+      平铺/      一个有 flat_files 个文件的平铺目录，用于测试拆分
+      文档/      短文件名的HTML（UTF-8 和 GBK 各半）和 docx、pptx、xlsx 文件，用于测试按内容重命名和转PDF
+      空目录/    empty_dirs 个多层的空目录
+    返回 TreeStats
+    """
+    rng = random.Random(seed)
+    stats = TreeStats()
+    os.makedirs(root, exist_ok=True)
+    if os.listdir(root):
+        raise FileExistsError(f"目录不为空: {root}")
+
+    deep = os.path.join(root, "课程资料")
+    _make_dir(deep, stats)
+    _build_deep(deep, rng, stats, depth, width, files_per_dir)
+
+    flat = os.path.join(root, "平铺")
+    _make_dir(flat, stats)
+    for i in range(flat_files):
+        _write_binary(os.path.join(flat, f"{rng.choice(AD_PREFIXES)}作业{i:06d}{rng.choice(BINARY_EXTENSIONS)}"),
+                      rng, stats)
+
+    # 按内容重命名只处理文件名（不含扩展名）少于 5 个字符的文件，每 100 个放一个子目录
+    docs = os.path.join(root, "文档")
+    _make_dir(docs, stats)
+    documents = [".html"] * html_files + [OFFICE_EXTENSIONS[i % 3] for i in range(office_files)]
+    rng.shuffle(documents)
+    batch = None
+    for i, ext in enumerate(documents):
+        if i % 100 == 0:
+            batch = os.path.join(docs, f"批次{i // 100 + 1}")
+            _make_dir(batch, stats)
+        path = os.path.join(batch, f"{i % 100}{ext}")
+        if ext == ".html":
+            encoding = "gbk" if rng.random() < 0.5 else "utf-8"
+            write_html(path, rng, html_kb, encoding)
+            stats.add_file(path, f"html-{encoding}")
+        else:
+            OFFICE_WRITERS[ext](path, _paragraphs(rng, office_kb * 1024))
+            stats.add_file(path, ext[1:])
+
+    empty = os.path.join(root, "空目录")
+    _make_dir(empty, stats)
+    for i in range(empty_dirs):
+        path = os.path.join(empty, f"空{i}")
+        for level in range(rng.randint(0, 2)):
+            path = os.path.join(path, f"子目录{level}")
+        os.makedirs(path)
+        stats.dirs += path.count(os.sep) - empty.count(os.sep)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成用于测试和基准测试的合成学习通目录树")
+    parser.add_argument("directory", help="要生成的目录（必须不存在或为空）")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small", help="预设规模，默认 small")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子，相同种子生成相同的树")
+    parser.add_argument("--flat-files", type=int, default=None, help="平铺目录中的文件数，覆盖预设值")
+    parser.add_argument("--office-kb", type=int, default=None, help="每个 Office 文件的大致大小（KB），覆盖预设值")
+    args = parser.parse_args()
+
+    options = dict(PROFILES[args.profile])
+    if args.flat_files is not None:
+        options["flat_files"] = args.flat_files
+    if args.office_kb is not None:
+        options["office_kb"] = args.office_kb
+    stats = generate_tree(args.directory, seed=args.seed, **options)
+    print(f"已生成 {stats.dirs} 个目录、{stats.files} 个文件，共 {stats.bytes / 1024 / 1024:.1f} MB")
+    for kind, count in sorted(stats.by_type.items()):
+        print(f"  {kind}: {count}")
@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 计算内容哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 跳过原因
+ALREADY_UPLOADED = "已上传"
+DUPLICATE = "重复"
+
+
+def content_hash(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    计算整个文件内容的 BLAKE2b 哈希
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadLedger:
+    """
+    本地上传记录（SQLite），以文件内容哈希为键记录已经确认上传到网盘的文件。
+    内容已上传过的文件，以及与本次正在上传的文件内容相同的文件都会被跳过；
+    后者在正在上传的文件确认后才计入节省，那次上传失败时改由其中一个被跳过的文件上传；
+    每个请求确认后立即提交，上传中断后重新运行只需上传剩下的文件。
+    已提交但服务器尚未确认的文件（浏览器上传）单独登记，lookup 不会因此跳过它们。
+    文件的哈希按 路径 + 大小 + 修改时间 缓存，重新运行时未变化的文件不再重新读取。
+    多个上传线程可以共用同一个对象。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploaded ("
+            "hash TEXT PRIMARY KEY, size INTEGER, folder TEXT, name TEXT, uploaded_at REAL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hash ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS submitted ("
+            "hash TEXT PRIMARY KEY, size INTEGER, folder TEXT, name TEXT, submitted_at REAL)")
+        self.conn.commit()
+        # 本次运行中正在上传的内容：哈希 -> (文件夹, 文件名)
+        self.in_flight = {}
+        # 内容与正在上传的文件相同而被跳过、等待其结果的文件：哈希 -> [(路径, 大小, 文件夹, 文件名)]
+        self.waiting = {}
+        self.uploaded_files = 0
+        self.uploaded_bytes = 0
+        self.skipped = {ALREADY_UPLOADED: [0, 0], DUPLICATE: [0, 0]}
+
+    @staticmethod
+    def default_path(root_dir):
+        """
+        记录文件默认放在目标目录旁边（而不是目录内部），避免被当作待上传的文件
+        """
+        return os.path.normpath(os.path.abspath(root_dir)) + ".upload_ledger.sqlite"
+
+    def hash_file(self, file_path, size=None, mtime_ns=None):
+        """
+        返回文件内容哈希，文件未变化时直接使用上次计算的结果
+        """
+        file_path = os.path.abspath(file_path)
+        if size is None or mtime_ns is None:
+            st = os.stat(file_path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime_ns, hash FROM file_hash WHERE path = ?",
+                                    (file_path,)).fetchone()
+        if row is not None and row[:2] == (size, mtime_ns):
+            return row[2]
+        digest = content_hash(file_path)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO file_hash VALUES (?, ?, ?, ?)",
+                              (file_path, size, mtime_ns, digest))
+        return digest
+
+    def lookup(self, digest):
+        """
+        返回已上传副本的 (文件夹, 文件名)，未上传过时返回 None
+        """
+        with self.lock:
+            return self.conn.execute("SELECT folder, name FROM uploaded WHERE hash = ?",
+                                     (digest,)).fetchone()
+
+    def claim(self, digest, size, folder, name, path=None):
+        """
+        准备上传一个文件：需要上传时登记为正在上传并返回 None；
+        否则返回 (跳过原因, 已有副本所在文件夹, 文件名)。已上传过的直接计入节省的字节数；
+        与正在上传的文件内容相同的登记为等待，那次上传确认后才计入节省，
+        上传失败时由 release 返回（提供了 path 的）等待文件，以便改为上传它
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT folder, name FROM uploaded WHERE hash = ?",
+                                    (digest,)).fetchone()
+            if row is not None:
+                self.skipped[ALREADY_UPLOADED][0] += 1
+                self.skipped[ALREADY_UPLOADED][1] += size
+                return (ALREADY_UPLOADED, *row)
+            if digest in self.in_flight:
+                self.waiting.setdefault(digest, []).append((path, size, folder, name))
+                return (DUPLICATE, *self.in_flight[digest])
+            self.in_flight[digest] = (folder, name)
+            return None
+
+    def submit(self, items):
+        """
+        登记已提交上传但尚未确认的文件 [(哈希, 大小, 文件夹, 文件名)] 并立即提交；
+        它们不计入已上传，重新运行时仍会上传，直到 record 确认
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO submitted VALUES (?, ?, ?, ?, ?)",
+                                  [(digest, size, folder, name, now) for digest, size, folder, name in items])
+            self.conn.commit()
+
+    def record(self, items):
+        """
+        记录服务器已确认的文件 [(哈希, 大小, 文件夹, 文件名)] 并立即提交
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO uploaded VALUES (?, ?, ?, ?, ?)",
+                                  [(digest, size, folder, name, now) for digest, size, folder, name in items])
+            self.conn.executemany("DELETE FROM submitted WHERE hash = ?", [(item[0],) for item in items])
+            self.conn.commit()
+            for digest, size, _, _ in items:
+                self.in_flight.pop(digest, None)
+                self.uploaded_files += 1
+                self.uploaded_bytes += size
+                for _, waiting_size, _, _ in self.waiting.pop(digest, []):
+                    self.skipped[DUPLICATE][0] += 1
+                    self.skipped[DUPLICATE][1] += waiting_size
+
+    def release(self, digests):
+        """
+        上传失败的文件取消登记，之后遇到相同内容的文件时重新上传。
+        有等待该内容的文件时，第一个登记为正在上传（其余继续等待它的结果），
+        返回这些需要由调用方上传的文件 [(路径, 大小, 文件夹, 文件名, 哈希)]
+        """
+        promoted = []
+        with self.lock:
+            for digest in digests:
+                self.in_flight.pop(digest, None)
+                waiters = [item for item in self.waiting.pop(digest, []) if item[0] is not None]
+                if not waiters:
+                    continue
+                path, size, folder, name = waiters[0]
+                self.in_flight[digest] = (folder, name)
+                if len(waiters) > 1:
+                    self.waiting[digest] = waiters[1:]
+                promoted.append((path, size, folder, name, digest))
+        return promoted
+
+    def bytes_saved(self):
+        return sum(size for _, size in self.skipped.values())
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def report(self):
+        """
+        返回本次运行的上传与跳过统计
+        """
+        already, duplicate = self.skipped[ALREADY_UPLOADED], self.skipped[DUPLICATE]
+        with self.lock:
+            unconfirmed = self.conn.execute("SELECT COUNT(*) FROM submitted").fetchone()[0]
+        return (f"上传记录: 新上传 {self.uploaded_files} 个文件（{self.uploaded_bytes / 1024 / 1024:.1f} MB），"
+                f"跳过已上传 {already[0]} 个（{already[1] / 1024 / 1024:.1f} MB），"
+                f"跳过重复 {duplicate[0]} 个（{duplicate[1] / 1024 / 1024:.1f} MB），"
+                f"共节省 {self.bytes_saved() / 1024 / 1024:.1f} MB"
+                + (f"，已提交未确认 {unconfirmed} 个（重新运行时将再次上传）" if unconfirmed else ""))
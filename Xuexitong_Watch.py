@@ -0,0 +1,455 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from collections import OrderedDict
+from Xuexitong_Metrics import METRICS, INFO, add_arguments, configure_from_args
+from Xuexitong_Split import iter_file_names
+
+# inotify 事件标志（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# 监视每个目录时关注的事件：写完关闭的文件、移入移出的文件和目录、新建的目录
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+
+# struct inotify_event 的固定部分：wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 1024 * 1024
+
+# 文件最后一次事件之后等待多久（秒）才处理，期间再有事件就重新计时
+DEFAULT_SETTLE = 2.0
+
+# 补扫时把检查点再提前这么多秒，避免时钟精度导致遗漏
+CHECKPOINT_SLACK = 2.0
+
+# 记住最近处理过的文件（按 设备号+inode）的数量上限，用于忽略流水线自身的重命名和移动产生的事件
+PROCESSED_LIMIT = 200000
+
+
+class Inotify:
+    """
+    通过 ctypes 调用 libc 的 inotify 接口（仅 Linux）
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        """
+        等待最多 timeout 秒，返回读到的事件列表 [(wd, mask, cookie, 名称)]
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _rebase(path, old, new):
+    """
+    path 位于 old 目录中（或就是 old）时返回移动到 new 之后的路径，否则返回 None
+    """
+    if path == old:
+        return new
+    if path.startswith(old + os.sep):
+        return new + path[len(old):]
+    return None
+
+
+class Watcher:
+    """
+    监视模式：用 inotify 监视整个目录树，新到达或修改过的文件在 settle 秒内没有新事件后，
+    按目录分批交给 Pipeline.process_files 处理（清理名称、按内容重命名、HTML转PDF、拆分目录）。
+    每批的工作量只与变化的文件数有关，不再遍历整个目录树。
+    启动时补扫一遍目录树：添加监视，并把上次检查点之后修改过的文件和目录加入待处理列表，
+    检查点保存在目录旁边的状态文件中，停止期间到达的文件不会遗漏。
+    :param pipeline: 提供各处理步骤的 Pipeline（需要按内容重命名时应已调用 start_extractor）
+    :param settle: 等待文件稳定的秒数
+    :param state_path: 状态文件路径，默认放在目标目录旁边
+    """
+
+    def __init__(self, pipeline, settle=DEFAULT_SETTLE, state_path=None):
+        self.pipeline = pipeline
+        self.root = pipeline.root_dir
+        self.settle = settle
+        self.state_path = state_path or self.default_state_path(self.root)
+        self.inotify = Inotify()
+        self.paths = {}
+        self.wds = {}
+        # 待处理的文件和新目录：路径 -> (第一次事件时间, 最后一次事件时间)
+        self.pending_files = {}
+        self.pending_dirs = {}
+        # 移出的目录：cookie -> 原路径，用于与随后的移入事件配对
+        self.moved_from = {}
+        self.processed = OrderedDict()
+        # 拆分目录时新建的子文件夹，其创建事件不再当作新目录补扫
+        self.split_dirs = set()
+        self.warned_limit = False
+        self.since = None
+
+    @staticmethod
+    def default_state_path(root_dir):
+        return os.path.normpath(os.path.abspath(root_dir)) + ".watch_state.json"
+
+    def load_checkpoint(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)["since"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_checkpoint(self, since):
+        self.since = since
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"since": since}, f)
+        os.replace(temp_path, self.state_path)
+
+    def _watch(self, directory):
+        try:
+            wd = self.inotify.add_watch(directory)
+        except OSError as e:
+            if e.errno == errno.ENOSPC and not self.warned_limit:
+                self.warned_limit = True
+                print("inotify 监视数量已达上限，部分目录不会被监视；"
+                      "可调大 /proc/sys/fs/inotify/max_user_watches")
+            elif e.errno != errno.ENOSPC:
+                METRICS.event("watch_error", f"无法监视目录 {directory}: {e}", level=INFO, path=directory)
+            return
+        self.paths[wd] = directory
+        self.wds[directory] = wd
+
+    def _touch(self, pending, path, now=None):
+        now = time.time() if now is None else now
+        first = pending[path][0] if path in pending else now
+        pending[path] = (first, now)
+
+    def scan(self, top, since=None):
+        """
+        遍历 top 下的目录树并添加监视，把修改时间或状态改变时间不早于 since 的文件和子目录加入待处理列表
+        （since 为 None 时全部加入），返回加入的文件数
+        """
+        added = 0
+        now = time.time()
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            if directory not in self.wds:
+                self._watch(directory)
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError as e:
+                METRICS.event("watch_error", f"无法读取目录 {directory}: {e}", level=INFO, path=directory)
+                continue
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    st = entry.stat(follow_symlinks=False) if since is not None else None
+                except OSError:
+                    continue
+                changed = st is None or max(st.st_mtime, st.st_ctime) >= since
+                if is_dir:
+                    stack.append(entry.path)
+                    if changed:
+                        self._touch(self.pending_dirs, entry.path, now)
+                elif changed and entry.is_file(follow_symlinks=False):
+                    self._touch(self.pending_files, entry.path, now)
+                    added += 1
+        return added
+
+    def _relocate(self, old, new):
+        """
+        目录移动后更新监视和待处理列表中的路径
+        """
+        for wd, path in list(self.paths.items()):
+            moved = _rebase(path, old, new)
+            if moved is not None:
+                del self.wds[path]
+                self.paths[wd] = moved
+                self.wds[moved] = wd
+        for pending in (self.pending_files, self.pending_dirs):
+            for path in [path for path in pending if _rebase(path, old, new) is not None]:
+                pending[_rebase(path, old, new)] = pending.pop(path)
+
+    def _forget(self, directory):
+        """
+        目录移出监视范围后取消其中所有目录的监视
+        """
+        for wd, path in list(self.paths.items()):
+            if _rebase(path, directory, directory) is not None:
+                self.inotify.rm_watch(wd)
+                del self.paths[wd]
+                self.wds.pop(path, None)
+
+    def handle(self, wd, mask, cookie, name):
+        if mask & IN_Q_OVERFLOW:
+            # 事件队列溢出，有事件丢失：按检查点补扫整个目录树
+            print("inotify 事件队列溢出，重新补扫目录树")
+            self.scan(self.root, self.since)
+            return
+        directory = self.paths.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self.paths[wd]
+            if self.wds.get(directory) == wd:
+                del self.wds[directory]
+            return
+        if mask & IN_DELETE_SELF:
+            return
+        path = os.path.join(directory, name)
+        is_dir = mask & IN_ISDIR
+        if mask & IN_MOVED_FROM:
+            if is_dir:
+                self.moved_from[cookie] = path
+            else:
+                self.pending_files.pop(path, None)
+            return
+        if is_dir:
+            old = self.moved_from.pop(cookie, None) if mask & IN_MOVED_TO else None
+            if old is not None:
+                # 目录在监视范围内改名或移动，只更新路径
+                self._relocate(old, path)
+                self._touch(self.pending_dirs, path)
+            elif path in self.split_dirs:
+                # 拆分创建的子文件夹已在拆分后登记，其中的文件都是从上级目录移入的
+                self.split_dirs.discard(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                # 新建或从外部移入的目录：添加监视，其中已有的文件都需要处理
+                self._touch(self.pending_dirs, path)
+                self.scan(path)
+            return
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self._touch(self.pending_files, path)
+
+    def _remember(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self.processed[(st.st_dev, st.st_ino)] = (st.st_size, st.st_mtime_ns)
+        self.processed.move_to_end((st.st_dev, st.st_ino))
+        if len(self.processed) > PROCESSED_LIMIT:
+            self.processed.popitem(last=False)
+
+    def _already_processed(self, path):
+        """
+        文件是流水线处理后的结果（只被改名或移动过，内容未变）时返回 True
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return True
+        return self.processed.get((st.st_dev, st.st_ino)) == (st.st_size, st.st_mtime_ns)
+
+    def _adopt_split(self, directory, folders):
+        """
+        登记拆分 directory 时新建的子文件夹：添加监视；移入其中的文件还在等待稳定的改为等待新路径，
+        其余的（本批处理的、之前已处理的）记为已处理，不会因补扫或移入事件再处理一遍
+        """
+        for folder in folders:
+            self.split_dirs.add(folder)
+            if folder not in self.wds:
+                self._watch(folder)
+            for name in iter_file_names(folder):
+                path = os.path.join(folder, name)
+                old = os.path.join(directory, name)
+                if old in self.pending_files:
+                    self.pending_files[path] = self.pending_files.pop(old)
+                else:
+                    self._remember(path)
+
+    def _take_ready(self, now):
+        """
+        取出已稳定的待处理条目；所在目录还在等待稳定的文件暂不处理（目录可能还要改名）
+        """
+        waiting = [path for path, (_, last) in self.pending_dirs.items() if last + self.settle > now]
+        ready_dirs = [path for path in self.pending_dirs if not any(_rebase(path, d, d) for d in waiting)]
+        ready_files = [path for path, (_, last) in self.pending_files.items()
+                       if last + self.settle <= now and not any(_rebase(path, d, d) for d in waiting)]
+        for path in ready_dirs:
+            del self.pending_dirs[path]
+        for path in ready_files:
+            del self.pending_files[path]
+        return ready_dirs, ready_files
+
+    def process_ready(self):
+        """
+        处理已稳定的条目，返回处理的文件数
+        """
+        start = time.time()
+        ready_dirs, ready_files = self._take_ready(start)
+        # 未配对的移出事件：目录已移出监视范围
+        for old in self.moved_from.values():
+            self._forget(old)
+        self.moved_from.clear()
+        if not ready_dirs and not ready_files:
+            return 0
+
+        batch = {}
+        for path in ready_dirs:
+            if os.path.isdir(path) and path != self.root:
+                batch.setdefault(os.path.dirname(path), (set(), set()))[1].add(os.path.basename(path))
+        for path in ready_files:
+            if not self._already_processed(path):
+                batch.setdefault(os.path.dirname(path), (set(), set()))[0].add(os.path.basename(path))
+
+        processed = renamed = 0
+        # 从浅到深处理，上级目录改名后，更深的待处理目录跟着换成新路径
+        while batch:
+            directory = min(batch, key=lambda d: (d.count(os.sep), d))
+            files, subdirs = batch.pop(directory)
+            moved, paths = self.pipeline.process_files(directory, sorted(files), sorted(subdirs))
+            processed += len(paths)
+            renamed += len(moved)
+            # 先记住处理结果再拆分：拆分只移动文件，之后的移入事件据此忽略
+            for path in paths:
+                self._remember(path)
+            self._adopt_split(directory, self.pipeline.finish_directory(directory, None))
+            for old, new in moved.items():
+                self._relocate(old, new)
+                for key in [key for key in batch if _rebase(key, old, new) is not None]:
+                    batch[_rebase(key, old, new)] = batch.pop(key)
+
+        remaining = [first for first, _ in list(self.pending_files.values()) + list(self.pending_dirs.values())]
+        self.save_checkpoint(min(remaining + [start]) - CHECKPOINT_SLACK)
+        if processed or renamed:
+            print(f"已处理 {processed} 个文件，重命名 {renamed} 个目录，用时 {time.time() - start:.1f} 秒，"
+                  f"监视 {len(self.paths)} 个目录")
+        return processed
+
+    def run(self):
+        """
+        补扫后持续监视，直到被中断（Ctrl+C）
+        """
+        since = self.load_checkpoint()
+        self.since = since
+        start = time.perf_counter()
+        added = self.scan(self.root, since)
+        scope = "全部文件" if since is None else time.strftime("%Y-%m-%d %H:%M:%S 之后修改的文件",
+                                                            time.localtime(since))
+        print(f"补扫完成: 监视 {len(self.paths)} 个目录，{scope}共 {added} 个，"
+              f"用时 {time.perf_counter() - start:.1f} 秒")
+        while True:
+            pending = [last for _, last in list(self.pending_files.values()) + list(self.pending_dirs.values())]
+            timeout = max(0.05, min(pending) + self.settle - time.time()) if pending else None
+            for event in self.inotify.read(timeout):
+                self.handle(*event)
+            self.process_ready()
+
+    def close(self):
+        self.inotify.close()
+
+
+if __name__ == "__main__":
+    from Xuexitong_00_Remove_ad import load_patterns
+    from Xuexitong_04_SplitDirWithin50Files import SPLIT_MODES
+    from Xuexitong_Pipeline import Pipeline
+    from Xuexitong_Supervisor import Quarantine, DEFAULT_TIMEOUT, DEFAULT_MEMORY_MB
+
+    parser = argparse.ArgumentParser(description="持续监视目录，只处理新到达或修改过的文件（仅 Linux）")
+    parser.add_argument("directory", nargs="?",
+                        default=r"D:\Alpha\StoreLatestYears\Store2025\B教学_教学与人才培养_A03_学生竞赛",
+                        help="要监视的目录")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="文件最后一次变化后等待多少秒再处理，默认 2")
+    parser.add_argument("--state-path", default=None, help="检查点状态文件路径，默认放在目标目录旁边")
+    parser.add_argument("--ad-string", action="append", default=None,
+                        help="要从文件名中删除的广告字符串，可重复指定，默认为 D1127_")
+    parser.add_argument("--patterns", default=None, help="广告字符串列表文件，每行一个")
+    parser.add_argument("--workers", type=int, default=None, help="并行处理文件的线程数和解析进程数，默认为CPU核数")
+    parser.add_argument("--max-files", type=int, default=50, help="每个文件夹最多保留的文件数")
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="每个文件夹的总大小上限（MB），指定后按大小均衡拆分")
+    parser.add_argument("--split-mode", choices=SPLIT_MODES, default=None,
+                        help="拆分方式：stream 按顺序分组，balance 按大小均衡，stable 按文件名顺序装箱")
+    parser.add_argument("--skip-content", action="store_true", help="不按内容重命名")
+    parser.add_argument("--skip-html", action="store_true", help="不转换HTML")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="每个文件的解析时间上限（秒）")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="每个解析进程的内存上限（MB），为 0 时不限制")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    if not sys.platform.startswith("linux"):
+        print("错误: 监视模式依赖 inotify，只能在 Linux 上使用")
+        exit(1)
+    if not os.path.isdir(args.directory):
+        print("错误: 指定的路径不是一个有效的目录!")
+        exit(1)
+
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    quarantine = Quarantine(Quarantine.default_path(args.directory))
+    pipeline = Pipeline(args.directory,
+                        ad_strings=(load_patterns(args.patterns) if args.patterns else [])
+                        + (args.ad_string or ([] if args.patterns else ["D1127_"])),
+                        workers=args.workers,
+                        max_files=args.max_files,
+                        max_bytes=max_bytes,
+                        split_mode=args.split_mode or ("balance" if max_bytes else "stream"),
+                        rename_by_content=not args.skip_content,
+                        convert_html=not args.skip_html,
+                        timeout=args.timeout,
+                        memory_mb=args.memory_mb or None,
+                        quarantine=quarantine)
+    if pipeline.rename_by_content:
+        pipeline.start_extractor()
+    watcher = Watcher(pipeline, settle=args.settle, state_path=args.state_path)
+    print(f"开始监视目录: {pipeline.root_dir}（按 Ctrl+C 停止）")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("已停止监视")
+    finally:
+        watcher.close()
+        if pipeline.pool is not None:
+            pipeline.pool.close()
+        quarantine.close()
+        METRICS.close()
+    print(METRICS.summary())